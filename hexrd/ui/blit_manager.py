@@ -0,0 +1,97 @@
+from matplotlib.backend_bases import DrawEvent
+
+
+class BlitManager:
+    """Redraw the animated artists of a canvas over a cached background
+
+    The artists that are added are marked as animated, so a full draw of
+    the canvas leaves them out. After each full draw, the rendered
+    figure is cached as the background, and the artists are drawn on
+    top of it.
+
+    update() then only restores the background, draws the artists, and
+    blits the result, so changes to the artists do not re-rasterize the
+    images underneath. If anything else in the figure has changed since
+    the last full draw, update() does a full draw instead. matplotlib
+    does not mark the figure as stale when an animated artist changes.
+
+    Saving the figure leaves out animated artists, so the canvas's
+    print_figure() is wrapped to draw the artists as normal ones while
+    the figure is saved.
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.artists = []
+        self.background = None
+
+        # Set while draw_event is emitted after a blit
+        self._blitting = False
+
+        self.draw_id = canvas.mpl_connect('draw_event', self.on_draw)
+
+        self._print_figure = canvas.print_figure
+        canvas.print_figure = self.print_figure
+
+    def print_figure(self, *args, **kwargs):
+        artists = [x for x in self.artists if x.get_animated()]
+        for artist in artists:
+            artist.set_animated(False)
+
+        try:
+            return self._print_figure(*args, **kwargs)
+        finally:
+            for artist in artists:
+                artist.set_animated(True)
+
+    def add_artist(self, artist):
+        artist.set_animated(True)
+        if artist not in self.artists:
+            self.artists.append(artist)
+
+    def remove_artist(self, artist):
+        if artist in self.artists:
+            self.artists.remove(artist)
+
+    def clear(self):
+        self.artists.clear()
+        self.background = None
+
+    def on_draw(self, event):
+        if self._blitting or self.canvas.is_saving():
+            # The background is unchanged
+            return
+
+        figure = self.canvas.figure
+        self.background = self.canvas.copy_from_bbox(figure.bbox)
+        self.draw_artists()
+
+    def draw_artists(self):
+        figure = self.canvas.figure
+        axes = figure.axes
+        for artist in self.artists:
+            # Skip any artists whose axes were removed from the figure
+            if artist.axes in axes and artist.get_visible():
+                figure.draw_artist(artist)
+
+    def update(self):
+        """Redraw the canvas, only drawing the artists if possible"""
+        figure = self.canvas.figure
+        if self.background is None or figure.stale:
+            self.canvas.draw()
+            return
+
+        self.canvas.restore_region(self.background)
+        self.draw_artists()
+
+        # Other widgets that blit, such as the cursors, take their
+        # backgrounds on a draw event. Let them include the artists.
+        self._blitting = True
+        try:
+            renderer = self.canvas.get_renderer()
+            event = DrawEvent('draw_event', self.canvas, renderer)
+            self.canvas.callbacks.process('draw_event', event)
+        finally:
+            self._blitting = False
+
+        self.canvas.blit(figure.bbox)
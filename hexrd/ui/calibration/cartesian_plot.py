@@ -1,28 +1,205 @@
 import copy
 import itertools
+import shutil
+import tempfile
 
 import numpy as np
 import psutil
 
 from hexrd.gridutil import cellIndices
 
-from hexrd.ui.constants import ViewType
+from hexrd.ui.constants import ViewType, WarpMode
 from hexrd.ui.create_hedm_instrument import create_hedm_instrument
 from hexrd.ui.hexrd_config import HexrdConfig
+from hexrd.ui.image_pyramid import downsample
 from hexrd.ui.overlays import update_overlay_data
+from hexrd.ui.parallel_warp import warp_in_parallel
+from hexrd.ui.utils import array_key, LRUCache, panel_geometry_key
 
 from skimage import transform as tf
 
 from .display_plane import DisplayPlane
 
+# The inverse coordinate maps only depend upon the panel geometry and the
+# display plane, so they can be reused for every new frame. They are as
+# large as the projections of the detectors, so the cache is bounded by
+# their total size rather than by their number.
+display_panel_warp_lookup_cache = LRUCache(
+    max_size=1024, max_bytes=1024 ** 3, sizeof=lambda x: x.nbytes)
 
-def cartesian_viewer():
-    return InstrumentViewer()
+
+def cartesian_viewer(view_limits=None):
+    return InstrumentViewer(view_limits)
+
+
+class DisplayPanelWarpLookup:
+    """Bilinear interpolation lookup table for warping a panel to the
+    display panel
+
+    The inverse coordinate map of the projective transform is evaluated
+    once, for the display panel pixels inside the bounding box of the
+    detector corners. For every one of those pixels that lands on the
+    panel, this stores the flat indices of the four surrounding panel
+    pixels and their weights.
+
+    The output may be a tile of the display panel, in which case offset
+    is the (row, col) of the tile's first pixel in the display panel.
+
+    The indices are stored as 32-bit integers and the weights as 32-bit
+    floats, to halve the memory of the lookup.
+    """
+
+    # The bytes of the weights for each display panel pixel on the panel
+    weights_nbytes = 4 * np.dtype(np.float32).itemsize
+
+    def __init__(self, tform, corners, panel_shape, shape, offset=(0, 0)):
+        self.corners = corners
+        self.shape = shape
+
+        # The projection of the panel is bounded by its corners
+        rows, cols = shape
+        row_offset, col_offset = offset
+        j_min = max(np.floor(corners[:, 0].min()), col_offset)
+        i_min = max(np.floor(corners[:, 1].min()), row_offset)
+        j_max = min(np.ceil(corners[:, 0].max()), col_offset + cols - 1)
+        i_max = min(np.ceil(corners[:, 1].max()), row_offset + rows - 1)
+
+        i, j = np.meshgrid(np.arange(i_min, i_max + 1),
+                           np.arange(j_min, j_max + 1), indexing='ij')
+        i = i.flatten().astype(int)
+        j = j.flatten().astype(int)
+
+        # The transform maps (col, row) display panel pixel coordinates
+        # to (col, row) panel pixel coordinates
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ij_frac = tform(np.vstack([j, i]).T)[:, ::-1]
+
+        panel_rows, panel_cols = panel_shape
+        on_panel = (
+            (ij_frac[:, 0] >= 0) & (ij_frac[:, 0] <= panel_rows - 1) &
+            (ij_frac[:, 1] >= 0) & (ij_frac[:, 1] <= panel_cols - 1)
+        )
+        self.on_panel = ((i[on_panel] - row_offset) * cols +
+                         j[on_panel] - col_offset).astype(
+                             self.index_dtype(rows * cols))
+        ij_frac = ij_frac[on_panel]
+
+        # Points on the last row or column use the pixel before it
+        i_floor = np.minimum(ij_frac[:, 0].astype(int), panel_rows - 2)
+        j_floor = np.minimum(ij_frac[:, 1].astype(int), panel_cols - 2)
+        i_ceil = i_floor + 1
+        j_ceil = j_floor + 1
+
+        w_i_floor = i_ceil - ij_frac[:, 0]
+        w_i_ceil = ij_frac[:, 0] - i_floor
+        w_j_floor = j_ceil - ij_frac[:, 1]
+        w_j_ceil = ij_frac[:, 1] - j_floor
+
+        self.indices = np.vstack([
+            i_floor * panel_cols + j_floor,
+            i_floor * panel_cols + j_ceil,
+            i_ceil * panel_cols + j_floor,
+            i_ceil * panel_cols + j_ceil
+        ]).astype(self.index_dtype(panel_rows * panel_cols))
+        self.weights = np.vstack([
+            w_i_floor * w_j_floor,
+            w_i_floor * w_j_ceil,
+            w_i_ceil * w_j_floor,
+            w_i_ceil * w_j_ceil
+        ]).astype(np.float32)
+
+    @staticmethod
+    def index_dtype(size):
+        # Flat indices only need 64 bits for enormous arrays
+        return np.int32 if size <= np.iinfo(np.int32).max else np.int64
+
+    @classmethod
+    def pixel_nbytes(cls, panel_size, size):
+        """Estimate the bytes used for each display panel pixel on a panel
+
+        panel_size is the number of pixels of the panel, and size is the
+        number of pixels of the (tile of the) display panel.
+        """
+        return (4 * np.dtype(cls.index_dtype(panel_size)).itemsize +
+                cls.weights_nbytes +
+                np.dtype(cls.index_dtype(size)).itemsize)
+
+    @property
+    def size(self):
+        return self.shape[0] * self.shape[1]
+
+    @property
+    def nbytes(self):
+        return (self.indices.nbytes + self.weights.nbytes +
+                self.on_panel.nbytes)
+
+    def warp(self, img):
+        result = np.zeros(self.size)
+        values = np.take(img, self.indices)
+        result[self.on_panel] = np.sum(self.weights * values, axis=0)
+        return result.reshape(self.shape)
+
+
+def display_panel_transform(panel, dplane, dpanel):
+    """Get the projective transform from the display panel to a panel
+
+    The transform and the corners of the panel, in display panel pixel
+    coordinates, are returned.
+    """
+    # map corners
+    corners = np.vstack(
+        [panel.corner_ll,
+         panel.corner_lr,
+         panel.corner_ur,
+         panel.corner_ul,
+         ]
+    )
+    mp = panel.map_to_plane(corners, dplane.rmat, dplane.tvec)
+
+    col_edges = dpanel.col_edge_vec
+    row_edges = dpanel.row_edge_vec
+    j_col = cellIndices(col_edges, mp[:, 0])
+    i_row = cellIndices(row_edges, mp[:, 1])
+
+    src = np.vstack([j_col, i_row]).T
+
+    dst = panel.cartToPixel(corners, pixels=True)
+    dst = dst[:, ::-1]
+
+    tform3 = tf.ProjectiveTransform()
+    tform3.estimate(src, dst)
+
+    return tform3, src
+
+
+def create_display_panel_warp_lookup(panel, dplane, dpanel):
+    tform, corners = display_panel_transform(panel, dplane, dpanel)
+    return DisplayPanelWarpLookup(tform, corners, (panel.rows, panel.cols),
+                                  (dpanel.rows, dpanel.cols))
+
+
+def warp_to_display_panel(img, out, index, panel, dplane, dpanel,
+                          lookup=None):
+    """Warp a detector image onto the display panel, into out[index]
+
+    This is meant to be used with warp_in_parallel(). The lookup is
+    computed if it is not provided, and it is returned so it may be
+    cached. The lookup also holds the corners of the detector, in
+    display panel pixel coordinates.
+    """
+    if lookup is None:
+        lookup = create_display_panel_warp_lookup(panel, dplane, dpanel)
+
+    out[index] = lookup.warp(img)
+    return lookup
 
 
 class InstrumentViewer:
 
-    def __init__(self):
+    # The number of rows and columns in each tile, for tiled rendering
+    tile_size = 1024
+
+    def __init__(self, view_limits=None):
         self.type = ViewType.cartesian
         self.instr = create_hedm_instrument()
         self.images_dict = HexrdConfig().current_images_dict()
@@ -32,9 +209,19 @@ class InstrumentViewer:
         self.check_angles_feasible()
 
         self.pixel_size = HexrdConfig().cartesian_pixel_size
+        self.tiled = HexrdConfig().cartesian_tiled
         self.warp_dict = {}
         self.detector_corners = {}
 
+        # For tiled rendering. The levels are the downsampled levels of
+        # the image pyramid, which are rendered along with the tiles.
+        self.display_transforms = {}
+        self.rendered_tiles = {}
+        self.view_limits = view_limits
+        self.warp_range = None
+        self.canvas_files = []
+        self.levels = None
+
         dist = HexrdConfig().cartesian_virtual_plane_distance
         dplane_tvec = np.array([0., 0., -dist])
 
@@ -81,28 +268,59 @@ class InstrumentViewer:
             raise Exception(msg)
 
     def check_size_feasible(self):
+        def format_size(size):
+            sizes = [
+                ('TB', 1e12),
+                ('GB', 1e9),
+                ('MB', 1e6),
+                ('KB', 1e3),
+                ('B', 1)
+            ]
+            for s in sizes:
+                if size > s[1]:
+                    return f'{round(size / s[1], 2)} {s[0]}'
+
         available_mem = psutil.virtual_memory().available
-        img_dtype = np.float64
+        img_dtype = np.float32 if self.tiled else np.float64
         dtype_size = np.dtype(img_dtype).itemsize
 
-        mem_usage = self.dpanel.rows * self.dpanel.cols * dtype_size
+        size = self.dpanel.rows * self.dpanel.cols
+        img_size = size * dtype_size
+        if self.tiled:
+            # The tiles are rendered into files on disk. The downsampled
+            # levels add up to at most a third of the image.
+            available_disk = shutil.disk_usage(tempfile.gettempdir()).free
+            disk_usage = img_size * 4 // 3
+            if disk_usage > available_disk:
+                msg = 'Not enough disk space for tiled Cartesian plot\n'
+                msg += f'Disk space available: {format_size(available_disk)}\n'
+                msg += f'Disk space required: {format_size(disk_usage)}'
+                raise Exception(msg)
+
+        # The warp lookups. The detectors do not overlap, so together the
+        # lookups cover at most the display panel, or the tile being
+        # rendered for each detector when tiled.
+        panels = self.instr._detectors.values()
+        panel_size = max(x.rows * x.cols for x in panels)
+        if self.tiled:
+            tile_size = min(self.tile_size ** 2, size)
+            pixel_nbytes = DisplayPanelWarpLookup.pixel_nbytes(panel_size,
+                                                               tile_size)
+            lookup_size = len(self.images_dict) * tile_size * pixel_nbytes
+            mem_usage = lookup_size
+        else:
+            pixel_nbytes = DisplayPanelWarpLookup.pixel_nbytes(panel_size,
+                                                               size)
+            lookup_size = size * pixel_nbytes
+
+            # The warped image of each detector is kept along with the
+            # final image
+            mem_usage = img_size * (len(self.images_dict) + 1) + lookup_size
+
         # Extra memory we probably need for other things...
         mem_extra_buffer = 1e7
         mem_usage += mem_extra_buffer
         if mem_usage > available_mem:
-
-            def format_size(size):
-                sizes = [
-                    ('TB', 1e12),
-                    ('GB', 1e9),
-                    ('MB', 1e6),
-                    ('KB', 1e3),
-                    ('B', 1)
-                ]
-                for s in sizes:
-                    if size > s[1]:
-                        return f'{round(size / s[1], 2)} {s[0]}'
-
             msg = 'Not enough memory for Cartesian plot\n'
             msg += f'Memory available: {format_size(available_mem)}\n'
             msg += f'Memory required: {format_size(mem_usage)}'
@@ -147,9 +365,21 @@ class InstrumentViewer:
         self.min = min([x.min() for x in images])
         self.max = max([x.max() for x in images])
 
-        # Create the warped image for each detector
-        for detector_id in self.images_dict.keys():
-            self.create_warped_image(detector_id)
+        if self.tiled:
+            # Only the tiles in view are rendered
+            self.create_tiled_canvas()
+            if self.view_limits is None:
+                self.view_limits = (self.extent[:2], self.extent[2:])
+            self.render_view(*self.view_limits)
+            return
+
+        mode = HexrdConfig().parallel_warp_mode
+        if mode == WarpMode.serial:
+            # Create the warped image for each detector
+            for detector_id in self.images_dict.keys():
+                self.create_warped_image(detector_id)
+        else:
+            self.create_warped_images_in_parallel(mode)
 
         # Generate the final image
         self.generate_image()
@@ -245,41 +475,226 @@ class InstrumentViewer:
 
         return borders
 
-    def create_warped_image(self, detector_id):
-        img = self.images_dict[detector_id]
+    def warp_lookup_key(self, detector_id):
         panel = self.instr._detectors[detector_id]
-
-        # map corners
-        corners = np.vstack(
-            [panel.corner_ll,
-             panel.corner_lr,
-             panel.corner_ur,
-             panel.corner_ul,
-             ]
+        return (
+            panel_geometry_key(panel),
+            array_key(self.dplane.tvec),
+            array_key(self.dplane.tilt),
+            self.dpanel.rows,
+            self.dpanel.cols,
+            self.dpanel.pixel_size_row,
+            self.dpanel.pixel_size_col,
         )
-        mp = panel.map_to_plane(corners, self.dplane.rmat,
-                                self.dplane.tvec)
 
-        col_edges = self.dpanel.col_edge_vec
-        row_edges = self.dpanel.row_edge_vec
-        j_col = cellIndices(col_edges, mp[:, 0])
-        i_row = cellIndices(row_edges, mp[:, 1])
+    def create_warp_lookup(self, detector_id):
+        key = self.warp_lookup_key(detector_id)
+        lookup = display_panel_warp_lookup_cache.get(key)
+        if lookup is not None:
+            return lookup
+
+        panel = self.instr._detectors[detector_id]
+        lookup = create_display_panel_warp_lookup(panel, self.dplane,
+                                                  self.dpanel)
+        display_panel_warp_lookup_cache[key] = lookup
+        return lookup
 
-        src = np.vstack([j_col, i_row]).T
+    def create_warped_image(self, detector_id):
+        img = self.images_dict[detector_id]
+        lookup = self.create_warp_lookup(detector_id)
 
         # Save detector corners in pixel coordinates
-        self.detector_corners[detector_id] = src
+        self.detector_corners[detector_id] = lookup.corners
+
+        self.warp_dict[detector_id] = lookup.warp(img)
+        return self.warp_dict[detector_id]
+
+    def create_warped_images_in_parallel(self, mode):
+        dets = list(self.images_dict.keys())
+        keys = [self.warp_lookup_key(det) for det in dets]
+
+        # Every detector is warped into its own slot of this buffer
+        out = np.empty((len(dets), self.dpanel.rows, self.dpanel.cols))
+
+        tasks = []
+        for i, (det, key) in enumerate(zip(dets, keys)):
+            args = (self.instr._detectors[det], self.dplane, self.dpanel,
+                    display_panel_warp_lookup_cache.get(key))
+            tasks.append((i, self.images_dict[det], args))
+
+        # Keep the lookups here, since the cache may not hold all of them
+        lookups = [args[-1] for _, _, args in tasks]
+
+        if mode == WarpMode.processes:
+            # Only the projections are worth sending to other processes.
+            # Detectors with cached lookups just need a gather.
+            cached = [x for x in tasks if x[2][-1] is not None]
+            tasks = [x for x in tasks if x[2][-1] is None]
+            warp_in_parallel(warp_to_display_panel, cached, out)
+
+        results = warp_in_parallel(warp_to_display_panel, tasks, out, mode)
+        for (i, _, _), lookup in zip(tasks, results):
+            lookups[i] = lookup
+            display_panel_warp_lookup_cache[keys[i]] = lookup
+
+        for i, det in enumerate(dets):
+            # Save detector corners in pixel coordinates
+            self.detector_corners[det] = lookups[i].corners
+            self.warp_dict[det] = out[i]
+
+    def create_tiled_canvas(self):
+        # The canvas and its levels are backed by anonymous temporary
+        # files, which are deleted as soon as they are closed. The levels
+        # stop at the size of a tile, so that tiles stay aligned to their
+        # pixels. Any further levels are small enough to compute.
+        shape = (self.dpanel.rows, self.dpanel.cols)
+        self.canvas_files.clear()
+        images = []
+        while True:
+            canvas_file = tempfile.TemporaryFile()
+            images.append(np.memmap(canvas_file, dtype=np.float32,
+                                    mode='w+', shape=shape))
+            self.canvas_files.append(canvas_file)
+
+            level = len(images)
+            if (2**level > self.tile_size or
+                    min(self.dpanel.rows, self.dpanel.cols) // 2**level <= 1):
+                break
+
+            shape = tuple(-(-x // 2) for x in shape)
+
+        self.img = images[0]
+        self.levels = images[1:]
+        self.rendered_tiles.clear()
+        self.warp_range = None
 
-        dst = panel.cartToPixel(corners, pixels=True)
-        dst = dst[:, ::-1]
+        for det in self.images_dict.keys():
+            self.update_display_transform(det)
 
-        tform3 = tf.ProjectiveTransform()
-        tform3.estimate(src, dst)
+    def update_display_transform(self, det):
+        panel = self.instr._detectors[det]
+        tform, corners = display_panel_transform(panel, self.dplane,
+                                                 self.dpanel)
+        self.display_transforms[det] = tform
 
-        res = tf.warp(img, tform3,
-                      output_shape=(self.dpanel.rows, self.dpanel.cols))
-        self.warp_dict[detector_id] = res
-        return res
+        # Save detector corners in pixel coordinates
+        self.detector_corners[det] = corners
+
+    def tiles_in_view(self, xlim, ylim):
+        # Convert the limits to pixels. Recall that row 0 is at the top.
+        x_min, y_max = self.extent[0], self.extent[3]
+        col_range = [(x - x_min) / self.dpanel.pixel_size_col for x in xlim]
+        row_range = [(y_max - y) / self.dpanel.pixel_size_row for y in ylim]
+
+        tiles = []
+        for ranges, size in ((row_range, self.dpanel.rows),
+                             (col_range, self.dpanel.cols)):
+            start = max(int(np.floor(min(ranges))), 0) // self.tile_size
+            stop = min(int(np.ceil(max(ranges))), size - 1) // self.tile_size
+            tiles.append(range(start, stop + 1))
+
+        return list(itertools.product(*tiles))
+
+    def tile_bounds(self, tile):
+        # The (row, col) offset and the shape of a tile
+        row_offset = tile[0] * self.tile_size
+        col_offset = tile[1] * self.tile_size
+        shape = (min(self.tile_size, self.dpanel.rows - row_offset),
+                 min(self.tile_size, self.dpanel.cols - col_offset))
+        return (row_offset, col_offset), shape
+
+    def tile_warp_lookup(self, det, tile):
+        # The lookups are cached per detector and tile, so that only the
+        # lookups of a detector that moved need to be computed again.
+        key = (self.warp_lookup_key(det), tile)
+        lookup = display_panel_warp_lookup_cache.get(key)
+        if lookup is None:
+            offset, shape = self.tile_bounds(tile)
+            lookup = DisplayPanelWarpLookup(self.display_transforms[det],
+                                            self.detector_corners[det],
+                                            self.images_dict[det].shape,
+                                            shape, offset)
+            display_panel_warp_lookup_cache[key] = lookup
+
+        return lookup
+
+    def warp_tile(self, tile):
+        # Sum the warps of every detector within a tile
+        _, shape = self.tile_bounds(tile)
+        result = np.zeros(shape)
+        for det, img in self.images_dict.items():
+            result += self.tile_warp_lookup(det, tile).warp(img)
+
+        return result
+
+    def tile_regions(self, tile):
+        # The regions of a tile in the image and in each of its levels
+        (row_offset, col_offset), shape = self.tile_bounds(tile)
+        for level, img in enumerate([self.img] + self.levels):
+            factor = 2**level
+            rows = slice(row_offset // factor,
+                         (row_offset + shape[0] - 1) // factor + 1)
+            cols = slice(col_offset // factor,
+                         (col_offset + shape[1] - 1) // factor + 1)
+            yield img, (rows, cols)
+
+    def render_tile(self, tile):
+        result = self.warp_tile(tile)
+
+        # The range of the summed warps is that of the tiles rendered so
+        # far. Rescale the data to match the scale of the original
+        # dataset, as generate_image() does.
+        low, high = result.min(), result.max()
+        if self.warp_range is not None:
+            low = min(low, self.warp_range[0])
+            high = max(high, self.warp_range[1])
+        self.warp_range = (low, high)
+
+        result = np.interp(result, self.warp_range, (self.min, self.max))
+        for img, region in self.tile_regions(tile):
+            if img is not self.img:
+                result = downsample(result)
+            img[region] = result
+
+        self.rendered_tiles[tile] = self.warp_range
+
+    def rescale_tile(self, tile):
+        """Rescale a rendered tile to the current range of the warps
+
+        The rescaling is linear within the range the tile was rendered
+        with, so it applies to the downsampled levels as well.
+        """
+        low, high = self.rendered_tiles[tile]
+        if self.max > self.min and high > low:
+            scale = (high - low) / (self.max - self.min)
+        else:
+            scale = 0
+
+        for img, region in self.tile_regions(tile):
+            warp = low + (img[region] - self.min) * scale
+            img[region] = np.interp(warp, self.warp_range,
+                                    (self.min, self.max))
+
+        self.rendered_tiles[tile] = self.warp_range
+
+    def render_view(self, xlim, ylim):
+        """Render the tiles within the view limits that are not rendered
+
+        If the range of the warps grows, the tiles rendered before are
+        rescaled to it. Returns True if any tiles were rendered.
+        """
+        self.view_limits = (xlim, ylim)
+        tiles = [x for x in self.tiles_in_view(xlim, ylim)
+                 if x not in self.rendered_tiles]
+        for tile in tiles:
+            self.render_tile(tile)
+
+        outdated = [x for x, warp_range in self.rendered_tiles.items()
+                    if warp_range != self.warp_range]
+        for tile in outdated:
+            self.rescale_tile(tile)
+
+        return len(tiles) > 0
 
     def generate_image(self):
         img = np.zeros((self.dpanel.rows, self.dpanel.cols))
@@ -300,6 +715,14 @@ class InstrumentViewer:
         self.instr.detectors[det].tvec = t_conf['translation']
         self.instr.detectors[det].tilt = t_conf['tilt']
 
+        if self.tiled:
+            # Everything in view must be rendered again
+            self.update_display_transform(det)
+            self.warp_range = None
+            self.rendered_tiles.clear()
+            self.render_view(*self.view_limits)
+            return
+
         # Update the individual detector image
         self.create_warped_image(det)
 
@@ -1,17 +1,36 @@
 import numpy as np
+from scipy import sparse
 
 from skimage.exposure import rescale_intensity
 
 from hexrd.transforms.xfcapi import detectorXYToGvec, mapAngle
 
 from hexrd import constants as ct
+from hexrd.gridutil import cellIndices
 from hexrd.xrdutil import _project_on_detector_plane
 
+from hexrd.ui.constants import WarpMode
 from hexrd.ui.hexrd_config import HexrdConfig
-from hexrd.ui.utils import run_snip1d
+from hexrd.ui.parallel_warp import warp_in_parallel
+from hexrd.ui.utils import (
+    array_key, expand_region, LRUCache, panel_geometry_key, run_snip1d,
+    snip_padding
+)
 
 tvec_c = ct.zeros_3
 
+# The warp lookup tables only depend upon the panel geometry and the
+# polar grid, so they are kept around between PolarView instances.
+# This way, changing the frame only requires a gather of the pixels.
+# The cache is bounded by the total size of the lookups, rather than by
+# their number, so that every detector of a large instrument fits.
+polar_warp_lookup_cache = LRUCache(
+    max_size=1024, max_bytes=1024 ** 3, sizeof=lambda x: x.nbytes)
+
+# The sparse warp operators map the concatenated pixels of every
+# detector onto the polar bins, so there is one per instrument state.
+polar_warp_operator_cache = LRUCache(max_size=4)
+
 
 def sqrt_scale_img(img):
     fimg = np.array(img, dtype=float)
@@ -25,6 +44,102 @@ def log_scale_img(img):
     return np.log(fimg)
 
 
+class PolarWarpLookup:
+    """Bilinear interpolation lookup table for warping a panel to polar
+
+    For every polar pixel that lands on the panel, this stores the flat
+    indices of the four surrounding panel pixels and their weights.
+    """
+
+    def __init__(self, panel, xypts, shape):
+        self.shape = shape
+
+        # clip away points too close to or off the edges of the detector
+        xy_clip, on_panel = panel.clip_to_panel(xypts, buffer_edges=True)
+        self.on_panel = np.where(on_panel)[0]
+
+        # grab fractional pixel indices of clipped points
+        ij_frac = panel.cartToPixel(xy_clip)
+
+        # get floors/ceils from array of pixel _centers_
+        i_floor = cellIndices(panel.row_pixel_vec, xy_clip[:, 1]).astype(int)
+        j_floor = cellIndices(panel.col_pixel_vec, xy_clip[:, 0]).astype(int)
+        i_ceil = i_floor + 1
+        j_ceil = j_floor + 1
+
+        w_i_floor = i_ceil - ij_frac[:, 0]
+        w_i_ceil = ij_frac[:, 0] - i_floor
+        w_j_floor = j_ceil - ij_frac[:, 1]
+        w_j_ceil = ij_frac[:, 1] - j_floor
+
+        cols = panel.cols
+        self.indices = np.vstack([
+            i_floor * cols + j_floor,
+            i_floor * cols + j_ceil,
+            i_ceil * cols + j_floor,
+            i_ceil * cols + j_ceil
+        ])
+        self.weights = np.vstack([
+            w_i_floor * w_j_floor,
+            w_i_floor * w_j_ceil,
+            w_i_ceil * w_j_floor,
+            w_i_ceil * w_j_ceil
+        ])
+
+    @property
+    def size(self):
+        return self.shape[0] * self.shape[1]
+
+    @property
+    def nbytes(self):
+        return (self.indices.nbytes + self.weights.nbytes +
+                self.on_panel.nbytes)
+
+    def warp(self, img):
+        result = np.zeros(self.size)
+        values = np.take(img, self.indices)
+        result[self.on_panel] = np.sum(self.weights * values, axis=0)
+        return result.reshape(self.shape)
+
+
+def create_polar_warp_lookup(panel, chi, tvec_s, eta_vec, tth_vec):
+    angpts = np.meshgrid(eta_vec, tth_vec, indexing='ij')
+    shape = angpts[0].shape
+    dummy_ome = np.zeros(angpts[0].size)
+
+    gvec_angs = np.vstack([
+            angpts[1].flatten(),
+            angpts[0].flatten(),
+            dummy_ome]).T
+
+    xypts = np.nan*np.ones((len(gvec_angs), 2))
+    valid_xys, rmats_s, on_plane = _project_on_detector_plane(
+            gvec_angs,
+            panel.rmat, np.eye(3),
+            chi,
+            panel.tvec, tvec_c, tvec_s,
+            panel.distortion,
+            beamVec=panel.bvec)
+    xypts[on_plane] = valid_xys
+
+    return PolarWarpLookup(panel, xypts, shape)
+
+
+def warp_polar_image(img, out, index, panel, chi, tvec_s, eta_vec, tth_vec,
+                     lookup=None):
+    """Warp a detector image into out[index]
+
+    This is meant to be used with warp_in_parallel(). The lookup is
+    created if it is not provided, and it is returned.
+    """
+    if lookup is None:
+        lookup = create_polar_warp_lookup(panel, chi, tvec_s, eta_vec,
+                                          tth_vec)
+
+    out[index] = lookup.warp(img)
+    return lookup
+
+
 class PolarView:
     """Create (two-theta, eta) plot of detectors
     """
@@ -33,13 +148,23 @@ class PolarView:
 
         self.instr = instrument
 
-        self.images_dict = HexrdConfig().current_images_dict()
+        # These are only computed when they are needed, since a polar
+        # view is also created just for its grid (see create_polar_mask)
+        self._images_dict = None
+        self._angular_grid = None
 
         self.warp_dict = {}
+        self.warped_image = None
+        self.rescale_in_range = None
 
+        self.img = None
         self.snip1d_background = None
 
-        self.update_angular_grid()
+    @property
+    def images_dict(self):
+        if self._images_dict is None:
+            self._images_dict = HexrdConfig().current_images_dict()
+        return self._images_dict
 
     @property
     def detectors(self):
@@ -118,12 +243,46 @@ class PolarView:
 
     @property
     def angular_grid(self):
+        if self._angular_grid is None:
+            self.update_angular_grid()
         return self._angular_grid
 
+    @property
+    def eta_vec(self):
+        return self.angular_grid[0][:, 0]
+
+    @property
+    def tth_vec(self):
+        return self.angular_grid[1][0]
+
     @property
     def eta_period(self):
         return HexrdConfig().polar_res_eta_period
 
+    @property
+    def polar_grid_key(self):
+        return (
+            self.tth_min,
+            self.tth_max,
+            self.tth_pixel_size,
+            self.eta_min,
+            self.eta_max,
+            self.eta_pixel_size
+        )
+
+    def warp_lookup_key(self, det):
+        panel = self.detectors[det]
+        return (
+            panel_geometry_key(panel),
+            self.chi,
+            array_key(self.tvec_s),
+            self.polar_grid_key
+        )
+
+    @property
+    def warp_operator_key(self):
+        return tuple(self.warp_lookup_key(det) for det in self.images_dict)
+
     def detector_borders(self, det):
         panel = self.detectors[det]
 
@@ -192,60 +351,186 @@ class PolarView:
 
         return borders
 
-    def create_warp_image(self, det):
-        angpts = self.angular_grid
-        dummy_ome = np.zeros((self.ntth * self.neta))
+    def create_warp_lookup(self, det):
+        key = self.warp_lookup_key(det)
+        lookup = polar_warp_lookup_cache.get(key)
+        if lookup is not None:
+            return lookup
 
-        # lcount = 0
-        panel = self.detectors[det]
+        lookup = create_polar_warp_lookup(self.detectors[det], self.chi,
+                                          self.tvec_s, self.eta_vec,
+                                          self.tth_vec)
+        polar_warp_lookup_cache[key] = lookup
+        return lookup
+
+    def create_warp_image(self, det):
         img = self.images_dict[det]
+        lookup = self.create_warp_lookup(det)
 
-        gvec_angs = np.vstack([
-                angpts[1].flatten(),
-                angpts[0].flatten(),
-                dummy_ome]).T
-
-        xypts = np.nan*np.ones((len(gvec_angs), 2))
-        valid_xys, rmats_s, on_plane = _project_on_detector_plane(
-                gvec_angs,
-                panel.rmat, np.eye(3),
-                self.chi,
-                panel.tvec, tvec_c, self.tvec_s,
-                panel.distortion,
-                beamVec=panel.bvec)
-        xypts[on_plane] = valid_xys
-
-        self.warp_dict[det] = panel.interpolate_bilinear(
-            xypts, img, pad_with_nans=False
-        ).reshape(self.shape)
+        self.warp_dict[det] = lookup.warp(img)
         return self.warp_dict[det]
 
-    def generate_image(self):
+    def create_warp_operator(self):
+        """Create a sparse operator that warps all detectors at once
+
+        The operator maps the flattened detector images, concatenated in
+        the order of the images dict, onto the flattened polar image.
+        """
+        key = self.warp_operator_key
+        operator = polar_warp_operator_cache.get(key)
+        if operator is not None:
+            return operator
+
+        rows, cols, weights = [], [], []
+        offset = 0
+        for det in self.images_dict.keys():
+            lookup = self.create_warp_lookup(det)
+            num_corners = lookup.indices.shape[0]
+            rows.append(np.tile(lookup.on_panel, num_corners))
+            cols.append(lookup.indices.flatten() + offset)
+            weights.append(lookup.weights.flatten())
+
+            panel = self.detectors[det]
+            offset += panel.rows * panel.cols
+
+        # Duplicate entries (overlapping detectors) get summed together
+        operator = sparse.csr_matrix(
+            (np.hstack(weights), (np.hstack(rows), np.hstack(cols))),
+            shape=(self.neta * self.ntth, offset))
+        polar_warp_operator_cache[key] = operator
+        return operator
+
+    def create_sparse_warp_image(self):
+        operator = self.create_warp_operator()
+        frames = np.hstack([
+            np.asarray(img, dtype=float).flatten()
+            for img in self.images_dict.values()
+        ])
+        return (operator @ frames).reshape(self.shape)
+
+    def sum_warped_images(self):
         img = np.zeros(self.shape)
         for key in self.images_dict.keys():
             img += self.warp_dict[key]
 
+        return img
+
+    def update_warped_image(self):
+        if HexrdConfig().polar_sparse_warp:
+            # Warp all of the detectors in one sparse matrix product
+            self.warped_image = self.create_sparse_warp_image()
+            return
+
+        mode = HexrdConfig().parallel_warp_mode
+        if mode == WarpMode.serial:
+            # Create the warped image for each detector
+            for det in self.images_dict.keys():
+                self.create_warp_image(det)
+        else:
+            self.create_warp_images_in_parallel(mode)
+
+        self.warped_image = self.sum_warped_images()
+
+    def create_warp_images_in_parallel(self, mode):
+        dets = list(self.images_dict.keys())
+        keys = [self.warp_lookup_key(det) for det in dets]
+
+        # Every detector is warped into its own slot of this buffer
+        out = np.empty((len(dets),) + self.shape)
+
+        tasks = []
+        for i, (det, key) in enumerate(zip(dets, keys)):
+            args = (self.detectors[det], self.chi, self.tvec_s, self.eta_vec,
+                    self.tth_vec, polar_warp_lookup_cache.get(key))
+            tasks.append((i, self.images_dict[det], args))
+
+        if mode == WarpMode.processes:
+            # Only the projections are worth sending to other processes.
+            # Detectors with cached lookups just need a gather.
+            cached = [x for x in tasks if x[2][-1] is not None]
+            tasks = [x for x in tasks if x[2][-1] is None]
+            warp_in_parallel(warp_polar_image, cached, out)
+
+        lookups = warp_in_parallel(warp_polar_image, tasks, out, mode)
+        for (i, _, _), lookup in zip(tasks, lookups):
+            polar_warp_lookup_cache[keys[i]] = lookup
+
+        for i, det in enumerate(dets):
+            self.warp_dict[det] = out[i]
+
+    def detector_region(self, lookup):
+        """The bounding box of a detector's contribution to the image
+
+        This is returned as a tuple of slices, or None if the detector
+        does not contribute anything to the image.
+        """
+        if len(lookup.on_panel) == 0:
+            return None
+
+        rows, cols = np.unravel_index(lookup.on_panel, self.shape)
+        return (slice(rows.min(), rows.max() + 1),
+                slice(cols.min(), cols.max() + 1))
+
+    def generate_image(self, region=None):
+        """Rescale, subtract the background, and apply the masks
+
+        If a region (a tuple of slices) is provided, only that part of
+        the image is re-generated, if possible.
+        """
+        img = self.warped_image
+
+        # Rescale the data to match the scale of the original dataset
+        in_range = (img.min(), img.max())
+        if in_range != self.rescale_in_range or self.img is None:
+            # The rescaling changed, so the whole image is affected
+            region = None
+        self.rescale_in_range = in_range
+
+        apply_snip1d = HexrdConfig().polar_apply_snip1d
+        if apply_snip1d and self.snip1d_background is None:
+            region = None
+
+        if region is None:
+            region = (slice(0, self.neta), slice(0, self.ntth))
+            self.img = np.zeros(self.shape)
+            self.snip1d_background = (
+                np.zeros(self.shape) if apply_snip1d else None)
+
+        # The background of a pixel depends upon its neighbors, so a
+        # change within the region affects the background around it, and
+        # the background around it depends upon its own neighbors.
+        padded = region
+        if apply_snip1d:
+            padding = snip_padding()
+            region = expand_region(region, padding, self.shape)
+            padded = expand_region(region, padding, self.shape)
+
         # ??? do log scaling here
         # img = log_scale_img(log_scale_img(sqrt_scale_img(img)))
 
-        # Rescale the data to match the scale of the original dataset
-        img = rescale_intensity(img, out_range=(self.min, self.max))
+        img = rescale_intensity(img[padded], in_range=in_range,
+                                out_range=(self.min, self.max))
+
+        # The part of the padded image that is in the region
+        inner = tuple(slice(r.start - p.start, r.stop - p.start)
+                      for r, p in zip(region, padded))
 
-        if HexrdConfig().polar_apply_snip1d:
-            self.snip1d_background = run_snip1d(img)
+        if apply_snip1d:
+            # The region must be thresholded like the whole image, whose
+            # minimum is self.min after the rescaling
+            background = run_snip1d(img, threshold=self.min)
             # Perform the background subtraction
-            img -= self.snip1d_background
-        else:
-            self.snip1d_background = None
+            img -= background
+            self.snip1d_background[region] = background[inner]
+
+        img = img[inner]
 
         # Apply masks if they are present
-        masks = HexrdConfig().polar_masks.items()
-        visible = HexrdConfig().visible_masks
-        visible_masks = [mask for name, mask in masks if name in visible]
-        for mask in visible_masks:
-            img[~mask] = 0
+        mask = HexrdConfig().polar_masks.combined(HexrdConfig().visible_masks)
+        if mask is not None:
+            img[~mask[region]] = 0
 
-        self.img = img
+        self.img[region] = img
 
     def warp_all_images(self):
         # Cache the image max and min for later use
@@ -253,14 +538,19 @@ class PolarView:
         self.min = min([x.min() for x in images])
         self.max = max([x.max() for x in images])
 
-        # Create the warped image for each detector
-        for det in self.images_dict.keys():
-            self.create_warp_image(det)
+        self.update_warped_image()
 
         # Generate the final image
         self.generate_image()
 
     def update_detector(self, det):
+        # Grab the current contribution of this detector. In sparse mode
+        # it is not stored, but the lookup for it is still cached.
+        old_lookup = self.create_warp_lookup(det)
+        if det not in self.warp_dict:
+            self.warp_dict[det] = old_lookup.warp(self.images_dict[det])
+        old_warp = self.warp_dict[det]
+
         # First, convert to the "None" angle convention
         iconfig = HexrdConfig().instrument_config_none_euler_convention
 
@@ -268,8 +558,25 @@ class PolarView:
         self.instr.detectors[det].tvec = t_conf['translation']
         self.instr.detectors[det].tilt = t_conf['tilt']
 
-        # Update the individual detector image
-        self.create_warp_image(det)
+        # Update the individual detector image, and swap it into the sum
+        new_warp = self.create_warp_image(det)
+        self.warped_image -= old_warp
+        self.warped_image += new_warp
+
+        # Only the parts of the image the detector covered before or
+        # covers now need to be re-generated.
+        regions = [self.detector_region(old_lookup),
+                   self.detector_region(self.create_warp_lookup(det))]
+        regions = [x for x in regions if x is not None]
+        if not regions:
+            # Nothing changed
+            return
+
+        region = tuple(
+            slice(min(x[i].start for x in regions),
+                  max(x[i].stop for x in regions))
+            for i in range(2)
+        )
 
         # Generate the final image
-        self.generate_image()
+        self.generate_image(region)
@@ -40,6 +40,12 @@ class ViewType:
     polar = 'polar'
 
 
+class WarpMode:
+    serial = 'serial'
+    threads = 'threads'
+    processes = 'processes'
+
+
 class OverlayType(Enum):
     powder = 'powder'
     laue = 'laue'
@@ -5,15 +5,71 @@ from skimage.draw import polygon
 from hexrd.ui.create_hedm_instrument import create_hedm_instrument
 from hexrd.ui.calibration.polarview import PolarView
 from hexrd.ui.hexrd_config import HexrdConfig
+from hexrd.ui.utils import array_key
 
 
-def convert_raw_to_polar(det, line):
-    panel = create_hedm_instrument().detectors[det]
+def convert_raw_to_polar(det, line, instr=None):
+    if instr is None:
+        instr = create_hedm_instrument()
+
+    panel = instr.detectors[det]
     cart = panel.pixelToCart(line)
     tth, gvec = panel.cart_to_angles(cart)
     return [np.degrees(tth)]
 
 
+def polar_mask_key(line_data):
+    # Everything that a polar mask depends upon: its line data, and the
+    # polar grid
+    return (
+        tuple(array_key(line) for line in line_data),
+        HexrdConfig().polar_res_tth_min,
+        HexrdConfig().polar_res_tth_max,
+        HexrdConfig().polar_pixel_size_tth,
+        HexrdConfig().polar_res_eta_min,
+        HexrdConfig().polar_res_eta_max,
+        HexrdConfig().polar_pixel_size_eta,
+    )
+
+
+def update_polar_mask(line_data, name):
+    # Only create the mask if it has changed
+    key = polar_mask_key(line_data)
+    if HexrdConfig().polar_masks.key(name) != key:
+        create_polar_mask(line_data, name)
+        mask = HexrdConfig().polar_masks[name]
+        HexrdConfig().polar_masks.set_with_key(name, mask, key)
+
+
+def rebuild_polar_masks():
+    """Update the polar masks from their line data
+
+    Masks are only created again if their line data, the polar grid, or
+    (for masks drawn on the raw view) the instrument geometry changed.
+    """
+    names = set()
+    for name, line_data in HexrdConfig().polar_masks_line_data.items():
+        if not isinstance(line_data, list):
+            line_data = [line_data]
+        update_polar_mask(line_data, name)
+        names.add(name)
+
+    instr = None
+    for name, value in HexrdConfig().raw_masks_line_data.items():
+        if instr is None:
+            instr = create_hedm_instrument()
+
+        det, data = value[0]
+        line_data = convert_raw_to_polar(det, data, instr)
+        update_polar_mask(line_data, name)
+        names.add(name)
+
+    # Remove any masks that no longer exist
+    for name in list(HexrdConfig().polar_masks):
+        if name not in names:
+            del HexrdConfig().polar_masks[name]
+
+
 def create_polar_mask(line_data, name):
     # Calculate current image dimensions
     pv = PolarView(None)
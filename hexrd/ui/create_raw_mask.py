@@ -3,23 +3,66 @@ import numpy as np
 
 from skimage.draw import polygon
 
+from hexrd import imageseries
+from hexrd.imageseries.process import ProcessedImageSeries
+
 from hexrd.ui import constants
 from hexrd.ui.create_hedm_instrument import create_hedm_instrument
 from hexrd.ui.hexrd_config import HexrdConfig
+from hexrd.ui.utils import array_key
+
+
+class ThresholdMaskedImageSeries(ProcessedImageSeries):
+    """An imageseries with the pixels that meet a threshold set to zero
+
+    The threshold is an operation in the processing chain, so it is
+    applied to each frame when the frame is read. The mask of any frame
+    is available from mask().
+    """
+
+    THRESHOLD = 'threshold'
+
+    def __init__(self, ims, comparison, value):
+        if isinstance(ims, list):
+            # Aggregated images are stored as a list of frames
+            ims = imageseries.open(None, 'array', data=np.array(ims))
+
+        self._base = ims
+        self._threshold_args = (comparison, value)
+        super().__init__(ims, [(self.THRESHOLD, (comparison, value))])
+        self.addop(self.THRESHOLD, self._threshold)
+
+    def _threshold(self, img, data):
+        mask = _create_threshold_mask(img, *data)
+        return np.where(mask, img.dtype.type(0), img)
+
+    def mask(self, idx):
+        """Get the mask of the pixels that were set to zero in a frame"""
+        return _create_threshold_mask(self._base[idx], *self._threshold_args)
 
 
 def apply_threshold_mask(imageseries):
     comparison = HexrdConfig().threshold_comparison
     value = HexrdConfig().threshold_value
+    masked = {}
     for det in HexrdConfig().detector_names:
-        ims = imageseries[det]
-        masked_ims = [None for i in range(len(ims))]
-        for idx in range(len(ims)):
-            img = copy.copy(ims[idx])
-            masked_img, mask = _create_threshold_mask(img, comparison, value)
-            masked_ims[idx] = masked_img
-            HexrdConfig().set_threshold_mask(mask)
-        HexrdConfig().imageseries_dict[det] = masked_ims
+        ims = ThresholdMaskedImageSeries(imageseries[det], comparison, value)
+        HexrdConfig().imageseries_dict[det] = ims
+        masked[det] = ims
+    HexrdConfig().set_threshold_mask(masked)
+
+
+def threshold_mask_arrays(idx=None):
+    """Get the threshold mask of a frame of every detector as arrays
+
+    The frame defaults to the current one. The arrays are keyed by
+    'threshold_<detector>', so they may be saved alongside other masks.
+    """
+    if idx is None:
+        idx = HexrdConfig().current_imageseries_idx
+
+    masked = HexrdConfig().threshold_mask or {}
+    return {f'threshold_{det}': ims.mask(idx) for det, ims in masked.items()}
 
 
 def remove_threshold_mask(ims_dict_copy):
@@ -27,26 +70,90 @@ def remove_threshold_mask(ims_dict_copy):
 
 
 def _create_threshold_mask(img, comparison, value):
-    mask = np.ones(img.shape, dtype=bool)
     if comparison == constants.UI_THRESHOLD_LESS_THAN:
-        mask = (img < value)
+        return img < value
     elif comparison == constants.UI_THRESHOLD_GREATER_THAN:
-        mask = (img > value)
+        return img > value
     elif comparison == constants.UI_THRESHOLD_EQUAL_TO:
-        mask = (img == value)
-    img[mask] = 0
-    return img, mask
+        return img == value
+    return np.ones(img.shape, dtype=bool)
+
 
+def convert_polar_to_raw(line, instr=None):
+    if instr is None:
+        instr = create_hedm_instrument()
 
-def convert_polar_to_raw(line):
     line_data = []
-    for key, panel in create_hedm_instrument().detectors.items():
+    for key, panel in instr.detectors.items():
         cart = panel.angles_to_cart(np.radians(line))
         raw = panel.cartToPixel(cart)
         line_data.append((key, raw))
     return line_data
 
 
+def detector_shapes():
+    # The shape of the images of each detector, from the instrument
+    detectors = HexrdConfig().instrument_config['detectors']
+    return {
+        det: (config['pixels']['rows'], config['pixels']['columns'])
+        for det, config in detectors.items()
+    }
+
+
+def raw_mask_key(line_data, shapes):
+    # Everything that a raw mask depends upon: its line data, and the
+    # shape of the images
+    return tuple(
+        (det, array_key(data), shapes.get(det)) for det, data in line_data
+    )
+
+
+def update_raw_mask(name, line_data, shapes):
+    # Only create the mask if it has changed
+    key = raw_mask_key(line_data, shapes)
+    if HexrdConfig().raw_masks.key(name) == key:
+        return
+
+    HexrdConfig().raw_masks.pop(name, None)
+    create_raw_mask(name, line_data)
+    if name in HexrdConfig().raw_masks:
+        value = HexrdConfig().raw_masks[name]
+        HexrdConfig().raw_masks.set_with_key(name, value, key)
+    else:
+        # It does not cover any pixels. Remember that it is empty.
+        HexrdConfig().raw_masks.set_empty(name, key)
+
+
+def rebuild_raw_masks():
+    """Update the raw masks from their line data
+
+    Masks are only created again if their line data, the image shapes,
+    or (for masks drawn on the polar view) the instrument geometry
+    changed.
+    """
+    shapes = detector_shapes()
+    names = set()
+    for name, line_data in HexrdConfig().raw_masks_line_data.items():
+        update_raw_mask(name, line_data, shapes)
+        names.add(name)
+
+    instr = None
+    for name, data in HexrdConfig().polar_masks_line_data.items():
+        if isinstance(data, list):
+            # These are Laue spots
+            continue
+
+        if instr is None:
+            instr = create_hedm_instrument()
+
+        line_data = convert_polar_to_raw(data, instr)
+        update_raw_mask(name, line_data, shapes)
+        names.add(name)
+
+    # Remove any masks that no longer exist
+    HexrdConfig().raw_masks.prune(names)
+
+
 def create_raw_mask(name, line_data):
     for line in line_data:
         det, data = line
@@ -0,0 +1,120 @@
+import hashlib
+import os
+import threading
+
+import numpy as np
+
+from PySide2.QtCore import QStandardPaths
+
+
+# Change this if the way that darks are computed changes, so that old
+# cached darks are not used.
+DARK_CACHE_VERSION = 1
+
+
+def dark_fingerprint(paths, **params):
+    """Compute a fingerprint for a dark computed from some files
+
+    The fingerprint covers the path, modification time, and size of
+    every file, along with any parameters of the aggregation. None is
+    returned if any of the files do not exist.
+    """
+    sha = hashlib.sha256()
+    sha.update(repr(DARK_CACHE_VERSION).encode())
+    for path in paths:
+        path = os.path.abspath(path)
+        if not os.path.isfile(path):
+            return None
+
+        stat = os.stat(path)
+        sha.update(repr((path, stat.st_mtime_ns, stat.st_size)).encode())
+
+    sha.update(repr(sorted(params.items())).encode())
+    return sha.hexdigest()
+
+
+class DarkCache:
+    """A cache of computed dark images on disk
+
+    Each dark is stored as a compressed npz file, named after its
+    fingerprint. When the cache grows beyond max_bytes, the darks that
+    were least recently used are removed.
+    """
+
+    max_bytes = 2 * 1024**3
+
+    def __init__(self, directory=None):
+        if directory is None:
+            location = QStandardPaths.writableLocation(
+                QStandardPaths.CacheLocation)
+            directory = os.path.join(location, 'darks')
+
+        self.directory = directory
+        self.lock = threading.Lock()
+
+    def path(self, fingerprint):
+        return os.path.join(self.directory, f'{fingerprint}.npz')
+
+    def load(self, fingerprint):
+        if fingerprint is None:
+            return None
+
+        path = self.path(fingerprint)
+        try:
+            with np.load(path) as f:
+                dark = f['dark']
+        except (OSError, KeyError, ValueError):
+            return None
+
+        # Mark it as recently used
+        os.utime(path)
+        return dark
+
+    def save(self, fingerprint, dark):
+        if fingerprint is None:
+            return
+
+        with self.lock:
+            try:
+                os.makedirs(self.directory, exist_ok=True)
+
+                # Write to a temporary file first so that a partially
+                # written dark is never loaded.
+                path = self.path(fingerprint)
+                tmp_path = f'{path}.{threading.get_ident()}.tmp'
+                with open(tmp_path, 'wb') as f:
+                    np.savez_compressed(f, dark=dark)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f'Failed to save dark to the cache: {e}')
+                return
+
+            self.evict()
+
+    def evict(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.npz'):
+                continue
+
+            stat = os.stat(os.path.join(self.directory, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+
+        # Remove the least recently used first
+        entries.sort()
+        total = sum(x[1] for x in entries)
+        for _, size, name in entries:
+            if total <= self.max_bytes:
+                break
+
+            os.remove(os.path.join(self.directory, name))
+            total -= size
+
+    def clear(self):
+        with self.lock:
+            if not os.path.isdir(self.directory):
+                return
+
+            for name in os.listdir(self.directory):
+                if name.endswith('.npz'):
+                    os.remove(os.path.join(self.directory, name))
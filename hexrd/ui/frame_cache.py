@@ -0,0 +1,189 @@
+from concurrent.futures import ThreadPoolExecutor, wait
+import logging
+import threading
+
+from hexrd.ui.utils import LRUCache
+
+logger = logging.getLogger(__name__)
+
+
+class FrameCache:
+    """A bounded LRU cache of processed imageseries frames
+
+    Frames are cached per (detector name, frame index). Each entry keeps
+    a reference to the imageseries it was read from, so that replacing
+    an imageseries invalidates its frames.
+
+    The cache is bounded by the total size of its frames, for all
+    detectors combined. A background thread prefetches the frames around
+    the current one, in the direction that the frames are being scrubbed.
+    The number of frames prefetched is scaled to the number and size of
+    the detectors, so that the prefetched frames stay within a fraction
+    of the budget. The hits and misses are counted so that the cache can
+    be sized. They are shown in the frame cache dialog of the main
+    window, and logged when the cache is cleared.
+    """
+
+    # The default budget for the frames, in bytes
+    default_max_bytes = 1024 ** 3
+
+    # The maximum number of frames to keep, for all detectors combined
+    max_size = 1024
+
+    # The most frames to prefetch on either side of the current one
+    prefetch_count = 4
+
+    # The fraction of the budget that the prefetched frames may use
+    prefetch_fraction = 0.5
+
+    def __init__(self, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = self.default_max_bytes
+
+        self.frames = LRUCache(max_size=self.max_size, max_bytes=max_bytes,
+                               sizeof=lambda entry: entry[1].nbytes)
+        self.frame_nbytes = {}
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+
+        # Used to skip prefetches that were queued for an older frame
+        self.generation = 0
+
+        self.last_idx = None
+        self.direction = 1
+
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, name, ims, idx):
+        """Get a copy of a processed frame, reading it if needed"""
+        key = (name, idx)
+        entry = self.frames.get(key)
+        if entry is None or entry[0] is not ims:
+            with self.lock:
+                future = self.pending.get(key)
+
+            if future is not None:
+                # It is being prefetched right now. Wait for it.
+                wait([future])
+                entry = self.frames.get(key)
+
+        if entry is not None and entry[0] is ims:
+            self.hits += 1
+            frame = entry[1]
+        else:
+            self.misses += 1
+            frame = ims[idx]
+            self._store(key, ims, frame)
+
+        # The caller is free to modify the frame
+        return frame.copy()
+
+    def prefetch(self, ims_dict, idx):
+        """Prefetch the frames around idx in the background
+
+        The frames in the scrub direction are prefetched first.
+        """
+        if self.last_idx is not None and idx != self.last_idx:
+            self.direction = 1 if idx > self.last_idx else -1
+        self.last_idx = idx
+
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+
+        offsets = list(range(1, self.prefetch_depth(ims_dict) + 1))
+        indices = [idx + self.direction * i for i in offsets]
+        indices += [idx - self.direction * i for i in offsets]
+
+        for i in indices:
+            for name, ims in list(ims_dict.items()):
+                if not 0 <= i < len(ims):
+                    continue
+
+                key = (name, i)
+                entry = self.frames.get(key)
+                if entry is not None and entry[0] is ims:
+                    continue
+
+                with self.lock:
+                    if key in self.pending:
+                        continue
+
+                    self.pending[key] = self.executor.submit(
+                        self._load, key, ims, generation)
+
+    @property
+    def max_bytes(self):
+        return self.frames.max_bytes
+
+    @max_bytes.setter
+    def max_bytes(self, v):
+        self.frames.set_max_bytes(v)
+
+    def prefetch_depth(self, ims_dict):
+        """The number of frames to prefetch on either side
+
+        This keeps the prefetched frames of every detector within
+        prefetch_fraction of the budget. The frame sizes are those of
+        the frames that have been read so far.
+        """
+        step = sum(self.frame_nbytes.get(name, 0) for name in ims_dict)
+        if step == 0:
+            # Nothing has been read yet. Only prefetch the next frame.
+            return min(1, self.prefetch_count)
+
+        budget = self.prefetch_fraction * self.max_bytes
+        return min(self.prefetch_count, int(budget // (2 * step)))
+
+    def _store(self, key, ims, frame):
+        self.frame_nbytes[key[0]] = frame.nbytes
+        self.frames[key] = (ims, frame)
+
+    def _load(self, key, ims, generation):
+        try:
+            if generation == self.generation:
+                self._store(key, ims, ims[key[1]])
+        finally:
+            with self.lock:
+                self.pending.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            # Skip anything that is still queued
+            self.generation += 1
+
+        if self.hits or self.misses:
+            logger.info('Frame cache: %s', self.stats_message)
+        self.reset_stats()
+
+        self.frames.clear()
+        self.frame_nbytes.clear()
+        self.last_idx = None
+        self.direction = 1
+
+    def reset_stats(self):
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': 100 * self.hits / total if total else 0.0,
+            'size': len(self.frames),
+            'nbytes': self.frames.nbytes,
+            'max_bytes': self.max_bytes,
+        }
+
+    @property
+    def stats_message(self):
+        mb = 1024 ** 2
+        stats = self.stats
+        return (f'{stats["hits"]} hits, {stats["misses"]} misses '
+                f'({stats["hit_rate"]:.0f}%), {stats["size"]} frames, '
+                f'{stats["nbytes"] / mb:.0f} of {stats["max_bytes"] / mb:.0f} '
+                'MB')
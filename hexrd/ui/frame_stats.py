@@ -0,0 +1,179 @@
+import numpy as np
+
+
+class StreamingMedian:
+    """Approximate per-pixel median of a stream of frames
+
+    This is the remedian: frames are collected in a buffer of base
+    frames, and when it is full, its median is passed on to the buffer
+    of the next level, and so on. Only base frames per level are kept,
+    and the number of levels grows logarithmically with the number of
+    frames. If there are no more than base frames, the median is exact.
+
+    The buffers are float32, so the memory used is about 4 * base bytes
+    per pixel per level (see nbytes()). For 1000 frames of a 4096x4096
+    detector, that is 3 levels of 11 frames, or about 2.2 GB, so the
+    number of detectors done at once should be bounded by memory.
+
+    See Rousseeuw and Bassett, "The Remedian: A Robust Averaging Method
+    for Large Data Sets", JASA 85 (1990).
+    """
+
+    base = 11
+
+    def __init__(self):
+        # The buffer and the number of frames in it, for each level
+        self.levels = []
+
+    @classmethod
+    def num_levels(cls, num_frames):
+        levels = 1
+        while cls.base**levels <= num_frames:
+            levels += 1
+        return levels
+
+    @classmethod
+    def nbytes(cls, shape, num_frames):
+        """The most memory used for num_frames frames of a shape"""
+        frame_size = int(np.prod(shape)) * np.dtype(np.float32).itemsize
+        return cls.num_levels(num_frames) * cls.base * frame_size
+
+    def add(self, frame, level=0):
+        if level == len(self.levels):
+            buffer = np.empty((self.base,) + np.shape(frame),
+                              dtype=np.float32)
+            self.levels.append([buffer, 0])
+
+        buffer, count = self.levels[level]
+        buffer[count] = frame
+        self.levels[level][1] = count = count + 1
+        if count == self.base:
+            # The buffer is overwritten, since it is about to be reused
+            median = np.median(buffer, axis=0, overwrite_input=True)
+            self.levels[level][1] = 0
+            self.add(median, level + 1)
+
+    @property
+    def median(self):
+        values = []
+        weights = []
+        for level, (buffer, count) in enumerate(self.levels):
+            values += list(buffer[:count])
+            weights += [self.base**level] * count
+
+        if not values:
+            return None
+
+        if len(set(weights)) == 1:
+            return np.median(values, axis=0)
+
+        # Take the weighted median of what is left in the buffers. Each
+        # value stands for base**level frames. Go through the rows in
+        # blocks to limit the size of the sort indices.
+        values = np.asarray(values)
+        weights = np.asarray(weights)
+        result = np.empty(values.shape[1:], dtype=values.dtype)
+        block_size = 256
+        for start in range(0, values.shape[1], block_size):
+            block = values[:, start:start + block_size]
+            order = np.argsort(block, axis=0)
+            cumulative = np.cumsum(weights[order], axis=0)
+            half = np.argmax(cumulative >= cumulative[-1] / 2, axis=0)
+            block = np.take_along_axis(block, order, axis=0)
+            result[start:start + block_size] = np.take_along_axis(
+                block, half[np.newaxis], axis=0)[0]
+
+        return result
+
+
+class FrameStats:
+    """Per-pixel statistics of a stream of frames, computed in one pass
+
+    The mean and maximum are exact, and the median is approximate (see
+    StreamingMedian). Only the statistics that are requested are
+    computed.
+    """
+
+    def __init__(self, stats=('mean', 'max', 'median')):
+        self.stats = stats
+        self.count = 0
+        self.sum = None
+        self.max = None
+        self._median = StreamingMedian() if 'median' in stats else None
+
+    @staticmethod
+    def nbytes(shape, num_frames, stats=('mean', 'max', 'median')):
+        """Estimate the most memory used for num_frames frames of a shape
+
+        This includes the frame that is being added.
+        """
+        size = int(np.prod(shape))
+        result = size * np.dtype(np.float64).itemsize
+        if 'mean' in stats:
+            result += size * np.dtype(np.float64).itemsize
+        if 'max' in stats:
+            result += size * np.dtype(np.float64).itemsize
+        if 'median' in stats:
+            result += StreamingMedian.nbytes(shape, num_frames)
+        return result
+
+    def add(self, frame):
+        self.count += 1
+        if 'mean' in self.stats:
+            if self.sum is None:
+                self.sum = np.zeros(frame.shape, dtype=np.float64)
+            self.sum += frame
+
+        if 'max' in self.stats:
+            if self.max is None:
+                self.max = frame.copy()
+            else:
+                np.maximum(self.max, frame, out=self.max)
+
+        if self._median is not None:
+            self._median.add(frame)
+
+    @property
+    def mean(self):
+        if self.sum is None:
+            return None
+        return self.sum / self.count
+
+    @property
+    def median(self):
+        if self._median is None:
+            return None
+        return self._median.median
+
+    def get(self, stat):
+        return getattr(self, stat)
+
+
+def frame_stats_iter(ims, nchunk, frame_lists, stats=('mean', 'max',
+                                                      'median'),
+                     cancel_event=None):
+    """Compute FrameStats over several lists of frames in one read
+
+    Each frame of the imageseries is read once, even if it is in more
+    than one of the frame lists. The frames are processed in nchunk
+    chunks, and the list of FrameStats (one per frame list) is yielded
+    after each chunk.
+
+    If cancel_event is set, reading stops before the next frame, and the
+    iteration ends early. The caller should check cancel_event afterward.
+    """
+    results = [FrameStats(stats) for _ in frame_lists]
+    frame_sets = [set(x) for x in frame_lists]
+    frames = sorted(set().union(*frame_sets))
+
+    for chunk in np.array_split(np.asarray(frames, dtype=int), nchunk):
+        for i in chunk:
+            if cancel_event is not None and cancel_event.is_set():
+                return
+
+            frame = ims[i]
+            for result, frame_set in zip(results, frame_sets):
+                if i in frame_set:
+                    result.add(frame)
+
+        yield results
@@ -0,0 +1,131 @@
+import os
+import threading
+
+import h5py
+import numpy as np
+
+from hexrd.imageseries.baseclass import ImageSeries
+from hexrd.imageseries.load import ImageSeriesAdapter
+
+from hexrd.ui.utils import LRUCache
+
+
+class HDF5FilePool:
+    """A pool of open, read-only HDF5 files
+
+    Opening an HDF5 file is slow, so the files are kept open and shared
+    between imageseries. When more than max_size files have been
+    opened, the least recently used one is dropped from the pool. It is
+    closed once nothing is reading from it.
+    """
+
+    max_size = 32
+
+    def __init__(self):
+        self.files = LRUCache(max_size=self.max_size)
+        self.lock = threading.Lock()
+
+    def get(self, path):
+        # A file that changed on disk is opened again
+        path = os.path.abspath(path)
+        key = (path, os.stat(path).st_mtime_ns)
+        with self.lock:
+            f = self.files.get(key)
+            if f is None or not f.id.valid:
+                f = h5py.File(path, 'r')
+                self.files[key] = f
+        return f
+
+    def clear(self):
+        self.files.clear()
+
+
+hdf5_file_pool = HDF5FilePool()
+
+
+class HDF5Adapter(ImageSeriesAdapter):
+    """An imageseries adapter that reads frames from an HDF5 dataset
+
+    Opening one only reads the dataset's metadata. A 2D dataset is a
+    single frame, and a 3D dataset is a stack of frames along the first
+    axis. Frames are read a chunk of the dataset at a time, and the last
+    chunk that was read is kept, so that reading the frames in order
+    reads every chunk once. The frames that are kept are capped at
+    max_block_bytes, down to a single frame if a frame is larger than
+    that.
+
+    For a 3D dataset, the attributes of the group are the metadata, as
+    with the 'hdf5' adapter.
+    """
+
+    # The most bytes of frames to read and keep at once
+    max_block_bytes = 64 * 1024**2
+
+    def __init__(self, fname, path, dataname):
+        f = hdf5_file_pool.get(fname)
+        self._dset = f['/'.join([path, dataname])]
+        if self._dset.ndim not in (2, 3):
+            msg = f'Expected a 2D or 3D dataset, but it is {self._dset.ndim}D'
+            raise ValueError(msg)
+
+        # Raw two dimensional data has no metadata
+        self._meta = {}
+        if self._dset.ndim == 3:
+            for k, v in f[path].attrs.items():
+                if isinstance(v, bytes):
+                    v = v.decode()
+                self._meta[k] = v
+
+        chunks = self._dset.chunks
+        if self._dset.ndim == 3 and chunks is not None:
+            shape = self._dset.shape
+            frame_nbytes = shape[1] * shape[2] * self._dset.dtype.itemsize
+            max_frames = self.max_block_bytes // max(frame_nbytes, 1)
+            self._block_size = min(chunks[0], max(1, max_frames))
+        else:
+            self._block_size = 1
+
+        self._block = None
+        self._block_start = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._dset.shape[0] if self._dset.ndim == 3 else 1
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __getitem__(self, key):
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(f'frame {key} is out of range')
+
+        if self._dset.ndim == 2:
+            return self._dset[()]
+
+        start = key - key % self._block_size
+        with self._lock:
+            if self._block_start != start:
+                stop = min(start + self._block_size, len(self))
+                self._block = self._dset[start:stop]
+                self._block_start = start
+
+            return np.array(self._block[key - start])
+
+    @property
+    def dtype(self):
+        return self._dset.dtype
+
+    @property
+    def shape(self):
+        return self._dset.shape[-2:]
+
+    @property
+    def metadata(self):
+        return self._meta
+
+
+def open_hdf5(fname, path, dataname):
+    """Open an HDF5 dataset as an imageseries, without reading it"""
+    return ImageSeries(HDF5Adapter(fname, path, dataname))
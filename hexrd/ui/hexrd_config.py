@@ -14,6 +14,11 @@ from hexrd.material import load_materials_hdf5, save_materials_hdf5, Material
 from hexrd.valunits import valWUnit
 
 from hexrd.ui import constants
+from hexrd.ui.frame_cache import FrameCache
+from hexrd.ui.imageseries_exporter import (
+    FrameCacheExporter, HDF5Exporter, write_frame_caches
+)
+from hexrd.ui.mask_registry import MaskRegistry
 from hexrd.ui import overlays
 from hexrd.ui import resource_loader
 from hexrd.ui import utils
@@ -139,6 +144,7 @@ class HexrdConfig(QObject, metaclass=Singleton):
         self.images_dir = None
         self.imageseries_dict = {}
         self.current_imageseries_idx = 0
+        self.frame_cache = FrameCache()
         self.hdf5_path = []
         self.live_update = True
         self._show_saturation_level = False
@@ -146,9 +152,9 @@ class HexrdConfig(QObject, metaclass=Singleton):
         self.previous_active_material = None
         self.collapsed_state = []
         self.load_panel_state = {}
-        self.polar_masks = {}
+        self.polar_masks = MaskRegistry()
         self.polar_masks_line_data = {}
-        self.raw_masks = {}
+        self.raw_masks = MaskRegistry(detector_masks=True)
         self.raw_masks_line_data = {}
         self.visible_masks = []
         self.backup_tth_maxes = {}
@@ -207,6 +213,8 @@ class HexrdConfig(QObject, metaclass=Singleton):
         settings.setValue('working_dir', self.working_dir)
         settings.setValue('hdf5_path', self.hdf5_path)
         settings.setValue('live_update', self.live_update)
+        settings.setValue('frame_cache_max_bytes',
+                          self.frame_cache_max_bytes)
         settings.setValue('euler_angle_convention', self.euler_angle_convention)
         settings.setValue('active_material', self.active_material_name)
         settings.setValue('collapsed_state', self.collapsed_state)
@@ -234,6 +242,8 @@ class HexrdConfig(QObject, metaclass=Singleton):
         self.hdf5_path = settings.value('hdf5_path', None)
         # All QSettings come back as strings.
         self.live_update = settings.value('live_update', 'true') == 'true'
+        self.set_frame_cache_max_bytes(int(settings.value(
+            'frame_cache_max_bytes', FrameCache.default_max_bytes)))
 
         default_convention = constants.DEFAULT_EULER_ANGLE_CONVENTION
         conv = settings.value('euler_angle_convention', default_convention)
@@ -365,7 +375,10 @@ class HexrdConfig(QObject, metaclass=Singleton):
                 self._recursive_set_defaults(current[key], default[key])
 
     def image(self, name, idx):
-        return self.imageseries(name)[idx]
+        return self.frame_cache.get(name, self.imageseries(name), idx)
+
+    def prefetch_frames(self, idx):
+        self.frame_cache.prefetch(self.imageseries_dict, idx)
 
     def imageseries(self, name):
         return self.imageseries_dict.get(name)
@@ -381,12 +394,43 @@ class HexrdConfig(QObject, metaclass=Singleton):
 
         return ret
 
-    def save_imageseries(self, ims, name, write_file, selected_format, **kwargs):
+    def save_imageseries(self, ims, name, write_file, selected_format,
+                         update_progress=None, **kwargs):
+        # Returns the throughput statistics for HDF5 and frame-cache, and
+        # None otherwise
+        if selected_format == 'hdf5':
+            path = kwargs.pop('path', 'imageseries')
+            exporter = HDF5Exporter(write_file, **kwargs)
+            exporter.add(ims, path)
+            return exporter.write(update_progress)
+        elif selected_format == 'frame-cache':
+            exporter = FrameCacheExporter(ims, write_file,
+                                          kwargs['threshold'])
+            return exporter.write(update_progress)
+
         hexrd.imageseries.save.write(ims, write_file, selected_format,
                                      **kwargs)
 
+    def save_all_imageseries(self, ims_dict, write_file, selected_format,
+                             update_progress=None, **kwargs):
+        # For HDF5, every imageseries is written to one file, in a group
+        # named after the detector under the path. For frame-cache, each
+        # is written to its own file. Either way, the detectors are
+        # processed concurrently. Returns the throughput statistics for
+        # HDF5.
+        if selected_format == 'hdf5':
+            path = kwargs.pop('path', 'imageseries')
+            exporter = HDF5Exporter(write_file, **kwargs)
+            for name, ims in ims_dict.items():
+                exporter.add(ims, f'{path}/{name}')
+            return exporter.write(update_progress)
+
+        write_frame_caches(ims_dict, write_file, kwargs['threshold'],
+                           update_progress)
+
     def clear_images(self, initial_load=False):
         self.imageseries_dict.clear()
+        self.frame_cache.clear()
         if self.load_panel_state is not None and not initial_load:
             self.load_panel_state.clear()
             self.load_panel_state_reset.emit()
@@ -1110,6 +1154,8 @@ class HexrdConfig(QObject, metaclass=Singleton):
             overlay['data'].clear()
             if 'update_needed' in overlay:
                 del overlay['update_needed']
+            if 'update_detectors' in overlay:
+                del overlay['update_detectors']
             if 'highlights' in overlay:
                 del overlay['highlights']
 
@@ -1125,6 +1171,15 @@ class HexrdConfig(QObject, metaclass=Singleton):
         for name in self.materials:
             self.flag_overlay_updates_for_material(name)
 
+    def flag_overlay_updates_for_detector(self, det):
+        # Only the data of this detector needs to be updated, unless all
+        # of the data already needs to be
+        for overlay in self.overlays:
+            if overlay.get('update_needed', True):
+                continue
+
+            overlay.setdefault('update_detectors', set()).add(det)
+
     def _polar_pixel_size_tth(self):
         return self.config['image']['polar']['pixel_size_tth']
 
@@ -1241,6 +1296,16 @@ class HexrdConfig(QObject, metaclass=Singleton):
     polar_snip1d_numiter = property(_polar_snip1d_numiter,
                                     set_polar_snip1d_numiter)
 
+    def _polar_sparse_warp(self):
+        return self.config['image']['polar']['sparse_warp']
+
+    def set_polar_sparse_warp(self, v):
+        self.config['image']['polar']['sparse_warp'] = v
+        self.rerender_needed.emit()
+
+    polar_sparse_warp = property(_polar_sparse_warp,
+                                 set_polar_sparse_warp)
+
     def _cartesian_pixel_size(self):
         return self.config['image']['cartesian']['pixel_size']
 
@@ -1288,6 +1353,16 @@ class HexrdConfig(QObject, metaclass=Singleton):
         _cartesian_plane_normal_rotate_y,
         set_cartesian_plane_normal_rotate_y)
 
+    def _cartesian_tiled(self):
+        return self.config['image']['cartesian']['tiled']
+
+    def set_cartesian_tiled(self, v):
+        if v != self.cartesian_tiled:
+            self.config['image']['cartesian']['tiled'] = v
+            self.rerender_needed.emit()
+
+    cartesian_tiled = property(_cartesian_tiled, set_cartesian_tiled)
+
     def get_show_saturation_level(self):
         return self._show_saturation_level
 
@@ -1366,6 +1441,26 @@ class HexrdConfig(QObject, metaclass=Singleton):
             self.config['image']['show_detector_borders'] = v
             self.rerender_detector_borders.emit()
 
+    @property
+    def parallel_warp_mode(self):
+        return self.config['image']['parallel_warp_mode']
+
+    def set_parallel_warp_mode(self, v):
+        # This only affects performance, so no re-render is needed
+        self.config['image']['parallel_warp_mode'] = v
+
+    @property
+    def frame_cache_max_bytes(self):
+        return self.frame_cache.max_bytes
+
+    def set_frame_cache_max_bytes(self, v):
+        # This only affects performance, so no re-render is needed
+        self.frame_cache.max_bytes = v
+
+    @property
+    def frame_cache_stats_message(self):
+        return self.frame_cache.stats_message
+
     @staticmethod
     def num_distortion_parameters(func_name):
         if func_name == 'None':
@@ -1410,6 +1505,8 @@ class HexrdConfig(QObject, metaclass=Singleton):
             self._threshold_data['mask_status'] = v
 
     def set_threshold_mask(self, m):
+        # A dict of detector name to ThresholdMaskedImageSeries, whose
+        # mask() method gives the mask of a frame
         self._threshold_data['mask'] = m
 
     threshold_comparison = property(threshold_comparison,
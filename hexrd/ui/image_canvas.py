@@ -5,6 +5,7 @@ from PySide2.QtCore import QThreadPool, QTimer
 from PySide2.QtWidgets import QMessageBox
 
 from matplotlib.backends.backend_qt5agg import FigureCanvas
+from matplotlib.collections import LineCollection
 
 from matplotlib.figure import Figure
 import matplotlib.pyplot as plt
@@ -13,11 +14,13 @@ from matplotlib.colors import LogNorm
 import numpy as np
 
 from hexrd.ui.async_worker import AsyncWorker
+from hexrd.ui.blit_manager import BlitManager
 from hexrd.ui.calibration.cartesian_plot import cartesian_viewer
 from hexrd.ui.calibration.polar_plot import polar_viewer
 from hexrd.ui.calibration.raw_iviewer import raw_iviewer
 from hexrd.ui.constants import OverlayType, ViewType
 from hexrd.ui.hexrd_config import HexrdConfig
+from hexrd.ui.image_pyramid import ImagePyramid
 from hexrd.ui import utils
 import hexrd.ui.constants
 
@@ -28,8 +31,13 @@ class ImageCanvas(FigureCanvas):
         self.figure = Figure()
         super(ImageCanvas, self).__init__(self.figure)
 
+        # Overlays, detector borders, saturation texts, and picked points
+        # are redrawn over a cached background of the images
+        self.blit_manager = BlitManager(self)
+
         self.raw_axes = []  # only used for raw currently
         self.axes_images = []
+        self.image_pyramids = {}
         self.overlay_artists = {}
         self.cached_detector_borders = []
         self.saturation_texts = []
@@ -52,6 +60,12 @@ class ImageCanvas(FigureCanvas):
         # Set up our async stuff
         self.thread_pool = QThreadPool(parent)
 
+        # A zoom or pan changes the x and y limits separately. Only
+        # update the images in view once both have changed.
+        self.view_changed_timer = QTimer()
+        self.view_changed_timer.setSingleShot(True)
+        self.view_changed_timer.timeout.connect(self.update_images_in_view)
+
         if image_names is not None:
             self.load_images(image_names)
 
@@ -68,6 +82,7 @@ class ImageCanvas(FigureCanvas):
         HexrdConfig().rerender_wppf.connect(self.draw_wppf)
         HexrdConfig().beam_vector_changed.connect(self.beam_vector_changed)
         HexrdConfig().polar_masks_changed.connect(self.update_polar)
+        self.mpl_connect('resize_event', self.on_view_changed)
 
     def __del__(self):
         # This is so that the figure can be cleaned up
@@ -81,9 +96,10 @@ class ImageCanvas(FigureCanvas):
     def clear_figure(self):
         self.figure.clear()
         self.raw_axes.clear()
-        self.axes_images.clear()
+        self.clear_axes_images()
         self.remove_all_overlay_artists()
         self.clear_azimuthal_integral_axis()
+        self.blit_manager.clear()
         self.mode = None
 
     def clear_azimuthal_integral_axis(self):
@@ -117,15 +133,16 @@ class ImageCanvas(FigureCanvas):
                 img = HexrdConfig().image(name, idx)
 
                 # Apply any masks
-                for mask_name, (det, mask) in HexrdConfig().raw_masks.items():
-                    if (mask_name in HexrdConfig().visible_masks and
-                            det == name):
-                        img[~mask] = 0
+                mask = HexrdConfig().raw_masks.combined(
+                    HexrdConfig().visible_masks, name)
+                if mask is not None:
+                    img[~mask] = 0
 
                 axis = self.figure.add_subplot(rows, cols, i + 1)
                 axis.set_title(name)
-                self.axes_images.append(axis.imshow(img, cmap=self.cmap,
-                                                    norm=self.norm))
+                self.axes_images.append(self.create_image(axis, img,
+                                                          cmap=self.cmap,
+                                                          norm=self.norm))
                 axis.autoscale(False)
                 self.raw_axes.append(axis)
 
@@ -135,11 +152,11 @@ class ImageCanvas(FigureCanvas):
             for i, name in enumerate(image_names):
                 img = HexrdConfig().image(name, idx)
                 # Apply any masks
-                for mask_name, (det, mask) in HexrdConfig().raw_masks.items():
-                    if (mask_name in HexrdConfig().visible_masks and
-                            det == name):
-                        img[~mask] = 0
-                self.axes_images[i].set_data(img)
+                mask = HexrdConfig().raw_masks.combined(
+                    HexrdConfig().visible_masks, name)
+                if mask is not None:
+                    img[~mask] = 0
+                self.set_image_data(self.axes_images[i], img)
 
         # This will call self.draw()
         self.show_saturation()
@@ -153,30 +170,108 @@ class ImageCanvas(FigureCanvas):
         msg = 'Image view loaded!'
         HexrdConfig().emit_update_status_bar(msg)
 
+    def clear_axes_images(self):
+        self.axes_images.clear()
+        self.image_pyramids.clear()
+
+    def create_image(self, axis, img, extent=None, levels=None, **kwargs):
+        """Create an image artist that displays the level of detail in view
+
+        The levels are any precomputed levels of the image pyramid. The
+        keyword arguments are passed to imshow().
+        """
+        pyramid = ImagePyramid(img, extent, levels)
+        data, extent = pyramid.view(width=axis.bbox.width,
+                                    height=axis.bbox.height)
+        axes_image = axis.imshow(data, extent=extent, **kwargs)
+        self.image_pyramids[axes_image] = pyramid
+
+        axis.callbacks.connect('xlim_changed', self.on_view_changed)
+        axis.callbacks.connect('ylim_changed', self.on_view_changed)
+        return axes_image
+
+    def set_image_data(self, axes_image, img, extent=None, levels=None):
+        if extent is None:
+            extent = self.image_pyramids[axes_image].extent
+
+        self.image_pyramids[axes_image] = ImagePyramid(img, extent, levels)
+        self.update_level_of_detail(axes_image)
+
+    def set_image_extent(self, axes_image, extent):
+        # The levels that were computed are still valid
+        pyramid = self.image_pyramids[axes_image]
+        self.set_image_data(axes_image, pyramid.image, extent,
+                            pyramid.levels[1:])
+
+    def full_image(self, axes_image):
+        """Get the full resolution image and extent of an image artist"""
+        pyramid = self.image_pyramids.get(axes_image)
+        if pyramid is None:
+            return axes_image.get_array(), axes_image.get_extent()
+
+        return pyramid.image, pyramid.extent
+
+    def update_level_of_detail(self, axes_image):
+        """Push the region and pyramid level in view to matplotlib
+
+        Returns True if the image artist was modified.
+        """
+        pyramid = self.image_pyramids[axes_image]
+        axis = axes_image.axes
+        kwargs = {
+            'width': axis.bbox.width,
+            'height': axis.bbox.height,
+        }
+        if not axis.get_autoscale_on():
+            # Setting the extent would change the limits otherwise
+            kwargs['xlim'] = axis.get_xlim()
+            kwargs['ylim'] = axis.get_ylim()
+
+        view = pyramid.view(**kwargs)
+        if view is None:
+            return False
+
+        data, extent = view
+        axes_image.set_data(data)
+        axes_image.set_extent(extent)
+        return True
+
+    def on_view_changed(self, *args):
+        self.view_changed_timer.start(0)
+
+    def update_images_in_view(self):
+        modified = self.render_tiles_in_view()
+        for axes_image in self.axes_images:
+            if axes_image in self.image_pyramids:
+                modified |= self.update_level_of_detail(axes_image)
+
+        if modified:
+            self.draw_idle()
+
     def remove_all_overlay_artists(self):
         while self.overlay_artists:
             key = next(iter(self.overlay_artists))
             self.remove_overlay_artists(key)
 
     def remove_overlay_artists(self, key):
-        artists = self.overlay_artists[key]
-        while artists:
-            artists.pop(0).remove()
-        del self.overlay_artists[key]
+        record = self.overlay_artists.pop(key)
+        for artist in record['artists'].values():
+            self.blit_manager.remove_artist(artist)
+            artist.remove()
 
     def overlay_axes_data(self, overlay):
-        # Return the axes and data for drawing the overlay
+        # Return the axes and a list of the data to draw on each
         if not overlay['data']:
             return []
 
         if self.mode in [ViewType.cartesian, ViewType.polar]:
             # If it's cartesian or polar, there is only one axis
             # Use the same axis for all of the data
-            return [(self.axis, x) for x in overlay['data'].values()]
+            return [(self.axis, list(overlay['data'].values()))]
 
         # If it's raw, there is data for each axis.
         # The title of each axis should match the data key.
-        return [(x, overlay['data'][x.get_title()]) for x in self.raw_axes]
+        return [(x, [overlay['data'][x.get_title()]]) for x in self.raw_axes]
 
     def overlay_draw_func(self, type):
         overlay_funcs = {
@@ -204,112 +299,212 @@ class ImageCanvas(FigureCanvas):
         return [id(recursive_get(overlay['data'], h)) for h in highlights]
 
     def draw_overlay(self, overlay):
+        """Draw an overlay, reusing its artists where possible
+
+        Each overlay has one set of artists per axis, which are keyed by
+        the overlay and the axis. If only the data changed, the artists
+        are updated in place. If the style or the highlighting changed,
+        they are created again.
+
+        Returns the keys of the artists that were drawn.
+        """
         if not overlay['visible']:
-            return
+            return []
 
         # Keep track of any overlays we need to highlight
-        self.overlay_highlight_ids += self.get_overlay_highlight_ids(overlay)
+        self.overlay_highlight_ids = self.get_overlay_highlight_ids(overlay)
 
         type = overlay['type']
         style = overlay['style']
+        keys = []
         for axis, data in self.overlay_axes_data(overlay):
-            if id(data) in self.overlay_artists:
-                # It's already present. Skip it.
-                continue
+            key = (id(overlay), axis)
+            keys.append(key)
+
+            record = self.overlay_artists.get(key)
+            if record is not None:
+                if (record['style'] != style or
+                        record['highlights'] != self.overlay_highlight_ids):
+                    self.remove_overlay_artists(key)
+                    record = None
+                elif (len(record['data']) == len(data) and
+                      all(x is y for x, y in zip(record['data'], data))):
+                    # It's already present. Skip it.
+                    continue
+
+            if record is None:
+                # The record keeps a reference to the overlay and the data,
+                # so that their ids are not reused while it exists.
+                record = {
+                    'overlay': overlay,
+                    'style': copy.deepcopy(style),
+                    'highlights': self.overlay_highlight_ids,
+                    'artists': {},
+                }
+                self.overlay_artists[key] = record
+
+            record['data'] = data
+            self.overlay_draw_func(type)(axis, data, style,
+                                         record['artists'])
+
+        return keys
+
+    @staticmethod
+    def line_collection_style(styles):
+        # Convert a list of line styles, with the same keys as for plot(),
+        # into the per-segment keyword arguments for a LineCollection
+        aliases = {
+            'c': 'colors',
+            'color': 'colors',
+            'ls': 'linestyles',
+            'linestyle': 'linestyles',
+            'lw': 'linewidths',
+            'linewidth': 'linewidths',
+        }
+        kwargs = {}
+        for k, v in aliases.items():
+            if any(k in x for x in styles):
+                kwargs[v] = [x.get(k) for x in styles]
+
+        return kwargs
+
+    def set_overlay_lines(self, artists, name, axis, segments, styles,
+                          transform=None):
+        """Set the segments of a LineCollection, creating it if needed
+
+        Each segment has its own style. The collection does not change
+        the data limits of the axis.
+        """
+        kwargs = self.line_collection_style(styles)
+        collection = artists.get(name)
+        if collection is None:
+            collection = LineCollection(segments, **kwargs)
+            if transform is not None:
+                collection.set_transform(transform)
+            axis.add_collection(collection, autolim=False)
+            self.blit_manager.add_artist(collection)
+            artists[name] = collection
+            return
 
-            self.overlay_draw_func(type)(axis, data, style)
+        collection.set_segments(segments)
+        setters = {
+            'colors': collection.set_color,
+            'linestyles': collection.set_linestyle,
+            'linewidths': collection.set_linewidth,
+        }
+        for k, v in kwargs.items():
+            setters[k](v)
+
+    def set_overlay_points(self, artists, name, axis, points, style):
+        """Set the offsets of a scatter PathCollection, creating it if needed
+
+        All of the points have the same style.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        collection = artists.get(name)
+        if collection is None:
+            collection = axis.scatter(points[:, 0], points[:, 1], **style)
+            self.blit_manager.add_artist(collection)
+            artists[name] = collection
+            return
 
-    def draw_powder_overlay(self, axis, data, style):
-        rings = data['rings']
-        rbnds = data['rbnds']
-        rbnd_indices = data['rbnd_indices']
+        collection.set_offsets(points)
 
+    def draw_powder_overlay(self, axis, data, style, artists):
         data_style = style['data']
         ranges_style = style['ranges']
 
         highlight_style = hexrd.ui.constants.HIGHLIGHT_POWDER_STYLE
-        highlight_indices = [i for i, x in enumerate(rings)
-                             if id(x) in self.overlay_highlight_ids]
-
-        artists = []
-        self.overlay_artists[id(data)] = artists
-        for i, pr in enumerate(rings):
-            current_style = data_style
-            if i in highlight_indices:
-                # Override with highlight style
-                current_style = highlight_style['data']
-
-            x, y = self.extract_ring_coords(pr)
-            artist, = axis.plot(x, y, **current_style)
-            artists.append(artist)
-
-        # Add the rbnds too
-        for ind, pr in zip(rbnd_indices, rbnds):
-            x, y = self.extract_ring_coords(pr)
-            current_style = copy.deepcopy(ranges_style)
-            if any(x in highlight_indices for x in ind):
-                # Override with highlight style
-                current_style = highlight_style['ranges']
-            elif len(ind) > 1:
-                # If ranges are combined, override the color to red
-                current_style['c'] = 'r'
-            artist, = axis.plot(x, y, **current_style)
-            artists.append(artist)
+        merged_ranges_style = {**ranges_style, 'c': 'r'}
 
-        if self.azimuthal_integral_axis is not None:
-            az_axis = self.azimuthal_integral_axis
-            for pr in rings:
-                x, _ = self.extract_ring_coords(pr)
-                # Average the points together for the vertical line
-                x = np.nanmean(x)
-                artist = az_axis.axvline(x, **data_style)
-                artists.append(artist)
+        rings, ring_styles = [], []
+        rbnds, rbnd_styles, rbnds_merged = [], [], []
+        for det_data in data:
+            highlight_indices = [i for i, x in enumerate(det_data['rings'])
+                                 if id(x) in self.overlay_highlight_ids]
+
+            for i, pr in enumerate(det_data['rings']):
+                current_style = data_style
+                if i in highlight_indices:
+                    # Override with highlight style
+                    current_style = highlight_style['data']
+
+                rings.append(np.column_stack(self.extract_ring_coords(pr)))
+                ring_styles.append(current_style)
 
             # Add the rbnds too
-            for ind, pr in zip(rbnd_indices, rbnds):
-                x, _ = self.extract_ring_coords(pr)
-                # Average the points together for the vertical line
-                x = np.nanmean(x)
+            for ind, pr in zip(det_data['rbnd_indices'], det_data['rbnds']):
+                current_style = ranges_style
+                if any(x in highlight_indices for x in ind):
+                    # Override with highlight style
+                    current_style = highlight_style['ranges']
+                elif len(ind) > 1:
+                    # If ranges are combined, override the color to red
+                    current_style = merged_ranges_style
+
+                rbnds.append(np.column_stack(self.extract_ring_coords(pr)))
+                rbnd_styles.append(current_style)
+                rbnds_merged.append(len(ind) > 1)
+
+        self.set_overlay_lines(artists, 'rings', axis, rings, ring_styles)
+        self.set_overlay_lines(artists, 'rbnds', axis, rbnds, rbnd_styles)
 
-                current_style = copy.deepcopy(ranges_style)
-                if len(ind) > 1:
-                    # If rbnds are combined, override the color to red
-                    current_style['c'] = 'r'
+        if self.azimuthal_integral_axis is not None:
+            az_axis = self.azimuthal_integral_axis
+            # The vertical lines span the axis, whatever its y limits are
+            transform = az_axis.get_xaxis_transform()
 
-                artist = az_axis.axvline(x, **current_style)
-                artists.append(artist)
+            def vertical_line(pts):
+                # Average the points together for the vertical line
+                x = np.nanmean(pts[:, 0])
+                return [(x, 0), (x, 1)]
 
-    def draw_laue_overlay(self, axis, data, style):
-        spots = data['spots']
-        ranges = data['ranges']
+            az_rings = [vertical_line(x) for x in rings]
+            self.set_overlay_lines(artists, 'az_rings', az_axis, az_rings,
+                                   [data_style] * len(az_rings), transform)
 
+            # Add the rbnds too
+            az_rbnds = [vertical_line(x) for x in rbnds]
+            # If rbnds are combined, override the color to red
+            az_rbnd_styles = [merged_ranges_style if x else ranges_style
+                              for x in rbnds_merged]
+            self.set_overlay_lines(artists, 'az_rbnds', az_axis, az_rbnds,
+                                   az_rbnd_styles, transform)
+
+    def draw_laue_overlay(self, axis, data, style, artists):
         data_style = style['data']
         ranges_style = style['ranges']
 
         highlight_style = hexrd.ui.constants.HIGHLIGHT_LAUE_STYLE
-        highlight_indices = [i for i, x in enumerate(spots)
-                             if id(x) in self.overlay_highlight_ids]
-
-        artists = []
-        self.overlay_artists[id(data)] = artists
-        for i, (x, y) in enumerate(spots):
-            current_style = data_style
-            if i in highlight_indices:
-                current_style = highlight_style['data']
-
-            artist = axis.scatter(x, y, **current_style)
-            artists.append(artist)
-
-        for i, box in enumerate(ranges):
-            current_style = ranges_style
-            if i in highlight_indices:
-                current_style = highlight_style['ranges']
-
-            x, y = zip(*box)
-            artist, = axis.plot(x, y, **current_style)
-            artists.append(artist)
 
-    def draw_mono_rotation_series_overlay(self, id, axis, data, style):
+        # The highlighted spots have a different marker size, so they
+        # are a separate collection
+        spots, highlighted_spots = [], []
+        ranges, range_styles = [], []
+        for det_data in data:
+            highlight_indices = [i for i, x in enumerate(det_data['spots'])
+                                 if id(x) in self.overlay_highlight_ids]
+
+            for i, spot in enumerate(det_data['spots']):
+                if i in highlight_indices:
+                    highlighted_spots.append(spot)
+                else:
+                    spots.append(spot)
+
+            for i, box in enumerate(det_data['ranges']):
+                current_style = ranges_style
+                if i in highlight_indices:
+                    current_style = highlight_style['ranges']
+
+                ranges.append(np.asarray(box))
+                range_styles.append(current_style)
+
+        self.set_overlay_points(artists, 'spots', axis, spots, data_style)
+        self.set_overlay_points(artists, 'highlighted_spots', axis,
+                                highlighted_spots, highlight_style['data'])
+        self.set_overlay_lines(artists, 'ranges', axis, ranges, range_styles)
+
+    def draw_mono_rotation_series_overlay(self, axis, data, style, artists):
         pass
 
     def update_overlays(self):
@@ -319,65 +514,56 @@ class ImageCanvas(FigureCanvas):
 
         if not HexrdConfig().show_overlays:
             self.remove_all_overlay_artists()
-            self.draw()
+            self.blit_manager.update()
             return
 
-        def overlay_with_data_id(data_id):
-            for overlay in HexrdConfig().overlays:
-                if any([data_id == id(x) for x in overlay['data'].values()]):
-                    return overlay
+        self.iviewer.update_overlay_data()
 
-            return None
+        # Draw the visible overlays, and remove any artists that are no
+        # longer a part of them
+        keys = set()
+        for overlay in HexrdConfig().overlays:
+            keys.update(self.draw_overlay(overlay))
 
-        # Remove any artists that:
-        # 1. Are no longer in the list of overlays
-        # 2. Are not visible
-        # 3. Need updating
         for key in list(self.overlay_artists.keys()):
-            overlay = overlay_with_data_id(key)
-            if overlay is None:
-                # This artist is no longer a part of the overlays
+            if key not in keys:
                 self.remove_overlay_artists(key)
-                continue
 
-            if overlay.get('update_needed', True) or not overlay['visible']:
-                self.remove_overlay_artists(key)
-                continue
-
-        self.iviewer.update_overlay_data()
-
-        self.overlay_highlight_ids = []
-        for overlay in HexrdConfig().overlays:
-            self.draw_overlay(overlay)
-
-        self.draw()
+        self.blit_manager.update()
 
     def clear_detector_borders(self):
         while self.cached_detector_borders:
-            self.cached_detector_borders.pop(0).remove()
+            line = self.cached_detector_borders.pop(0)
+            self.blit_manager.remove_artist(line)
+            line.remove()
 
     def draw_detector_borders(self):
-        self.clear_detector_borders()
-
         # If there is no iviewer, we are not currently viewing a
-        # calibration. Just return.
-        if not self.iviewer:
-            self.draw()
-            return
-
-        # Make sure this is allowed by the configuration
-        if not HexrdConfig().show_detector_borders:
-            self.draw()
+        # calibration. Make sure this is allowed by the configuration
+        # as well.
+        if not self.iviewer or not HexrdConfig().show_detector_borders:
+            self.clear_detector_borders()
+            self.blit_manager.update()
             return
 
         borders = self.iviewer.all_detector_borders
-        for border in borders.values():
+        lines = [line for border in borders.values() for line in border]
+
+        plots = self.cached_detector_borders
+        if (len(plots) == len(lines) and
+                all(x.axes is self.axis for x in plots)):
+            # Only the borders moved. Update them in place.
+            for plot, line in zip(plots, lines):
+                plot.set_data(*line)
+        else:
+            self.clear_detector_borders()
             # Draw each line in the border
-            for line in border:
+            for line in lines:
                 plot, = self.axis.plot(*line, color='y', lw=2)
+                self.blit_manager.add_artist(plot)
                 self.cached_detector_borders.append(plot)
 
-        self.draw()
+        self.blit_manager.update()
 
     def draw_wppf(self):
         self.update_wppf_plot()
@@ -392,24 +578,22 @@ class ImageCanvas(FigureCanvas):
 
     def clear_saturation(self):
         for t in self.saturation_texts:
+            self.blit_manager.remove_artist(t)
             t.remove()
         self.saturation_texts.clear()
-        self.draw()
-
-    def show_saturation(self):
-        self.clear_saturation()
+        self.blit_manager.update()
 
+    def saturation_strings(self):
+        # Get the axes and saturation text of each image, if they are shown
         # Do not proceed without config approval
         if not HexrdConfig().show_saturation_level:
-            return
-
-        if not self.axes_images:
-            return
+            return []
 
         # Do not show the saturation in calibration mode
         if self.mode != ViewType.raw:
-            return
+            return []
 
+        results = []
         for img in self.axes_images:
             # The titles of the images are currently the detector names
             # If we change this in the future, we will need to change
@@ -419,18 +603,40 @@ class ImageCanvas(FigureCanvas):
             detector = HexrdConfig().detector(detector_name)
             saturation_level = detector['saturation_level']['value']
 
-            array = img.get_array()
+            array = self.full_image(img)[0]
 
             num_sat = (array >= saturation_level).sum()
             percent = num_sat / array.size * 100.0
             str_sat = 'Saturation: ' + str(num_sat)
             str_sat += '\n%5.3f %%' % percent
+            results.append((ax, str_sat))
+
+        return results
+
+    def show_saturation(self):
+        results = self.saturation_strings()
+
+        texts = self.saturation_texts
+        if [t.axes for t in texts] == [ax for ax, _ in results]:
+            # Only the text changed. Update it in place.
+            for t, (_, str_sat) in zip(texts, results):
+                t.set_text(str_sat)
+
+            self.blit_manager.update()
+            return
+
+        for t in texts:
+            self.blit_manager.remove_artist(t)
+            t.remove()
+        texts.clear()
 
+        for ax, str_sat in results:
             t = ax.text(0.05, 0.05, str_sat, fontdict={'color': 'w'},
                         transform=ax.transAxes)
-            self.saturation_texts.append(t)
+            self.blit_manager.add_artist(t)
+            texts.append(t)
 
-        self.draw()
+        self.blit_manager.update()
 
     def beam_vector_changed(self):
         if self.mode == ViewType.polar:
@@ -470,10 +676,15 @@ class ImageCanvas(FigureCanvas):
                 HexrdConfig().config['image']['cartesian'].copy()
             )
             self.figure.clear()
-            self.axes_images.clear()
+            self.clear_axes_images()
+
+        # In tiled mode, only the tiles in the current view are rendered
+        view_limits = None
+        if self.axes_images and HexrdConfig().cartesian_tiled:
+            view_limits = (self.axis.get_xlim(), self.axis.get_ylim())
 
         # Run the calibration in a background thread
-        worker = AsyncWorker(cartesian_viewer)
+        worker = AsyncWorker(cartesian_viewer, view_limits)
         self.thread_pool.start(worker)
 
         # Get the results and close the progress dialog when finished
@@ -488,19 +699,21 @@ class ImageCanvas(FigureCanvas):
         rescale_image = True
         if len(self.axes_images) == 0:
             self.axis = self.figure.add_subplot(111)
-            self.axes_images.append(self.axis.imshow(img, cmap=self.cmap,
-                                                     norm=self.norm,
-                                                     vmin=None, vmax=None,
-                                                     interpolation="none"))
+            self.axes_images.append(self.create_image(self.axis, img,
+                                                      extent=iviewer.extent,
+                                                      levels=iviewer.levels,
+                                                      cmap=self.cmap,
+                                                      norm=self.norm,
+                                                      vmin=None, vmax=None,
+                                                      interpolation="none"))
             self.axis.set_xlabel(r'x (mm)')
             self.axis.set_ylabel(r'y (mm)')
         else:
             rescale_image = False
-            self.axes_images[0].set_data(img)
+            self.set_image_data(self.axes_images[0], img, iviewer.extent,
+                                iviewer.levels)
 
-        # We must adjust the extent of the image
         if rescale_image:
-            self.axes_images[0].set_extent(iviewer.extent)
             self.axis.relim()
             self.axis.autoscale_view()
             self.axis.autoscale(False)
@@ -512,6 +725,25 @@ class ImageCanvas(FigureCanvas):
         msg = 'Cartesian view loaded!'
         HexrdConfig().emit_update_status_bar(msg)
 
+    def render_tiles_in_view(self):
+        """Render any tiles in view for the tiled Cartesian view
+
+        Returns True if any tiles were rendered.
+        """
+        if self.mode != ViewType.cartesian or not self.axes_images:
+            return False
+
+        if not getattr(self.iviewer, 'tiled', False):
+            return False
+
+        xlim, ylim = self.axis.get_xlim(), self.axis.get_ylim()
+        if not self.iviewer.render_view(xlim, ylim):
+            return False
+
+        self.set_image_data(self.axes_images[0], self.iviewer.img,
+                            levels=self.iviewer.levels)
+        return True
+
     def show_polar(self):
         HexrdConfig().emit_update_status_bar('Loading polar view...')
         if self.mode != ViewType.polar:
@@ -551,11 +783,9 @@ class ImageCanvas(FigureCanvas):
             # scale.
             if len(self.axes_images) == 0:
                 self.axis = self.figure.add_subplot(grid[:3, 0])
-                self.axes_images.append(self.axis.imshow(img, extent=extent,
-                                                         cmap=self.cmap,
-                                                         norm=self.norm,
-                                                         picker=True,
-                                                         interpolation='none'))
+                self.axes_images.append(self.create_image(
+                    self.axis, img, extent=extent, cmap=self.cmap,
+                    norm=self.norm, picker=True, interpolation='none'))
                 self.axis.axis('auto')
                 # Do not allow the axis to autoscale, which could happen if
                 # overlays are drawn out-of-bounds
@@ -564,7 +794,7 @@ class ImageCanvas(FigureCanvas):
                 self.axis.label_outer()
             else:
                 rescale_image = False
-                self.axes_images[0].set_data(img)
+                self.set_image_data(self.axes_images[0], img, extent)
 
             # Get the "tth" vector
             angular_grid = self.iviewer.angular_grid
@@ -588,15 +818,14 @@ class ImageCanvas(FigureCanvas):
         else:
             if len(self.axes_images) == 0:
                 self.axis = self.figure.add_subplot(111)
-                self.axes_images.append(self.axis.imshow(img, cmap=self.cmap,
-                                                         norm=self.norm,
-                                                         picker=True,
-                                                         interpolation='none'))
+                self.axes_images.append(self.create_image(
+                    self.axis, img, cmap=self.cmap, norm=self.norm,
+                    picker=True, interpolation='none'))
                 self.axis.set_xlabel(r'2$\theta$ (deg)')
                 self.axis.set_ylabel(r'$\eta$ (deg)')
             else:
                 rescale_image = False
-                self.axes_images[0].set_data(img)
+                self.set_image_data(self.axes_images[0], img)
 
         if rescale_image:
             self.axis.relim()
@@ -614,7 +843,7 @@ class ImageCanvas(FigureCanvas):
             return
 
         self.iviewer.update_image()
-        self.axes_images[0].set_data(self.iviewer.img)
+        self.set_image_data(self.axes_images[0], self.iviewer.img)
         self.update_azimuthal_integral_plot()
         self.update_overlays()
 
@@ -693,12 +922,13 @@ class ImageCanvas(FigureCanvas):
 
         self.iviewer.update_detector(det)
         if self.mode == ViewType.raw:
-            # Only overlays need to be updated
-            HexrdConfig().flag_overlay_updates_for_all_materials()
+            # Only the overlays of this detector need to be updated
+            HexrdConfig().flag_overlay_updates_for_detector(det)
             self.update_overlays()
             return
 
-        self.axes_images[0].set_data(self.iviewer.img)
+        self.set_image_data(self.axes_images[0], self.iviewer.img,
+                            levels=getattr(self.iviewer, 'levels', None))
 
         # This will only run if we are in polar mode
         self.update_azimuthal_integral_plot()
@@ -708,9 +938,9 @@ class ImageCanvas(FigureCanvas):
         self.draw_detector_borders()
 
         # In polar mode, the overlays are clipped to the detectors, so
-        # they must be re-drawn as well
+        # those of this detector must be re-drawn as well
         if self.mode == ViewType.polar:
-            HexrdConfig().flag_overlay_updates_for_all_materials()
+            HexrdConfig().flag_overlay_updates_for_detector(det)
             self.update_overlays()
 
     def export_polar_plot(self, filename):
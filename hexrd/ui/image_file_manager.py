@@ -1,14 +1,14 @@
 import os
 import numpy as np
-import tempfile
 import yaml
-import h5py
 
 from PySide2.QtWidgets import QMessageBox
 
 from hexrd import imageseries
 
+from hexrd.ui.hdf5_series import open_hdf5
 from hexrd.ui.hexrd_config import HexrdConfig
+from hexrd.ui.image_files_series import open_image_files
 from hexrd.ui.load_hdf5_dialog import LoadHDF5Dialog
 
 
@@ -87,15 +87,9 @@ class ImageFileManager(metaclass=Singleton):
             dset = hdf.select(self.path[1])
             ims = imageseries.open(None, 'array', data=dset)
         elif ext in self.HDF5_FILE_EXTS:
-            data = h5py.File(f, 'r')
-            dset = data['/'.join(self.path)][()]
-            if dset.ndim < 3:
-                # Handle raw two dimesional data
-                ims = imageseries.open(None, 'array', data=dset)
-            else:
-                data.close()
-                ims = imageseries.open(
-                    f, 'hdf5', path=self.path[0], dataname=self.path[1])
+            # This only reads the dataset's metadata. The frames are read
+            # when they are needed.
+            ims = open_hdf5(f, self.path[0], self.path[1])
         elif ext == '.npz':
             ims = imageseries.open(f, 'frame-cache')
         elif ext == '.yml':
@@ -104,53 +98,31 @@ class ImageFileManager(metaclass=Singleton):
             ims = imageseries.open(f, form)
         else:
             # elif ext in self.IMAGE_FILE_EXTS:
-            input_dict = {
-                'image-files': {}
-            }
-            input_dict['image-files']['directory'] = os.path.dirname(f)
-            input_dict['image-files']['files'] = os.path.basename(f)
-            input_dict['options'] = {}
-            input_dict['meta'] = {}
-            temp = tempfile.NamedTemporaryFile(delete=False)
-            try:
-                data = yaml.dump(input_dict).encode('utf-8')
-                temp.write(data)
-                temp.close()
-                ims = imageseries.open(temp.name, 'image-files')
-            finally:
-                # Ensure the file gets removed from the filesystem
-                os.remove(temp.name)
+            ims = open_image_files(os.path.dirname(f), [os.path.basename(f)])
         # else:
         #     ims = imageseries.open(f, 'array')
         return ims
 
+    def read_metadata(self, f):
+        """Read the metadata of an image file without reading the images
+
+        Returns a dict with the number of frames, the omega wedges (or
+        None), and the dtype and shape of a frame.
+        """
+        ims = self.open_file(f)
+        return {
+            'frames': len(ims),
+            'omega': ims.metadata.get('omega'),
+            'dtype': ims.dtype,
+            'shape': ims.shape,
+        }
+
     def open_directory(self, d, files=None):
         if files is None:
-            files = os.listdir(d)
+            files = sorted(os.listdir(d))
 
-        input_dict = {
-            'image-files': {}
-        }
-        input_dict['image-files']['directory'] = d
-        file_str = ''
-        for i, f in enumerate(files):
-            file_str += os.path.basename(f)
-            if i != len(files) - 1:
-                file_str += ' '
-
-        input_dict['image-files']['files'] = file_str
-        input_dict['options'] = {}
-        input_dict['meta'] = {}
-        temp = tempfile.NamedTemporaryFile(delete=False)
-        try:
-            data = yaml.dump(input_dict).encode('utf-8')
-            temp.write(data)
-            temp.close()
-            ims = imageseries.open(temp.name, 'image-files')
-        finally:
-            # Ensure the file gets removed from the filesystem
-            os.remove(temp.name)
-        return ims
+        files = [os.path.basename(f) for f in files]
+        return open_image_files(d, files)
 
     def is_hdf(self, extension):
         hdf_extensions = ['.h4', '.hdf4', '.hdf', '.h5', '.hdf5', '.he5']
@@ -162,7 +134,7 @@ class ImageFileManager(metaclass=Singleton):
     def path_exists(self, f):
         try:
             path, dataname = HexrdConfig().hdf5_path
-            imageseries.open(f, 'hdf5', path=path, dataname=dataname)
+            open_hdf5(f, path, dataname)
             self.path = HexrdConfig().hdf5_path
             return True
         except:
@@ -0,0 +1,94 @@
+import os
+
+import fabio
+import numpy as np
+
+from hexrd.imageseries.baseclass import ImageSeries
+from hexrd.imageseries.load import ImageSeriesAdapter
+
+
+# Formats that only ever hold one frame per file
+SINGLE_FRAME_EXTS = ['.tiff', '.tif', '.png', '.jpg', '.jpeg', '.cbf',
+                     '.edf', '.mccd']
+
+
+class ImageFilesAdapter(ImageSeriesAdapter):
+    """An imageseries adapter for a list of image files
+
+    This is like the 'image-files' adapter, but it is created directly
+    from a directory and a list of file names, rather than from a yml
+    file. The files are read with fabio.
+
+    Only the first file is opened up front. If it holds a single frame
+    and its format only holds single frames, every file is assumed to
+    hold one frame of the same dtype and shape, and a file is not
+    opened until its frame is requested. Otherwise, the headers of all
+    of the files are read to count their frames.
+    """
+
+    def __init__(self, directory, files):
+        self._files = [os.path.join(directory, f) for f in files]
+        if not self._files:
+            raise ValueError('No image files were given')
+
+        first = fabio.open(self._files[0])
+        self._dtype = first.data.dtype
+        self._shape = first.data.shape
+
+        self._single_frames = (
+            first.nframes == 1 and
+            all(os.path.splitext(f)[1].lower() in SINGLE_FRAME_EXTS
+                for f in self._files))
+
+        if self._single_frames:
+            self._fabio_images = None
+            self._frame_starts = None
+            self._nframes = len(self._files)
+        else:
+            # Keep the opened images, since their frames are read by index
+            self._fabio_images = [first]
+            self._fabio_images += [fabio.open(f) for f in self._files[1:]]
+            counts = [x.nframes for x in self._fabio_images]
+            self._frame_starts = np.cumsum([0] + counts)
+            self._nframes = int(self._frame_starts[-1])
+
+        self._meta = {}
+
+    def __len__(self):
+        return self._nframes
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def __getitem__(self, key):
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError(f'frame {key} is out of range')
+
+        if self._single_frames:
+            return fabio.open(self._files[key]).data
+
+        file_idx = np.searchsorted(self._frame_starts, key, side='right') - 1
+        frame = key - self._frame_starts[file_idx]
+        img = self._fabio_images[file_idx]
+        if img.nframes == 1:
+            return img.data
+        return img.getframe(frame).data
+
+    @property
+    def dtype(self):
+        return self._dtype
+
+    @property
+    def shape(self):
+        return self._shape
+
+    @property
+    def metadata(self):
+        return self._meta
+
+
+def open_image_files(directory, files):
+    """Open a list of image files in a directory as an imageseries"""
+    return ImageSeries(ImageFilesAdapter(directory, files))
@@ -1,9 +1,12 @@
 import copy
 import functools
 import os
-import time
 import glob
-from concurrent.futures import ThreadPoolExecutor
+import threading
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+
+import numpy as np
+import psutil
 
 from hexrd import imageseries
 
@@ -11,6 +14,8 @@ from PySide2.QtCore import QObject, QThreadPool, Signal
 from PySide2.QtWidgets import QMessageBox
 
 from hexrd.ui.async_worker import AsyncWorker
+from hexrd.ui.dark_cache import dark_fingerprint, DarkCache
+from hexrd.ui.frame_stats import FrameStats, frame_stats_iter
 from hexrd.ui.hexrd_config import HexrdConfig
 from hexrd.ui.image_file_manager import ImageFileManager
 from hexrd.ui.progress_dialog import ProgressDialog
@@ -30,6 +35,9 @@ class Singleton(type(QObject)):
 class NoEmptyFramesException(Exception):
     pass
 
+class LoadCancelledException(Exception):
+    pass
+
 class ImageLoadManager(QObject, metaclass=Singleton):
 
     # Emitted when new images are loaded
@@ -37,10 +45,27 @@ class ImageLoadManager(QObject, metaclass=Singleton):
     update_needed = Signal()
     new_images_loaded = Signal()
 
+    # The fraction of the available memory that aggregations may use
+    memory_fraction = 0.5
+
     def __init__(self):
         super(ImageLoadManager, self).__init__(None)
         self.unaggregated_images = None
 
+        # Statistics of the unprocessed frames for the display
+        # aggregation, gathered during the dark aggregation pass
+        self.display_stats = {}
+        self.display_ops = {}
+
+        self.dark_cache = DarkCache()
+        self.dark_fingerprints = {}
+        self.postprocess = False
+
+        # Set from the GUI thread to stop the background processing
+        self.cancel_event = threading.Event()
+        self.cancelled = False
+        self.progress_lock = threading.Lock()
+
     def load_images(self, fnames):
         files = self.explict_selection(fnames)
         manual = False
@@ -123,10 +148,10 @@ class ImageLoadManager(QObject, metaclass=Singleton):
                     files[idx].append('/'.join([path, f]))
         return files
 
-    def read_data(self, files, data=None, parent=None):
+    def read_data(self, files, data=None, parent=None, cancellable=False):
         # When this is pressed read in a complete set of data for all detectors.
         # Run the imageseries processing in a background thread and display a
-        # loading dialog
+        # loading dialog. Returns False if the user cancelled the loading.
         self.parent_dir = HexrdConfig().images_dir
         self.set_state()
         self.parent = parent
@@ -134,15 +159,24 @@ class ImageLoadManager(QObject, metaclass=Singleton):
         self.data = data
         self.empty_frames = data['empty_frames'] if data else 0
 
-        self.begin_processing()
+        return self.begin_processing(cancellable=cancellable)
 
-    def begin_processing(self, postprocess=False):
+    def begin_processing(self, postprocess=False, cancellable=False):
         # Create threads and loading dialog
         thread_pool = QThreadPool(self.parent)
-        progress_dialog = ProgressDialog(self.parent)
+        progress_dialog = ProgressDialog(self.parent, cancellable)
         progress_dialog.setWindowTitle('Loading Processed Imageseries')
+        # Only close the dialog when the worker has finished, and not when
+        # the progress reaches 100
+        progress_dialog.setAutoClose(False)
+        progress_dialog.setAutoReset(False)
         self.progress_text.connect(progress_dialog.setLabelText)
         self.progress_dialog = progress_dialog
+        self.progress_value = 0
+
+        self.cancel_event.clear()
+        self.cancelled = False
+        finished = []
 
         # Start processing in background
         worker = AsyncWorker(self.process_ims, postprocess)
@@ -151,9 +185,29 @@ class ImageLoadManager(QObject, metaclass=Singleton):
         worker.signals.progress.connect(progress_dialog.setValue)
         # On completion load imageseries nd close loading dialog
         worker.signals.result.connect(self.finish_processing_ims)
+        worker.signals.finished.connect(lambda: finished.append(True))
         worker.signals.finished.connect(progress_dialog.accept)
+        progress_dialog.canceled.connect(self.cancel_processing)
         progress_dialog.exec_()
 
+        if not finished and self.cancel_event.is_set():
+            # The dialog was cancelled. Keep it up until the worker has
+            # stopped, so that the caller sees a consistent state.
+            progress_dialog.setCancelButton(None)
+            progress_dialog.setRange(0, 0)
+            progress_dialog.setLabelText('Cancelling...')
+            progress_dialog.exec_()
+
+        self.progress_text.disconnect(progress_dialog.setLabelText)
+        return not self.cancelled
+
+    def cancel_processing(self):
+        self.cancel_event.set()
+
+    def check_cancelled(self):
+        if self.cancel_event.is_set():
+            raise LoadCancelledException
+
     def set_state(self, state=None):
         if state is None:
             self.state = HexrdConfig().load_panel_state
@@ -161,9 +215,30 @@ class ImageLoadManager(QObject, metaclass=Singleton):
             self.state = state
 
     def process_ims(self, postprocess, update_progress):
+        """
+        Load and process the imageseries. Returns False if the processing
+        was cancelled, in which case the previous imageseries are restored.
+        """
+        self.postprocess = postprocess
         self.update_progress = update_progress
-        self.update_progress(0)
+        self.set_progress(0)
+
+        # Restore these if the processing is cancelled
+        prev_ims_dict = copy.copy(HexrdConfig().imageseries_dict)
+        prev_unaggregated_images = self.unaggregated_images
+
+        try:
+            self._process_ims(postprocess)
+        except LoadCancelledException:
+            HexrdConfig().imageseries_dict = prev_ims_dict
+            self.unaggregated_images = prev_unaggregated_images
+            self.display_stats.clear()
+            return False
+
+        self.set_progress(100)
+        return True
 
+    def _process_ims(self, postprocess):
         if not postprocess:
             # Open selected images as imageseries
             self.parent_dir = HexrdConfig().images_dir
@@ -171,6 +246,7 @@ class ImageLoadManager(QObject, metaclass=Singleton):
 
             if len(self.files[0]) > 1:
                 for i, det in enumerate(det_names):
+                    self.check_cancelled()
                     dirs = self.parent_dir
 
                     ims = ImageFileManager().open_directory(dirs, self.files[i])
@@ -181,60 +257,84 @@ class ImageLoadManager(QObject, metaclass=Singleton):
             HexrdConfig().imageseries_dict = copy.copy(self.unaggregated_images)
             self.reset_unagg_imgs()
 
+        self.check_cancelled()
+
         # Now that self.state is set, setup the progress variables
         self.setup_progress_variables()
 
         # Process the imageseries
         self.apply_operations(HexrdConfig().imageseries_dict)
+        self.check_cancelled()
         if self.data:
             if 'agg' in self.state and self.state['agg']:
                 self.display_aggregation(HexrdConfig().imageseries_dict)
             else:
                 self.add_omega_metadata(HexrdConfig().imageseries_dict)
 
-        self.update_progress(100)
+    def finish_processing_ims(self, completed):
+        self.cancelled = not completed
+        if self.cancelled:
+            return
 
-    def finish_processing_ims(self):
         # Display processed images on completion
         self.update_needed.emit()
         self.new_images_loaded.emit()
 
     def get_dark_aggr_op(self, ims, idx):
         """
-        Returns a tuple of the form (function, frames), where func is the
-        function to be applied and frames is the number of frames to aggregate.
+        Returns a tuple of the form (stat, frames, ims, display_frames), where
+        stat is the statistic to compute, frames is the number of frames to
+        aggregate, and ims is the imageseries to aggregate. If display
+        aggregation statistics can be gathered in the same pass,
+        display_frames is the range of frames for them. Otherwise, it is None.
         """
         dark_idx = self.state['dark'][idx]
+        display_frames = None
         if dark_idx == UI_DARK_INDEX_FILE:
             ims = ImageFileManager().open_file(self.state['dark_files'][idx])
+        elif self.display_agg_stat in ('max', 'median'):
+            # These commute with the dark subtraction, flip and rectangle
+            # operations, so they may be computed on the unprocessed frames
+            display_frames = self.get_range(ims)
 
         # Create or load the dark image if selected
         frames = len(ims)
-        if dark_idx != UI_DARK_INDEX_FILE and frames > 120:
-            frames = 120
 
         if dark_idx == UI_DARK_INDEX_MEDIAN:
-            f = imageseries.stats.median_iter
+            stat = 'median'
         elif dark_idx == UI_DARK_INDEX_EMPTY_FRAMES:
-            f = imageseries.stats.average_iter
+            stat = 'mean'
             frames = self.empty_frames
         elif dark_idx == UI_DARK_INDEX_AVERAGE:
-            f = imageseries.stats.average_iter
+            stat = 'mean'
         elif dark_idx == UI_DARK_INDEX_MAXIMUM:
-            f = imageseries.stats.max_iter
+            stat = 'max'
         else:
-            f = imageseries.stats.median_iter
+            stat = 'median'
+
+        return (stat, frames, ims, display_frames)
 
-        return (f, frames, ims)
+    @property
+    def display_agg_stat(self):
+        if not self.data or not self.state.get('agg'):
+            return None
+
+        if self.state['agg'] == UI_AGG_INDEX_MAXIMUM:
+            return 'max'
+        elif self.state['agg'] == UI_AGG_INDEX_MEDIAN:
+            return 'median'
+        else:
+            return 'mean'
 
     def get_dark_aggr_ops(self, ims_dict):
         """
-        Returns a dict of tuples of the form (function, frames), where func is the
-        function to be applied and frames is the number of frames to aggregate.
+        Returns a dict of tuples of the form returned by get_dark_aggr_op().
         The key is the detector name.
         """
         ops = {}
-        for idx, key in enumerate(ims_dict.keys()):
+        self.dark_fingerprints.clear()
+        for file_idx, key in enumerate(ims_dict.keys()):
+            idx = file_idx
             if self.data:
                 if 'idx' in self.data:
                     idx = self.data['idx']
@@ -247,9 +347,33 @@ class ImageLoadManager(QObject, metaclass=Singleton):
                     else:
                         op = self.get_dark_aggr_op(ims_dict[key], idx)
                         ops[key] = op
+                        self.dark_fingerprints[key] = self.dark_fingerprint(
+                            file_idx, idx, op)
 
         return ops
 
+    def dark_fingerprint(self, file_idx, idx, op):
+        """
+        Returns the fingerprint of a dark image for the dark cache, or None
+        if it should not be cached.
+        """
+        if self.postprocess:
+            # The frames have already been processed
+            return None
+
+        if self.state['dark'][idx] == UI_DARK_INDEX_FILE:
+            paths = [self.state['dark_files'][idx]]
+        else:
+            paths = self.files[file_idx]
+
+        if not all(isinstance(x, str) for x in paths):
+            return None
+
+        paths = [os.path.join(self.parent_dir or '', x) for x in paths]
+        stat, frames, _, _ = op
+        return dark_fingerprint(paths, stat=stat, frame_range=(0, frames),
+                                hdf5_path=ImageFileManager().path)
+
     def apply_operations(self, ims_dict):
         # First perform dark aggregation if we need to
         dark_aggr_ops = {}
@@ -263,6 +387,8 @@ class ImageLoadManager(QObject, metaclass=Singleton):
         # Now run the dark aggregation
         self.update_progress_text('Aggregating dark images...')
         dark_images = {}
+        self.display_stats.clear()
+        self.display_ops.clear()
         if dark_aggr_ops:
             dark_images = self.aggregate_dark_multithread(dark_aggr_ops)
 
@@ -280,24 +406,37 @@ class ImageLoadManager(QObject, metaclass=Singleton):
             frames = self.get_range(ims_dict[key])
             ims_dict[key] = imageseries.process.ProcessedImageSeries(
                 ims_dict[key], ops, frame_list=frames)
+            self.display_ops[key] = ops
 
     def display_aggregation(self, ims_dict):
         self.update_progress_text('Aggregating images...')
         # Remember unaggregated images
         self.unaggregated_images = copy.copy(ims_dict)
 
-        if self.state['agg'] == UI_AGG_INDEX_MAXIMUM:
-            agg_func = imageseries.stats.max_iter
-        elif self.state['agg'] == UI_AGG_INDEX_MEDIAN:
-            agg_func = imageseries.stats.median_iter
-        else:
-            agg_func = imageseries.stats.average_iter
+        stat = self.display_agg_stat
+
+        # Use the statistics from the dark aggregation pass if we have them
+        for key, stats in self.display_stats.items():
+            img = self.process_image(stats.get(stat), self.display_ops[key])
+            ims_dict[key] = [img]
+        remaining = {k: v for k, v in ims_dict.items()
+                     if k not in self.display_stats}
+        self.display_stats.clear()
 
-        f = functools.partial(self.aggregate_images, agg_func=agg_func)
+        f = functools.partial(self.aggregate_images, stat=stat)
 
-        for (key, aggr_img) in zip(ims_dict.keys(), self.aggregate_images_multithread(f, ims_dict)):
+        nbytes = max([FrameStats.nbytes(np.shape(ims[0]), len(ims), (stat,))
+                      for ims in remaining.values()], default=0)
+        max_workers = self.max_workers_for_memory(nbytes)
+        results = self.aggregate_images_multithread(f, remaining, max_workers)
+        for (key, aggr_img) in zip(remaining.keys(), results):
             ims_dict[key] = aggr_img
 
+    def process_image(self, img, ops):
+        # Apply processing operations to a single image
+        ims = imageseries.open(None, 'array', data=img[np.newaxis])
+        return imageseries.process.ProcessedImageSeries(ims, ops)[0]
+
     def add_omega_metadata(self, ims_dict):
         # Add on the omega metadata if there is any
         files = self.data['yml_files'] if 'yml_files' in self.data else self.files
@@ -377,6 +516,10 @@ class ImageLoadManager(QObject, metaclass=Singleton):
     def update_progress_text(self, text):
         self.progress_text.emit(text)
 
+    def set_progress(self, value):
+        self.progress_value = value
+        self.update_progress(value)
+
     def calculate_nchunk(self, num_ims, frames):
         """
         Calculate the number of chunks
@@ -393,39 +536,76 @@ class ImageLoadManager(QObject, metaclass=Singleton):
 
         return nchunk
 
-    def aggregate_images(self, key, ims, agg_func, progress_dict):
+    def aggregate_images(self, key, ims, stat, progress_dict):
         frames = len(ims)
         num_ims = len(progress_dict)
         nchunk = self.calculate_nchunk(num_ims, frames)
 
-        for i, img in enumerate(agg_func(ims, nchunk)):
-            progress_dict[key] = (i + 1) / nchunk
+        stats_iter = frame_stats_iter(ims, nchunk, [range(frames)], (stat,),
+                                      self.cancel_event)
+        for i, (stats,) in enumerate(stats_iter):
+            self.report_progress(progress_dict, key, (i + 1) / nchunk)
 
-        return [img]
+        self.check_cancelled()
+        return [stats.get(stat)]
+
+    def report_progress(self, progress_dict, key, fraction):
+        """
+        Record the fraction of the work done for key, and update the
+        progress. This is called from the worker threads.
+        """
+        with self.progress_lock:
+            progress_dict[key] = fraction
+            total = sum(progress_dict.values())
+            progress = total * 100 / self.progress_macro_steps
+            self.update_progress(self.progress_base + progress)
 
     def wait_with_progress(self, futures, progress_dict):
         """
-        Wait for futures to be resolved and update progress using the progress
-        dict.
+        Wait for futures to be resolved. The workers update the progress as
+        they go (see report_progress). If any of them fails or is cancelled,
+        the ones that have not started yet are cancelled.
+        """
+        done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+        if not_done:
+            for f in not_done:
+                f.cancel()
+            wait(not_done)
+
+        # Raise the first error, rather than one from a cancelled future
+        for f in done:
+            if f.exception() is not None:
+                raise f.exception()
+
+        # Start the next step from where this one left off
+        total = sum(progress_dict.values())
+        self.progress_base += total * 100 / self.progress_macro_steps
+        self.progress_value = self.progress_base
+
+    def max_workers_for_memory(self, nbytes):
         """
-        n_macro_steps = self.progress_macro_steps
-        orig_progress = self.progress_dialog.value()
-        while not all([f.done() for f in futures]):
-            total = sum([v for v in progress_dict.values()])
-            progress = total * 100 / n_macro_steps
-            self.update_progress(orig_progress + progress)
-            time.sleep(0.1)
-
-    def aggregate_images_multithread(self, f, ims_dict):
+        Get the number of aggregations to run at once, if each one uses
+        up to nbytes of memory. They are kept within memory_fraction of
+        the available memory, but at least one is always run.
+
+        :param nbytes: The most memory used by one aggregation
+        """
+        available = psutil.virtual_memory().available * self.memory_fraction
+        max_workers = int(available // max(nbytes, 1))
+        return max(1, min(max_workers, os.cpu_count() or 1))
+
+    def aggregate_images_multithread(self, f, ims_dict, max_workers=None):
         """
         Use ThreadPoolExecutor to aggregate images
 
         :param f: The aggregation function
         :param ims_dict: The imageseries to aggregate
+        :param max_workers: The most imageseries to aggregate at once
         """
         futures = []
         progress_dict = {key: 0.0 for key in ims_dict.keys()}
-        with ThreadPoolExecutor() as tp:
+        self.progress_base = self.progress_value
+        with ThreadPoolExecutor(max_workers) as tp:
             for (key, ims) in ims_dict.items():
                 futures.append(tp.submit(f, key, ims, progress_dict=progress_dict))
 
@@ -433,22 +613,53 @@ class ImageLoadManager(QObject, metaclass=Singleton):
 
         return [f.result() for f in futures]
 
-    def aggregate_dark(self, key, func, ims, frames, progress_dict):
+    def aggregate_dark(self, key, stat, ims, frames, display_frames,
+                       progress_dict):
         """
         Generate aggregated dark image.
 
+        The mean, maximum, and median are computed in a single pass over
+        the frames. If display_frames is not None, the statistics for the
+        display aggregation are gathered over those frames in the same pass.
+        Darks that were computed before are loaded from the dark cache.
+
         :param key: The detector
-        :param func: The aggregation function
+        :param stat: The statistic to compute
         :param ims: The imageseries
         :param frames: The number of frames to use
+        :param display_frames: The frames for display aggregation, or None
         :param progress_dict: Dict for progress reporting
         """
-        nchunk = self.calculate_nchunk(len(HexrdConfig().imageseries_dict), frames)
+        fingerprint = self.dark_fingerprints.get(key)
+        dark = self.dark_cache.load(fingerprint)
+        if dark is not None:
+            self.report_progress(progress_dict, key, 1.0)
+            return (key, dark)
+
+        frame_lists = [range(frames)]
+        stat_names = {stat}
+        if display_frames is not None:
+            frame_lists.append(display_frames)
+            stat_names.add(self.display_agg_stat)
+
+        num_frames = len(set().union(*frame_lists))
+        nchunk = self.calculate_nchunk(len(HexrdConfig().imageseries_dict),
+                                       num_frames)
 
-        for i, darkimg in enumerate(func(ims, nchunk, nframes=frames)):
-            progress_dict[key] = (i + 1) / nchunk
+        stats_iter = frame_stats_iter(ims, nchunk, frame_lists,
+                                      tuple(stat_names), self.cancel_event)
+        for i, stats in enumerate(stats_iter):
+            self.report_progress(progress_dict, key, (i + 1) / nchunk)
 
-        return (key, darkimg)
+        # Do not keep or cache a partial dark
+        self.check_cancelled()
+
+        if display_frames is not None:
+            self.display_stats[key] = stats[1]
+
+        dark = stats[0].get(stat)
+        self.dark_cache.save(fingerprint, dark)
+        return (key, dark)
 
     def aggregate_dark_multithread(self, aggr_op_dict):
         """
@@ -456,16 +667,32 @@ class ImageLoadManager(QObject, metaclass=Singleton):
         detector name to dark image.
 
         :param aggr_op_dict: A dict mapping the detector name to a tuple of the form
-                            (func, frames, ims), where func is the function to use to do
-                            the aggregation, frames is number of images to aggregate, and
-                            ims is the image series to perform the aggregation on.
+                            (stat, frames, ims, display_frames), where stat is the
+                            statistic to compute, frames is number of images to
+                            aggregate, ims is the image series to perform the
+                            aggregation on, and display_frames are the frames for
+                            display aggregation statistics (or None).
         """
+        # Each detector keeps its statistics in memory until it is done
+        nbytes = 0
+        for (stat, frames, ims, display_frames) in aggr_op_dict.values():
+            stats = {stat}
+            num_frames = frames
+            if display_frames is not None:
+                stats.add(self.display_agg_stat)
+                num_frames = len(set(range(frames)).union(display_frames))
+            nbytes = max(nbytes, FrameStats.nbytes(np.shape(ims[0]),
+                                                   num_frames, stats))
+
         futures = []
         progress_dict = {key: 0.0 for key in aggr_op_dict.keys()}
-        with ThreadPoolExecutor() as tp:
-            for (key, (op, frames, ims)) in aggr_op_dict.items():
+        self.progress_base = self.progress_value
+        max_workers = self.max_workers_for_memory(nbytes)
+        with ThreadPoolExecutor(max_workers) as tp:
+            for (key, (stat, frames, ims, display_frames)) in aggr_op_dict.items():
                 futures.append(tp.submit(
-                    self.aggregate_dark, key, op, ims, frames, progress_dict))
+                    self.aggregate_dark, key, stat, ims, frames,
+                    display_frames, progress_dict))
 
             self.wait_with_progress(futures, progress_dict)
 
@@ -59,6 +59,8 @@ class ImageModeWidget(QObject):
             HexrdConfig().set_cartesian_plane_normal_rotate_x)
         self.ui.cartesian_plane_normal_rotate_y.valueChanged.connect(
             HexrdConfig().set_cartesian_plane_normal_rotate_y)
+        self.ui.cartesian_tiled.toggled.connect(
+            HexrdConfig().set_cartesian_tiled)
         self.ui.polar_pixel_size_tth.valueChanged.connect(
             HexrdConfig()._set_polar_pixel_size_tth)
         self.ui.polar_pixel_size_eta.valueChanged.connect(
@@ -80,6 +82,8 @@ class ImageModeWidget(QObject):
             HexrdConfig().set_polar_snip1d_width)
         self.ui.polar_snip1d_numiter.valueChanged.connect(
             HexrdConfig().set_polar_snip1d_numiter)
+        self.ui.polar_sparse_warp.toggled.connect(
+            HexrdConfig().set_polar_sparse_warp)
         HexrdConfig().instrument_config_loaded.connect(
             self.auto_generate_cartesian_params)
         HexrdConfig().instrument_config_loaded.connect(
@@ -112,6 +116,7 @@ class ImageModeWidget(QObject):
             self.ui.cartesian_virtual_plane_distance,
             self.ui.cartesian_plane_normal_rotate_x,
             self.ui.cartesian_plane_normal_rotate_y,
+            self.ui.cartesian_tiled,
             self.ui.polar_pixel_size_tth,
             self.ui.polar_pixel_size_eta,
             self.ui.polar_res_tth_min,
@@ -122,7 +127,8 @@ class ImageModeWidget(QObject):
             self.ui.polar_snip1d_algorithm,
             self.ui.polar_snip1d_width,
             self.ui.polar_snip1d_numiter,
-            self.ui.polar_show_snip1d
+            self.ui.polar_show_snip1d,
+            self.ui.polar_sparse_warp
         ]
 
         return widgets
@@ -143,6 +149,8 @@ class ImageModeWidget(QObject):
             HexrdConfig().cartesian_plane_normal_rotate_x)
         self.ui.cartesian_plane_normal_rotate_y.setValue(
             HexrdConfig().cartesian_plane_normal_rotate_y)
+        self.ui.cartesian_tiled.setChecked(
+            HexrdConfig().cartesian_tiled)
         self.ui.polar_pixel_size_tth.setValue(
             HexrdConfig().polar_pixel_size_tth)
         self.ui.polar_pixel_size_eta.setValue(
@@ -163,6 +171,8 @@ class ImageModeWidget(QObject):
             HexrdConfig().polar_snip1d_width)
         self.ui.polar_snip1d_numiter.setValue(
             HexrdConfig().polar_snip1d_numiter)
+        self.ui.polar_sparse_warp.setChecked(
+            HexrdConfig().polar_sparse_warp)
 
         self.update_enable_states()
 
@@ -0,0 +1,159 @@
+import warnings
+
+import numpy as np
+
+
+def downsample(img):
+    """Halve the size of an image in each dimension
+
+    Every 2x2 block is reduced to either its maximum or its minimum,
+    whichever is farther from the median of the image. Sharp peaks stay
+    visible, and so do masked or zeroed regions.
+    """
+    # Pad to an even shape by repeating the last row and column
+    pad = [(0, x % 2) for x in img.shape]
+    if any(x[1] for x in pad):
+        img = np.pad(img, pad, mode='edge')
+
+    rows, cols = img.shape[0] // 2, img.shape[1] // 2
+    blocks = img.reshape(rows, 2, cols, 2)
+    with np.errstate(invalid='ignore'):
+        high = np.fmax.reduce(np.fmax.reduce(blocks, axis=3), axis=1)
+        low = np.fmin.reduce(np.fmin.reduce(blocks, axis=3), axis=1)
+
+    # One pixel of every block is plenty to estimate the median
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        median = np.nanmedian(blocks[:, 0, :, 0])
+
+    if np.isnan(median):
+        return high
+
+    return np.where(high - median >= median - low, high, low)
+
+
+class ImagePyramid:
+    """Multi-resolution levels of an image, for display
+
+    Level 0 is the image itself, and each level after it is downsampled
+    by a factor of 2 from the one before it. The levels are only
+    computed when they are first needed.
+
+    The extent is in matplotlib's (left, right, bottom, top) convention,
+    with the first row of the image at the top.
+
+    Levels after level 0 may also be given, such as ones in files on
+    disk. Only the region in view is then read from the image.
+    """
+
+    # Extra region around the view, as a fraction of the view size, to
+    # push to matplotlib. Small pans then do not need a new region.
+    margin = 0.25
+
+    def __init__(self, img, extent=None, levels=None):
+        if extent is None:
+            extent = (-0.5, img.shape[1] - 0.5, img.shape[0] - 0.5, -0.5)
+
+        self.levels = [img] + list(levels or [])
+        self.extent = tuple(extent)
+
+        # The (level, row slice, col slice) last returned by view()
+        self.current = None
+
+    @property
+    def image(self):
+        return self.levels[0]
+
+    @property
+    def shape(self):
+        return self.image.shape
+
+    def level(self, i):
+        while len(self.levels) <= i:
+            self.levels.append(downsample(self.levels[-1]))
+        return self.levels[i]
+
+    @property
+    def pixel_size(self):
+        # This may be negative, depending upon the extent
+        left, right, bottom, top = self.extent
+        rows, cols = self.shape
+        return (bottom - top) / rows, (right - left) / cols
+
+    def to_pixels(self, xlim, ylim):
+        # Get the sorted (row, col) ranges of the limits in pixels
+        left, right, bottom, top = self.extent
+        row_size, col_size = self.pixel_size
+        rows = sorted((y - top) / row_size for y in ylim)
+        cols = sorted((x - left) / col_size for x in xlim)
+        return rows, cols
+
+    def choose_level(self, num_rows, num_cols, height, width):
+        # Use the coarsest level that still has at least one pixel for
+        # every screen pixel.
+        level = 0
+        while (num_rows / 2**(level + 1) >= height and
+               num_cols / 2**(level + 1) >= width and
+               min(self.shape) // 2**(level + 1) > 1):
+            level += 1
+        return level
+
+    def view(self, xlim=None, ylim=None, width=1, height=1):
+        """Get the data and extent to display for a view
+
+        The view limits are in data coordinates, and the width and height
+        are in screen pixels. If the limits are None, the whole image is
+        used.
+
+        None is returned if the region last returned still covers the
+        view at the right level of detail.
+        """
+        rows, cols = self.shape
+        if xlim is None or ylim is None:
+            row_range, col_range = (0, rows), (0, cols)
+        else:
+            row_range, col_range = self.to_pixels(xlim, ylim)
+
+        row_range = np.clip(row_range, 0, rows)
+        col_range = np.clip(col_range, 0, cols)
+        num_rows = max(row_range[1] - row_range[0], 1)
+        num_cols = max(col_range[1] - col_range[0], 1)
+
+        level = self.choose_level(num_rows, num_cols, height, width)
+        factor = 2**level
+
+        if self.current is not None and self.current[0] == level:
+            _, row_slice, col_slice = self.current
+            if (row_slice.start * factor <= row_range[0] and
+                    row_slice.stop * factor >= min(row_range[1], rows) and
+                    col_slice.start * factor <= col_range[0] and
+                    col_slice.stop * factor >= min(col_range[1], cols)):
+                return None
+
+        # Add the margin, and convert to the pixels of the level
+        slices = []
+        for (start, stop), size, num in ((row_range, rows, num_rows),
+                                         (col_range, cols, num_cols)):
+            start = max(start - num * self.margin, 0)
+            stop = min(stop + num * self.margin, size)
+            level_size = -(-size // factor)
+            slices.append(slice(int(start // factor),
+                                min(int(np.ceil(stop / factor)),
+                                    level_size)))
+
+        row_slice, col_slice = slices
+        self.current = (level, row_slice, col_slice)
+
+        # The last level pixels may hang over the edge of the image.
+        # Clamp the extent to the image so it is never stretched.
+        left, right, bottom, top = self.extent
+        row_size, col_size = self.pixel_size
+        extent = (
+            left + col_slice.start * factor * col_size,
+            left + min(col_slice.stop * factor, cols) * col_size,
+            top + min(row_slice.stop * factor, rows) * row_size,
+            top + row_slice.start * factor * row_size,
+        )
+
+        data = self.level(level)[row_slice, col_slice]
+        return data, extent
@@ -122,6 +122,7 @@ class ImageTabWidget(QTabWidget):
 
     def change_ims_image(self, pos):
         HexrdConfig().current_imageseries_idx = pos
+        HexrdConfig().prefetch_frames(pos)
         self.update_needed.emit()
 
     @Slot(bool)
@@ -262,8 +263,10 @@ class ImageTabWidget(QTabWidget):
         if event.inaxes.get_images():
             # Image was created with imshow()
             artist = event.inaxes.get_images()[0]
-            i, j = utils.coords2index(artist, info['x_data'], info['y_data'])
-            intensity = artist.get_array()[i, j]
+            img, extent = event.canvas.full_image(artist)
+            i, j = utils.coords2index(artist, info['x_data'], info['y_data'],
+                                      img.shape, extent)
+            intensity = img[i, j]
         else:
             # This is probably just a plot. Do not calculate intensity.
             intensity = None
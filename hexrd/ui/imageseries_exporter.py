@@ -0,0 +1,415 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import io
+import os
+import queue
+import threading
+import time
+import zipfile
+
+import h5py
+import numpy as np
+
+try:
+    import hdf5plugin
+except ImportError:
+    hdf5plugin = None
+
+
+def compression_filters():
+    """Get the compression filters that are available for HDF5 export
+
+    Returns a dict of the name of the filter to the keyword arguments
+    for h5py's create_dataset(). Filters from hdf5plugin are included
+    if it is installed.
+    """
+    filters = {
+        'gzip': {
+            'compression': 'gzip',
+            'compression_opts': 4,
+            'shuffle': True,
+        },
+        'lzf': {
+            'compression': 'lzf',
+            'shuffle': True,
+        },
+        'none': {},
+    }
+
+    if hdf5plugin is not None:
+        filters['bitshuffle-lz4'] = dict(hdf5plugin.Bitshuffle(lz4=True))
+
+    return filters
+
+
+class HDF5Exporter:
+    """Write one or more imageseries to an HDF5 file
+
+    The layout is the same as that of the 'hdf5' imageseries writer: a
+    3D dataset of the frames in a group, with the metadata as the
+    attributes of the group. Each imageseries that is added gets its
+    own group. Each frame is its own chunk, so single frames may be
+    read back quickly, and the chunks are compressed.
+
+    The frames of each imageseries are read (and processed, for a
+    processed imageseries) on their own thread, while a single writer
+    thread compresses and writes the blocks of frames that are ready.
+    A bounded queue between them limits the memory that is used.
+    """
+
+    # The number of frames in each block passed to the writer thread
+    block_size = 16
+
+    # The maximum number of blocks waiting to be written
+    queue_size = 4
+
+    def __init__(self, fname, dataname='images', compression='gzip'):
+        self.fname = fname
+        self.dataname = dataname
+        self.series = []
+
+        filters = compression_filters()
+        if compression not in filters:
+            msg = f'Unknown compression: {compression}'
+            raise ValueError(msg)
+
+        self.filters = filters[compression]
+
+        self.lock = threading.Lock()
+        self.errors = []
+        self.frames_read = 0
+        self.num_frames = 0
+
+    def add(self, ims, path='imageseries'):
+        """Add an imageseries to write to the group at path"""
+        if len(ims) == 0:
+            raise ValueError(f'The imageseries for {path} has no frames')
+
+        self.series.append((ims, path))
+
+    def write(self, update_progress=None):
+        """Write the imageseries, and return the throughput statistics
+
+        If update_progress is given, it is called with the percentage of
+        frames that have been read.
+        """
+        if not self.series:
+            raise ValueError('No imageseries were added')
+
+        start_time = time.time()
+
+        self.errors.clear()
+        self.frames_read = 0
+        self.num_frames = sum(len(ims) for ims, _ in self.series)
+        num_bytes = 0
+
+        with h5py.File(self.fname, 'w') as f:
+            datasets = []
+            for ims, path in self.series:
+                # Processing may change the dtype, so use that of a frame
+                first = ims[0]
+                shape, dtype = first.shape, first.dtype
+                num_bytes += len(ims) * first.nbytes
+
+                group = f.create_group(path)
+                dset = group.create_dataset(
+                    self.dataname, (len(ims), *shape), dtype,
+                    chunks=(1, *shape), **self.filters)
+                self.write_metadata(group, ims.metadata)
+                datasets.append((ims, first, dset))
+
+            blocks = queue.Queue(maxsize=self.queue_size)
+            writer = threading.Thread(target=self._write_blocks,
+                                      args=(blocks,))
+            writer.start()
+
+            try:
+                with ThreadPoolExecutor(len(datasets)) as executor:
+                    futures = [
+                        executor.submit(self._read_blocks, ims, first, dset,
+                                        blocks, update_progress)
+                        for ims, first, dset in datasets
+                    ]
+                    for future in futures:
+                        future.result()
+            finally:
+                blocks.put(None)
+                writer.join()
+
+            if self.errors:
+                raise self.errors[0]
+
+        seconds = time.time() - start_time
+        return {
+            'frames': self.num_frames,
+            'bytes': num_bytes,
+            'seconds': seconds,
+            'frames_per_second': (self.num_frames / seconds
+                                  if seconds else 0.0),
+            'mb_per_second': num_bytes / 1e6 / seconds if seconds else 0.0,
+        }
+
+    def _read_blocks(self, ims, first, dset, blocks, update_progress):
+        try:
+            num_frames = len(ims)
+            for start in range(0, num_frames, self.block_size):
+                if self.errors:
+                    # Another thread failed. Stop early.
+                    return
+
+                stop = min(start + self.block_size, num_frames)
+                block = np.empty((stop - start, *first.shape),
+                                 dtype=first.dtype)
+                for i in range(start, stop):
+                    block[i - start] = first if i == 0 else ims[i]
+
+                blocks.put((dset, start, block))
+                with self.lock:
+                    self.frames_read += stop - start
+                    progress = int(self.frames_read * 100 / self.num_frames)
+
+                if update_progress:
+                    update_progress(progress)
+        except Exception as e:
+            self.errors.append(e)
+
+    @staticmethod
+    def write_metadata(group, metadata):
+        for k, v in metadata.items():
+            try:
+                group.attrs[k] = v
+            except TypeError:
+                group.attrs[k] = str(v)
+
+    def _write_blocks(self, blocks):
+        while True:
+            item = blocks.get()
+            if item is None:
+                return
+
+            if self.errors:
+                # Keep taking the blocks, so that the readers are not stuck
+                continue
+
+            dset, start, block = item
+            try:
+                dset[start:start + len(block)] = block
+            except Exception as e:
+                self.errors.append(e)
+
+
+def frame_cache_file_name(fname, name):
+    """Get the file name for one detector in a batch frame-cache export"""
+    root, ext = os.path.splitext(fname)
+    return f'{root}_{name}{ext or ".npz"}'
+
+
+class FrameCacheExporter:
+    """Write an imageseries to a frame-cache (sparse npz) file
+
+    The layout is the same as that of the 'frame-cache' imageseries
+    writer: the row, column, and value arrays of the pixels of each
+    frame that are above the threshold, along with the shape, number of
+    frames, dtype, and metadata.
+
+    Chunks of frames are read and thresholded on a thread pool, and the
+    arrays are written to the npz file as each chunk is ready, in order,
+    so the whole sparse imageseries is never held in memory.
+
+    The size of the file for a threshold may be estimated quickly from
+    a sample of the frames, with estimate().
+    """
+
+    # The number of frames in each chunk that is thresholded at once
+    chunk_size = 16
+
+    # The number of frames to sample for estimate()
+    num_samples = 16
+
+    def __init__(self, ims, fname, threshold):
+        self.ims = ims
+        self.fname = fname
+        self.threshold = threshold
+        self._samples = None
+
+    def sparsify(self, frame):
+        rows, cols = np.nonzero(frame > self.threshold)
+        return rows.astype(np.uint16), cols.astype(np.uint16), frame[rows,
+                                                                      cols]
+
+    def _sparsify_chunk(self, start, stop):
+        return [self.sparsify(self.ims[i]) for i in range(start, stop)]
+
+    def write(self, update_progress=None, executor=None, max_workers=None):
+        """Write the imageseries, and return the size statistics
+
+        If update_progress is given, it is called with the percentage of
+        frames that have been written. The chunks are thresholded on
+        executor, if it is given, so that several exporters may share
+        its workers, and max_workers is this export's share of them.
+        Otherwise, a thread pool is made for this export.
+        """
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+
+        if executor is None:
+            with ThreadPoolExecutor(max_workers) as executor:
+                return self.write(update_progress, executor, max_workers)
+
+        start_time = time.time()
+
+        num_frames = len(self.ims)
+        if num_frames == 0:
+            raise ValueError('The imageseries has no frames')
+
+        # Processing may change the dtype, so use that of a frame
+        first = self.ims[0]
+        num_nonzero = 0
+
+        with zipfile.ZipFile(self.fname, 'w', zipfile.ZIP_DEFLATED,
+                             allowZip64=True) as zf:
+            # Keep a few chunks ahead of the one being written
+            max_pending = 2 * max_workers
+            pending = deque()
+            starts = iter(range(0, num_frames, self.chunk_size))
+            while True:
+                for start in starts:
+                    stop = min(start + self.chunk_size, num_frames)
+                    pending.append((start, executor.submit(
+                        self._sparsify_chunk, start, stop)))
+                    if len(pending) >= max_pending:
+                        break
+
+                if not pending:
+                    break
+
+                start, future = pending.popleft()
+                for i, (rows, cols, vals) in enumerate(future.result(),
+                                                       start):
+                    write_npy(zf, f'{i}_row', rows)
+                    write_npy(zf, f'{i}_col', cols)
+                    write_npy(zf, f'{i}_data', vals)
+                    num_nonzero += len(vals)
+
+                if update_progress:
+                    done = min(start + self.chunk_size, num_frames)
+                    update_progress(int(done * 100 / num_frames))
+
+            write_npy(zf, 'shape', np.array(first.shape))
+            write_npy(zf, 'nframes', np.array(num_frames))
+            write_npy(zf, 'dtype', np.array(str(first.dtype).encode()))
+            for k, v in self.ims.metadata.items():
+                v = np.asarray(v)
+                if v.dtype == object:
+                    v = np.array(str(v.tolist()))
+                write_npy(zf, k, v)
+
+        seconds = time.time() - start_time
+        num_bytes = num_frames * first.nbytes
+        return {
+            'frames': num_frames,
+            'bytes': num_bytes,
+            'seconds': seconds,
+            'frames_per_second': num_frames / seconds if seconds else 0.0,
+            'mb_per_second': num_bytes / 1e6 / seconds if seconds else 0.0,
+            'fraction': num_nonzero / (num_frames * first.size),
+            'file_size': os.path.getsize(self.fname),
+        }
+
+    def read_samples(self):
+        """Read the sample of frames for estimate(), if not done already
+
+        This is the slow part of an estimate, so it may be called ahead
+        of time, in a background thread.
+        """
+        if self._samples is not None:
+            return
+
+        indices = np.unique(np.linspace(0, len(self.ims) - 1,
+                                        self.num_samples).astype(int))
+        self._samples = [self.ims[i] for i in indices]
+
+    def estimate(self):
+        """Estimate the fraction of pixels kept, and the size of the file
+
+        A sample of evenly spaced frames is thresholded and compressed,
+        and the size is scaled to the number of frames. The sample is
+        only read once, so the threshold may be changed and the size
+        estimated again quickly.
+        """
+        num_frames = len(self.ims)
+        self.read_samples()
+
+        arrays = {}
+        num_nonzero = 0
+        for i, frame in enumerate(self._samples):
+            rows, cols, vals = self.sparsify(frame)
+            arrays[f'{i}_row'] = rows
+            arrays[f'{i}_col'] = cols
+            arrays[f'{i}_data'] = vals
+            num_nonzero += len(vals)
+
+        buf = io.BytesIO()
+        np.savez_compressed(buf, **arrays)
+
+        num_samples = len(self._samples)
+        num_pixels = num_samples * self._samples[0].size
+        return {
+            'fraction': num_nonzero / num_pixels,
+            'file_size': buf.tell() * num_frames / num_samples,
+        }
+
+
+def write_npy(zf, name, array):
+    """Write an array to an npz file that is open as a zip file"""
+    with zf.open(f'{name}.npy', 'w', force_zip64=True) as f:
+        np.lib.format.write_array(f, np.asanyarray(array),
+                                  allow_pickle=False)
+
+
+def write_frame_caches(ims_dict, fname, threshold, update_progress=None):
+    """Write each imageseries to its own frame-cache file, concurrently
+
+    Each file is written with a FrameCacheExporter. The exporters share
+    one thread pool for thresholding the frames, so the detectors are
+    processed at the same time without using more workers than there
+    are CPUs. The file names are made with frame_cache_file_name().
+    Returns the list of file names.
+    """
+    fnames = [frame_cache_file_name(fname, name) for name in ims_dict]
+    progress = [0] * len(ims_dict)
+    lock = threading.Lock()
+
+    def progress_func(i):
+        def func(x):
+            with lock:
+                progress[i] = x
+                total = int(sum(progress) / len(progress))
+
+            if update_progress:
+                update_progress(total)
+        return func
+
+    max_workers = os.cpu_count() or 1
+    num_writers = len(ims_dict) or 1
+    share = -(-max_workers // num_writers)
+    with ThreadPoolExecutor(max_workers) as executor, \
+            ThreadPoolExecutor(num_writers) as writers:
+        futures = []
+        for i, (ims, f) in enumerate(zip(ims_dict.values(), fnames)):
+            exporter = FrameCacheExporter(ims, f, threshold)
+            futures.append(writers.submit(exporter.write, progress_func(i),
+                                          executor, share))
+
+        for future in futures:
+            # Raise any exception from the writers
+            future.result()
+
+    return fnames
+
+
+def throughput_message(stats):
+    """A short description of the throughput statistics from an export"""
+    return (f'Saved {stats["frames"]} frames in {stats["seconds"]:.1f} s '
+            f'({stats["frames_per_second"]:.1f} frames/s, '
+            f'{stats["mb_per_second"]:.1f} MB/s)')
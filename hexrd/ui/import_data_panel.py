@@ -185,8 +185,8 @@ class ImportDataPanel(QObject):
                 self.cmap.block_updates(True)
             ImageLoadManager().read_data(files, parent=self.ui)
             img_shape = HexrdConfig().image(self.detector, 0).shape
-            self.canvas.axes_images[0].set_extent(
-                (-0.5, img_shape[1], img_shape[0], -0.5))
+            extent = (-0.5, img_shape[1], img_shape[0], -0.5)
+            self.canvas.set_image_extent(self.canvas.axes_images[0], extent)
             self.cmap.block_updates(False)
 
             file_names = [os.path.split(f[0])[1] for f in files]
@@ -214,8 +214,8 @@ class ImportDataPanel(QObject):
             self.edited_images[self.detector]['img'] = img
             self.edited_images[self.detector]['height'] = img.shape[0]
             self.edited_images[self.detector]['width'] = img.shape[1]
-            self.canvas.axes_images[0].set_extent(
-                (0, img.shape[1], img.shape[0], 0))
+            extent = (0, img.shape[1], img.shape[0], 0)
+            self.canvas.set_image_extent(self.canvas.axes_images[0], extent)
             self.canvas.draw()
 
         if self.it:
@@ -335,8 +335,8 @@ class ImportDataPanel(QObject):
             'width': img.shape[1],
             'tilt': self.it.rotation
         }
-        self.canvas.axes_images[0].set_extent(
-            (0, img.shape[1], img.shape[0], 0))
+        extent = (0, img.shape[1], img.shape[0], 0)
+        self.canvas.set_image_extent(self.canvas.axes_images[0], extent)
 
         self.it.redraw()
         self.clear_boundry()
@@ -58,7 +58,7 @@ class InteractiveTemplate:
 
     @property
     def bounds(self):
-        l, r, b, t = self.ax.get_extent()
+        l, r, b, t = self.parent.full_image(self.ax)[1]
         x0, y0 = np.nanmin(self.shape.xy, axis=0)
         x1, y1 = np.nanmax(self.shape.xy, axis=0)
         return np.array([max(np.floor(y0), t),
@@ -218,7 +218,7 @@ class InteractiveTemplate:
         return [(x1 + x0)/2, (y1 + y0)/2]
 
     def mouse_position(self, e):
-        xmin, xmax, ymin, ymax = self.ax.get_extent()
+        xmin, xmax, ymin, ymax = self.parent.full_image(self.ax)[1]
         x, y = self.get_midpoint()
         xdata = e.xdata
         ydata = e.ydata
@@ -100,7 +100,9 @@ class LinePickerDialog(QObject):
         self.ring_data.clear()
 
         while self.lines:
-            self.lines.pop(0).remove()
+            line = self.lines.pop(0)
+            self.canvas.blit_manager.remove_artist(line)
+            line.remove()
 
         self.linebuilder = None
         self.cursor = None
@@ -110,7 +112,7 @@ class LinePickerDialog(QObject):
 
         self.canvas.mpl_disconnect(self.bp_id)
         self.bp_id = None
-        self.canvas.draw()
+        self.canvas.blit_manager.update()
 
     def zoom_width_changed(self):
         self.zoom_canvas.tth_tol = self.ui.zoom_tth_width.value()
@@ -169,6 +171,7 @@ class LinePickerDialog(QObject):
         # empty line
         line, = ax.plot([], [], color=color, marker=marker,
                         linestyle=linestyle)
+        self.canvas.blit_manager.add_artist(line)
         self.linebuilder = LineBuilder(line)
 
         self.linebuilder.point_picked.connect(self.point_picked.emit)
@@ -176,7 +179,7 @@ class LinePickerDialog(QObject):
         self.update_enable_states()
 
         self.lines.append(line)
-        self.canvas.draw()
+        self.canvas.blit_manager.update()
 
     def line_finished(self):
         linebuilder = self.linebuilder
@@ -274,4 +277,5 @@ class LineBuilder(QObject):
 
     def update_line_data(self):
         self.line.set_data(self.xs, self.ys)
-        self.canvas.draw()
+        # Only the picked points changed
+        self.canvas.blit_manager.update()
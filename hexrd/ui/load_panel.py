@@ -13,6 +13,7 @@ from hexrd.ui.hexrd_config import HexrdConfig
 from hexrd.ui.image_file_manager import ImageFileManager
 from hexrd.ui.image_load_manager import ImageLoadManager
 from hexrd.ui.load_images_dialog import LoadImagesDialog
+from hexrd.ui.metadata_scanner import MetadataScanner
 from hexrd.ui.ui_loader import UiLoader
 
 """
@@ -42,6 +43,12 @@ class LoadPanel(QObject):
         self.omega_max = []
         self.idx = 0
         self.ext = ''
+        self.yml_data = {}
+
+        # The file metadata is read in the background
+        self.metadata_scanner = MetadataScanner(self)
+        self.scan_id = None
+        self.scan_errors = []
         self.progress_dialog = None
         self.current_progress_step = 0
         self.progress_macro_steps = 0
@@ -90,6 +97,9 @@ class LoadPanel(QObject):
 
         self.ui.file_options.cellChanged.connect(self.enable_aggregations)
 
+        self.metadata_scanner.file_scanned.connect(self.file_scanned)
+        self.metadata_scanner.finished.connect(self.scan_finished)
+
     def setup_processing_options(self):
         self.state = copy.copy(HexrdConfig().load_panel_state)
         num_dets = len(HexrdConfig().detector_names)
@@ -209,9 +219,11 @@ class LoadPanel(QObject):
         self.omega_max = []
         self.delta = []
         self.files = []
+        self.yml_data = {}
+        self.scan_id = None
 
     def enable_aggregations(self, row, column):
-        if not (column == 1 or column == 2):
+        if not (column == 1 or column == 2) or self.scanning:
             return
 
         enable = True
@@ -243,24 +255,67 @@ class LoadPanel(QObject):
             if ImageFileManager().path_prompt(selected_files[0]) is None:
                 return
 
-        tmp_ims = []
-        for img in selected_files:
-            if self.ext != '.yml':
-                tmp_ims.append(ImageFileManager().open_file(img))
-
         self.find_images(selected_files)
 
         if not self.files:
             return
 
+        # Read the metadata of the files for the table in the background.
+        # The table is filled in as the results arrive.
+        scan_files = self.table_files[self.idx]
+        num_files = len(scan_files)
+        self.total_frames = [0] * num_files
+        self.omega_min = [''] * num_files
+        self.omega_max = [''] * num_files
+        self.delta = [''] * num_files
+        self.scan_errors = []
+        self.scan_id = self.metadata_scanner.scan(scan_files)
+
+    @property
+    def table_files(self):
+        return self.yml_files if self.ext == '.yml' else self.files
+
+    @property
+    def scanning(self):
+        return self.scan_id is not None
+
+    def file_scanned(self, scan_id, row, metadata):
+        if scan_id != self.scan_id:
+            # This is from an older selection of files
+            return
+
+        if isinstance(metadata, Exception):
+            name = os.path.basename(self.table_files[self.idx][row])
+            self.scan_errors.append(f'{name}: {metadata}')
+            metadata = {'frames': 0, 'omega': None}
+
+        frames = metadata['frames']
+        self.total_frames[row] = frames if frames > 0 else 1
         if self.ext == '.yml':
-            for yf in self.yml_files[0]:
-                ims = ImageFileManager().open_file(yf)
-                self.total_frames.append(len(ims) if len(ims) > 0 else 1)
+            # The omega data is in the yml files. It is set when every
+            # file has been scanned.
+            self.update_row(row)
+            return
 
+        if metadata['omega'] is not None:
+            self.get_omega_data(row, metadata['omega'], frames)
+        else:
+            self.omega_min[row] = '0'
+            self.omega_max[row] = '0.25'
+            self.delta[row] = ''
+        self.update_row(row)
+
+    def scan_finished(self, scan_id):
+        if scan_id != self.scan_id:
+            return
+
+        self.scan_id = None
+        if self.ext == '.yml':
+            self.omega_min = []
+            self.omega_max = []
+            self.delta = []
             for f in self.files[0]:
-                with open(f, 'r') as raw_file:
-                    data = yaml.safe_load(raw_file)
+                data = self.yml_data[f]
                 if 'ostart' in data['meta'] or 'omega' in data['meta']:
                     self.get_yaml_omega_data(data)
                 else:
@@ -268,25 +323,23 @@ class LoadPanel(QObject):
                     self.omega_max = ['0.25'] * len(self.yml_files[0])
                     self.delta = [''] * len(self.yml_files[0])
                 self.empty_frames = data['options']['empty-frames']
-        else:
-            for ims in tmp_ims:
-                has_omega = 'omega' in ims.metadata
-                self.total_frames.append(len(ims) if len(ims) > 0 else 1)
-                if has_omega:
-                    self.get_omega_data(ims)
-                else:
-                    self.omega_min.append('0')
-                    self.omega_max.append('0.25')
-                    self.delta.append('')
+            self.create_table()
+
+        if self.scan_errors:
+            msg = ('ERROR - Could not read file(s): \n' +
+                   '\n'.join(self.scan_errors))
+            QMessageBox.warning(self.ui, 'HEXRD', msg)
 
-    def get_omega_data(self, ims):
-        minimum = ims.metadata['omega'][0][0]
-        size = len(ims.metadata['omega']) - 1
-        maximum = ims.metadata['omega'][size][1]
+        self.enable_aggregations(0, 2)
+        self.enable_read()
 
-        self.omega_min.append(minimum)
-        self.omega_max.append(maximum)
-        self.delta.append((maximum - minimum)/len(ims))
+    def get_omega_data(self, row, omega, frames):
+        minimum = omega[0][0]
+        maximum = omega[-1][1]
+
+        self.omega_min[row] = minimum
+        self.omega_max[row] = maximum
+        self.delta[row] = (maximum - minimum) / frames
 
     def get_yaml_omega_data(self, data):
         if 'ostart' in data['meta']:
@@ -337,12 +390,15 @@ class LoadPanel(QObject):
             self.get_yml_files()
 
     def get_yml_files(self):
+        # The parsed yml files are kept, so they are only read once
         self.yml_files = []
+        self.yml_data = {}
         for det in self.files:
             files = []
             for f in det:
                 with open(f, 'r') as yml_file:
-                    data = yaml.safe_load(yml_file)['image-files']
+                    self.yml_data[f] = yaml.safe_load(yml_file)
+                data = self.yml_data[f]['image-files']
                 raw_images = data['files'].split()
                 for raw_image in raw_images:
                     files.extend(glob.glob(
@@ -350,6 +406,11 @@ class LoadPanel(QObject):
             self.yml_files.append(files)
 
     def enable_read(self):
+        if self.scanning:
+            # Wait for the metadata of all of the files
+            self.ui.read.setEnabled(False)
+            return
+
         if (self.ext == '.tiff'
                 or '' not in self.omega_min and '' not in self.omega_max):
             if (self.state['dark'][self.idx] == 4
@@ -368,11 +429,7 @@ class LoadPanel(QObject):
         if not len(self.files):
             return
 
-        if self.ext == '.yml':
-            table_files = self.yml_files
-        else:
-            table_files = self.files
-
+        table_files = self.table_files
         self.ui.file_options.setRowCount(
             len(table_files[self.idx]))
 
@@ -388,10 +445,7 @@ class LoadPanel(QObject):
             curr = table_files[self.idx][i]
             self.ui.file_options.item(i, 0).setText(os.path.split(curr)[1])
             self.ui.file_options.item(i, 1).setText(str(self.empty_frames))
-            self.ui.file_options.item(i, 2).setText(str(self.total_frames[i]))
-            self.ui.file_options.item(i, 3).setText(str(self.omega_min[i]))
-            self.ui.file_options.item(i, 4).setText(str(self.omega_max[i]))
-            self.ui.file_options.item(i, 5).setText(str(self.delta[i]))
+            self.populate_row(i)
 
             # Set tooltips
             self.ui.file_options.item(i, 0).setToolTip(curr)
@@ -410,6 +464,23 @@ class LoadPanel(QObject):
 
         self.ui.file_options.resizeColumnsToContents()
 
+    def populate_row(self, row):
+        # The metadata columns are blank until the file has been scanned
+        scanned = self.total_frames[row] != 0
+        values = (self.total_frames[row], self.omega_min[row],
+                  self.omega_max[row], self.delta[row])
+        for column, value in enumerate(values, 2):
+            text = str(value) if scanned else ''
+            self.ui.file_options.item(row, column).setText(text)
+
+    def update_row(self, row):
+        # Fill in a row of the table, once its file has been scanned
+        if row >= self.ui.file_options.rowCount():
+            return
+
+        self.populate_row(row)
+        self.ui.file_options.resizeColumnsToContents()
+
     def contextMenuEvent(self, event):
         # Allow user to delete selected file(s)
         menu = QMenu(self.ui)
@@ -488,5 +559,6 @@ class LoadPanel(QObject):
         if self.ext == '.yml':
             data['yml_files'] = self.yml_files
         HexrdConfig().load_panel_state.update(copy.copy(self.state))
-        ImageLoadManager().read_data(self.files, data, self.parent())
-        self.images_loaded.emit()
+        if ImageLoadManager().read_data(self.files, data, self.parent(),
+                                        cancellable=True):
+            self.images_loaded.emit()
@@ -1,3 +1,4 @@
+import multiprocessing
 import signal
 import sys
 from PySide2.QtCore import QCoreApplication, Qt
@@ -6,9 +7,13 @@ from PySide2.QtWidgets import QApplication
 
 from hexrd.ui import resource_loader
 from hexrd.ui.main_window import MainWindow
+from hexrd.ui.parallel_warp import shutdown_process_pool
 import hexrd.ui.resources.icons
 
 def main():
+    # Needed for the warp worker processes in frozen executables
+    multiprocessing.freeze_support()
+
     # Kill the program when ctrl-c is used
     signal.signal(signal.SIGINT, signal.SIG_DFL)
 
@@ -18,6 +23,7 @@ def main():
     QCoreApplication.setApplicationName('hexrd')
 
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(shutdown_process_pool)
 
     data = resource_loader.load_resource(hexrd.ui.resources.icons,
                                          'hexrd.ico', binary=True)
@@ -22,14 +22,17 @@ from hexrd.ui.indexing.fit_grains_results_dialog import FitGrainsResultsDialog
 from hexrd.ui.calibration.calibration_runner import CalibrationRunner
 from hexrd.ui.calibration.powder_calibration import run_powder_calibration
 from hexrd.ui.calibration.wppf_runner import WppfRunner
-from hexrd.ui.create_polar_mask import convert_raw_to_polar, create_polar_mask
-from hexrd.ui.create_raw_mask import convert_polar_to_raw, create_raw_mask
+from hexrd.ui.create_polar_mask import create_polar_mask, rebuild_polar_masks
+from hexrd.ui.create_raw_mask import rebuild_raw_masks
 from hexrd.ui.utils import create_unique_name
 from hexrd.ui.constants import (
-    OverlayType, ViewType, WORKFLOW_HEDM, WORKFLOW_LLNL)
+    OverlayType, ViewType, WarpMode, WORKFLOW_HEDM, WORKFLOW_LLNL)
 from hexrd.ui.hexrd_config import HexrdConfig
 from hexrd.ui.image_file_manager import ImageFileManager
 from hexrd.ui.image_load_manager import ImageLoadManager
+from hexrd.ui.imageseries_exporter import (
+    compression_filters, FrameCacheExporter, throughput_message
+)
 from hexrd.ui.import_data_panel import ImportDataPanel
 from hexrd.ui.load_images_dialog import LoadImagesDialog
 from hexrd.ui.load_panel import LoadPanel
@@ -149,6 +152,10 @@ class MainWindow(QObject):
             self.on_action_export_polar_plot_triggered)
         self.ui.action_edit_euler_angle_convention.triggered.connect(
             self.on_action_edit_euler_angle_convention)
+        self.ui.action_edit_parallel_warp_mode.triggered.connect(
+            self.on_action_edit_parallel_warp_mode)
+        self.ui.action_edit_frame_cache.triggered.connect(
+            self.on_action_edit_frame_cache)
         self.ui.action_edit_apply_polar_mask.triggered.connect(
             self.on_action_edit_apply_polar_mask_triggered)
         self.ui.action_edit_apply_polar_mask.triggered.connect(
@@ -445,8 +452,9 @@ class MainWindow(QObject):
                 for d, f in zip(detector_names, image_files):
                     pos = HexrdConfig().detector_names.index(d)
                     files[pos].append(f)
-                ImageLoadManager().read_data(files, parent=self.ui)
-                self.images_loaded()
+                if ImageLoadManager().read_data(files, parent=self.ui,
+                                                cancellable=True):
+                    self.images_loaded()
 
     def images_loaded(self):
         self.ui.action_transform_detectors.setEnabled(True)
@@ -491,9 +499,10 @@ class MainWindow(QObject):
         else:
             ims_dict = HexrdConfig().imageseries_dict
 
+        all_detectors = 'All Detectors'
         if len(ims_dict) > 1:
-            # Have the user choose an imageseries to save
-            names = list(ims_dict.keys())
+            # Have the user choose an imageseries to save, or all of them
+            names = list(ims_dict.keys()) + [all_detectors]
             name, ok = QInputDialog.getItem(self.ui, 'HEXRD',
                                             'Select ImageSeries', names, 0,
                                             False)
@@ -518,12 +527,27 @@ class MainWindow(QObject):
             if selected_format == 'hdf5':
                 # A path must be specified. Set it ourselves for now.
                 kwargs['path'] = 'imageseries'
+
+                # Get the user to pick a compression filter
+                filters = list(compression_filters().keys())
+                result, ok = QInputDialog.getItem(self.ui, 'HEXRD',
+                                                  'Choose Compression',
+                                                  filters, 0, False)
+                if not ok:
+                    # User canceled...
+                    return
+
+                kwargs['compression'] = result
             elif selected_format == 'frame-cache':
                 # Get the user to pick a threshold
-                result, ok = QInputDialog.getDouble(self.ui, 'HEXRD',
-                                                    'Choose Threshold',
-                                                    10, 0, 1e12, 3)
-                if not ok:
+                if name == all_detectors:
+                    result = self.choose_frame_cache_threshold(
+                        list(ims_dict.values()))
+                else:
+                    result = self.choose_frame_cache_threshold(
+                        [ims_dict.get(name)])
+
+                if result is None:
                     # User canceled...
                     return
 
@@ -533,8 +557,119 @@ class MainWindow(QObject):
                 # to be the same as the file name...
                 kwargs['cache_file'] = selected_file
 
-            HexrdConfig().save_imageseries(ims_dict.get(name), name, selected_file,
-                                           selected_format, **kwargs)
+            if name == all_detectors:
+                self.save_imageseries(ims_dict, name, selected_file,
+                                      selected_format, **kwargs)
+            else:
+                self.save_imageseries(ims_dict.get(name), name, selected_file,
+                                      selected_format, **kwargs)
+
+    def choose_frame_cache_threshold(self, ims_list):
+        # Have the user pick a threshold, showing an estimate of the size
+        # of the frame-cache for it, until they accept one. Returns None
+        # if they cancel.
+        exporters = [FrameCacheExporter(ims, None, 0) for ims in ims_list]
+        if not self.read_frame_cache_samples(exporters):
+            return None
+
+        threshold = 10
+        while True:
+            threshold, ok = QInputDialog.getDouble(self.ui, 'HEXRD',
+                                                   'Choose Threshold',
+                                                   threshold, 0, 1e12, 3)
+            if not ok:
+                return None
+
+            estimates = []
+            for exporter in exporters:
+                exporter.threshold = threshold
+                estimates.append(exporter.estimate())
+
+            fraction = np.mean([x['fraction'] for x in estimates])
+            size = sum(x['file_size'] for x in estimates)
+            msg = (f'About {fraction:.2%} of the pixels are above the '
+                   f'threshold, and the estimated size is '
+                   f'{size / 1e6:.1f} MB.\n\nSave with this threshold?')
+            response = QMessageBox.question(
+                self.ui, 'HEXRD', msg,
+                QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel)
+            if response == QMessageBox.Yes:
+                return threshold
+            elif response == QMessageBox.Cancel:
+                return None
+
+    def read_frame_cache_samples(self, exporters):
+        # Read the sample frames for the size estimates in a background
+        # thread, while the progress is shown. After this, estimates
+        # only threshold the samples again. Returns whether it worked.
+        def _read(update_progress):
+            for i, exporter in enumerate(exporters):
+                exporter.read_samples()
+                update_progress(int((i + 1) * 100 / len(exporters)))
+
+        errors = []
+        worker = AsyncWorker(_read)
+        self.progress_dialog.setRange(0, 100)
+        self.progress_dialog.setValue(0)
+        self.progress_dialog.setWindowTitle('Estimating Size')
+        self.progress_dialog.setLabelText('Reading sample frames...')
+
+        worker.signals.progress.connect(self.progress_dialog.setValue)
+        worker.signals.error.connect(errors.append)
+        worker.signals.finished.connect(self.progress_dialog.accept)
+        self.thread_pool.start(worker)
+        self.progress_dialog.exec_()
+
+        if errors:
+            msg = f'Failed to read the sample frames: {errors[0][1]}'
+            QMessageBox.critical(self.ui, 'HEXRD', msg)
+            return False
+
+        return True
+
+    def save_imageseries(self, ims, name, selected_file, selected_format,
+                         **kwargs):
+        # ims may be a dict of every detector's imageseries
+        def _save(update_progress):
+            if isinstance(ims, dict):
+                return HexrdConfig().save_all_imageseries(
+                    ims, selected_file, selected_format,
+                    update_progress=update_progress, **kwargs)
+
+            return HexrdConfig().save_imageseries(
+                ims, name, selected_file, selected_format,
+                update_progress=update_progress, **kwargs)
+
+        # Save in a background thread, so the frames can be processed
+        # and written while the progress is shown.
+        worker = AsyncWorker(_save)
+        self.thread_pool.start(worker)
+
+        if selected_format in ('hdf5', 'frame-cache'):
+            self.progress_dialog.setRange(0, 100)
+        else:
+            # There are no progress updates for the other formats
+            self.progress_dialog.setRange(0, 0)
+        self.progress_dialog.setValue(0)
+        self.progress_dialog.setWindowTitle('Saving ImageSeries')
+        self.progress_dialog.setLabelText(f'Saving {name}...')
+
+        worker.signals.progress.connect(self.progress_dialog.setValue)
+        worker.signals.result.connect(self.finish_save_imageseries)
+        worker.signals.error.connect(self.save_imageseries_failed)
+        worker.signals.finished.connect(self.progress_dialog.accept)
+        self.progress_dialog.exec_()
+
+    def finish_save_imageseries(self, stats):
+        if stats is None:
+            msg = 'ImageSeries saved'
+        else:
+            msg = throughput_message(stats)
+        HexrdConfig().emit_update_status_bar(msg)
+
+    def save_imageseries_failed(self, error):
+        msg = f'Failed to save the ImageSeries: {error[1]}'
+        QMessageBox.critical(self.ui, 'HEXRD', msg)
 
     def on_action_save_materials_triggered(self):
         selected_file, selected_filter = QFileDialog.getSaveFileName(
@@ -627,6 +762,48 @@ class MainWindow(QObject):
         self.update_all()
         self.update_config_gui()
 
+    def on_action_edit_parallel_warp_mode(self):
+        allowed_modes = [
+            'Serial',
+            'Threads',
+            'Processes'
+        ]
+        corresponding_values = [
+            WarpMode.serial,
+            WarpMode.threads,
+            WarpMode.processes
+        ]
+        current = HexrdConfig().parallel_warp_mode
+        ind = corresponding_values.index(current)
+
+        name, ok = QInputDialog.getItem(self.ui, 'HEXRD',
+                                        'Select Parallel Warp Mode',
+                                        allowed_modes, ind, False)
+
+        if not ok:
+            # User canceled...
+            return
+
+        chosen = corresponding_values[allowed_modes.index(name)]
+        HexrdConfig().set_parallel_warp_mode(chosen)
+
+    def on_action_edit_frame_cache(self):
+        # Show how the frame cache is doing, and let its size be changed
+        mb = 1024 ** 2
+        current = HexrdConfig().frame_cache_max_bytes // mb
+        stats = HexrdConfig().frame_cache_stats_message
+        HexrdConfig().emit_update_status_bar(f'Frame cache: {stats}')
+
+        label = f'Frame cache: {stats}\n\nFrame cache size (MB):'
+        size, ok = QInputDialog.getInt(self.ui, 'HEXRD', label, current, 1,
+                                       2**31 - 1)
+
+        if not ok:
+            # User canceled...
+            return
+
+        HexrdConfig().set_frame_cache_max_bytes(size * mb)
+
     def on_action_edit_apply_polar_mask_triggered(self):
         # Make the dialog
         canvas = self.ui.image_tab_widget.image_canvases[0]
@@ -797,29 +974,12 @@ class MainWindow(QObject):
         if self.image_mode == ViewType.cartesian:
             self.ui.image_tab_widget.show_cartesian()
         elif self.image_mode == ViewType.polar:
-            # Rebuild polar masks
-            HexrdConfig().polar_masks.clear()
-            for name, line_data in HexrdConfig().polar_masks_line_data.items():
-                if not isinstance(line_data, list):
-                    line_data = [line_data]
-                create_polar_mask(line_data, name)
-            for name, value in HexrdConfig().raw_masks_line_data.items():
-                det, data = value[0]
-                line_data = convert_raw_to_polar(det, data)
-                create_polar_mask(line_data, name)
+            # Rebuild the polar masks that have changed
+            rebuild_polar_masks()
             self.ui.image_tab_widget.show_polar()
         else:
-            # Rebuild raw masks
-            HexrdConfig().raw_masks.clear()
-            for name, line_data in HexrdConfig().raw_masks_line_data.items():
-                create_raw_mask(name, line_data)
-            for name, data in HexrdConfig().polar_masks_line_data.items():
-                if isinstance(data, list):
-                    # These are Laue spots
-                    continue
-                else:
-                    line_data = convert_polar_to_raw(data)
-                    create_raw_mask(name, line_data)
+            # Rebuild the raw masks that have changed
+            rebuild_raw_masks()
             self.ui.image_tab_widget.load_images()
 
         # Only ask if have haven't asked before
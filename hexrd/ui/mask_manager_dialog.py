@@ -8,6 +8,7 @@ from PySide2.QtGui import QCursor
 
 from hexrd.ui import enter_key_filter
 
+from hexrd.ui.create_raw_mask import threshold_mask_arrays
 from hexrd.ui.utils import create_unique_name
 from hexrd.ui.hexrd_config import HexrdConfig
 from hexrd.ui.ui_loader import UiLoader
@@ -191,10 +192,10 @@ class MaskManagerDialog(QObject):
             mtype, data = self.masks[new_name]
             if mtype == 'polar':
                 value = HexrdConfig().polar_masks_line_data.pop(self.old_name)
-                HexrdConfig().polar_masks[new_name] = value
+                HexrdConfig().polar_masks_line_data[new_name] = value
             elif mtype != 'threshold':
                 value = HexrdConfig().raw_masks_line_data.pop(self.old_name)
-                HexrdConfig().raw_masks[new_name] = value
+                HexrdConfig().raw_masks_line_data[new_name] = value
 
             if self.old_name in HexrdConfig().polar_masks.keys():
                 value = HexrdConfig().polar_masks.pop(self.old_name)
@@ -236,5 +237,9 @@ class MaskManagerDialog(QObject):
         d = {}
         for mask in HexrdConfig().visible_masks:
             mtype, data = self.masks[mask]
-            d[mask] = data
+            if mtype == 'threshold':
+                # The threshold mask is stored as imageseries
+                d.update(threshold_mask_arrays())
+            else:
+                d[mask] = data
         self.export_masks(d)
@@ -0,0 +1,116 @@
+from collections.abc import MutableMapping
+
+import numpy as np
+
+
+class MaskRegistry(MutableMapping):
+    """A dict of mask names to boolean masks, stored bit-packed
+
+    The masks are True where the pixels are kept. If detector_masks is
+    True, the values are (detector name, mask) tuples, as with the raw
+    masks. Otherwise, the values are masks, as with the polar masks.
+
+    Each mask is stored with np.packbits(), which takes an eighth of the
+    memory of a bool array, and is unpacked when it is accessed.
+
+    combined() gives the logical and of the visible masks, for applying
+    them to an image in one operation. It is cached, and only computed
+    again when the masks or the visible masks change.
+
+    A mask may be stored with a key for everything that it was created
+    from, using set_with_key(), so that it only needs to be created
+    again when its key changes. A key may be stored without a mask with
+    set_empty(), for a mask that turned out to be empty.
+    """
+
+    def __init__(self, detector_masks=False):
+        self.detector_masks = detector_masks
+        self._masks = {}
+        self._keys = {}
+
+        # Incremented whenever the masks change, to invalidate the cache
+        self.version = 0
+        self._combined = {}
+
+    def __setitem__(self, name, value):
+        det, mask = value if self.detector_masks else (None, value)
+        mask = np.asarray(mask, dtype=bool)
+        self._masks[name] = (det, mask.shape, np.packbits(mask, axis=None))
+        self._keys.pop(name, None)
+        self.version += 1
+
+    def __getitem__(self, name):
+        det, shape, packed = self._masks[name]
+        mask = self._unpack(shape, packed)
+        return (det, mask) if self.detector_masks else mask
+
+    def __delitem__(self, name):
+        del self._masks[name]
+        self._keys.pop(name, None)
+        self.version += 1
+
+    def __iter__(self):
+        return iter(self._masks)
+
+    def __len__(self):
+        return len(self._masks)
+
+    def clear(self):
+        self._masks.clear()
+        self._keys.clear()
+        self.version += 1
+
+    def key(self, name):
+        """Get the key that a mask was stored with, or None"""
+        return self._keys.get(name)
+
+    def set_with_key(self, name, value, key):
+        self[name] = value
+        self._keys[name] = key
+
+    def set_empty(self, name, key):
+        """Store a key for a mask that has no value, such as one that
+        does not cover any pixels"""
+        self.pop(name, None)
+        self._keys[name] = key
+
+    def prune(self, names):
+        """Remove the masks and keys of everything not in names"""
+        for name in list(self._masks):
+            if name not in names:
+                del self[name]
+
+        for name in list(self._keys):
+            if name not in names:
+                del self._keys[name]
+
+    @staticmethod
+    def _unpack(shape, packed):
+        size = int(np.prod(shape))
+        return np.unpackbits(packed, count=size).view(bool).reshape(shape)
+
+    def combined(self, visible, det=None):
+        """Get the logical and of the visible masks
+
+        If detector_masks is True, only the masks of det are used. None
+        is returned if none of the masks are visible. The result is
+        cached, so it should not be modified.
+        """
+        names = frozenset(x for x in visible if x in self._masks and
+                          self._masks[x][0] == det)
+        key = (self.version, names)
+        cached = self._combined.get(det)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        result = None
+        for name in names:
+            _, shape, packed = self._masks[name]
+            mask = self._unpack(shape, packed)
+            if result is None:
+                result = mask
+            else:
+                np.logical_and(result, mask, out=result)
+
+        self._combined[det] = (key, result)
+        return result
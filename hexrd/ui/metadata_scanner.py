@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from PySide2.QtCore import QObject, QTimer, Signal
+
+from hexrd.ui.image_file_manager import ImageFileManager
+
+
+class MetadataScanner(QObject):
+    """Read the metadata of many image files in background threads
+
+    A signal is emitted for each file as soon as its metadata has been
+    read, so that it may be displayed while the other files are still
+    being read. Starting a new scan makes the results of any earlier
+    scan be ignored.
+    """
+
+    # Emitted with the scan id, the index of the file, and either a dict
+    # from ImageFileManager.read_metadata() or the exception raised
+    file_scanned = Signal(int, int, object)
+
+    # Emitted with the scan id once every file has been scanned
+    finished = Signal(int)
+
+    def __init__(self, parent=None):
+        super(MetadataScanner, self).__init__(parent)
+        self.executor = ThreadPoolExecutor()
+        self.lock = threading.Lock()
+        self.scan_id = 0
+        self.remaining = 0
+
+    def scan(self, files):
+        """Start scanning the files, and return the id of the scan"""
+        with self.lock:
+            self.scan_id += 1
+            self.remaining = len(files)
+            scan_id = self.scan_id
+
+        if not files:
+            # Emit after returning, so that the caller knows the scan id
+            QTimer.singleShot(0, lambda: self.finished.emit(scan_id))
+
+        for i, f in enumerate(files):
+            self.executor.submit(self._scan_file, scan_id, i, f)
+
+        return scan_id
+
+    def _scan_file(self, scan_id, i, f):
+        if scan_id != self.scan_id:
+            # A newer scan has started
+            return
+
+        try:
+            result = ImageFileManager().read_metadata(f)
+        except Exception as e:
+            result = e
+
+        with self.lock:
+            if scan_id != self.scan_id:
+                return
+            self.remaining -= 1
+            done = self.remaining == 0
+
+        # These are queued to the receivers in the GUI thread
+        self.file_scanned.emit(scan_id, i, result)
+        if done:
+            self.finished.emit(scan_id)
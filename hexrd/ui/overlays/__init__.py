@@ -8,6 +8,14 @@ from hexrd.ui.overlays.powder_diffraction import PowderLineOverlay
 
 from hexrd.ui import constants
 from hexrd.ui.constants import OverlayType
+from hexrd.ui.utils import (
+    array_key, instrument_geometry_key, LRUCache, plane_data_key
+)
+
+# The overlay data only depends upon the material, the instrument, the
+# view, and the options, so it is kept for when any of those are
+# changed back, such as when switching views or undoing a change.
+overlay_data_cache = LRUCache(max_size=32)
 
 
 def overlay_generator(overlay_type):
@@ -64,6 +72,64 @@ def default_overlay_refinements(overlay_type):
     return copy.deepcopy(default_refinements[overlay_type])
 
 
+def options_key(options):
+    key = []
+    for k, v in sorted(options.items()):
+        try:
+            v = array_key(v)
+        except (TypeError, ValueError):
+            v = repr(v)
+        key.append((k, v))
+    return tuple(key)
+
+
+def overlay_data_key(overlay, plane_data, instr_key, display_mode):
+    from hexrd.ui.hexrd_config import HexrdConfig
+
+    return (
+        overlay['type'],
+        plane_data_key(plane_data),
+        instr_key,
+        array_key(HexrdConfig().polar_res_eta_period),
+        display_mode,
+        options_key(overlay.get('options', {}))
+    )
+
+
+def copy_overlay_data(data):
+    # Copy the dicts and lists, but not the arrays in them, so that the
+    # cached data is not modified when the overlay's data is cleared.
+    return {
+        det: {k: copy.copy(v) for k, v in det_data.items()}
+        for det, det_data in data.items()
+    }
+
+
+def instrument_subset(instr, detectors):
+    # A shallow copy of the instrument with only some of its detectors,
+    # so that the overlay data is only generated for those detectors.
+    subset = copy.copy(instr)
+    subset._detectors = {
+        k: v for k, v in instr.detectors.items() if k in detectors
+    }
+    return subset
+
+
+def generate_overlay_data(overlay, plane_data, instr, display_mode):
+    from hexrd.ui.hexrd_config import HexrdConfig
+
+    kwargs = {
+        'plane_data': plane_data,
+        'instr': instr,
+        'eta_period': HexrdConfig().polar_res_eta_period
+    }
+    # Add any options
+    kwargs.update(overlay.get('options', {}))
+
+    generator = overlay_generator(overlay['type'])(**kwargs)
+    return generator.overlay(display_mode)
+
+
 def update_overlay_data(instr, display_mode):
     from hexrd.ui.hexrd_config import HexrdConfig
 
@@ -71,16 +137,28 @@ def update_overlay_data(instr, display_mode):
         # Nothing to do
         return
 
+    # Only computed if an overlay needs to be updated
+    instr_key = None
     for overlay in HexrdConfig().overlays:
         if not overlay['visible']:
             # Skip over invisible overlays
             continue
 
+        # If only some detectors changed, only their data is updated
+        update_detectors = None
         if not overlay.get('update_needed', True):
-            # If it doesn't need an update, skip it
-            continue
+            update_detectors = overlay.pop('update_detectors', set())
+            update_detectors &= set(instr.detectors)
+            if not update_detectors:
+                # If it doesn't need an update, skip it
+                continue
 
-        overlay['data'].clear()
+            if set(overlay['data']) != set(instr.detectors):
+                # The data is not for this instrument. Update all of it.
+                update_detectors = None
+
+        if update_detectors is None:
+            overlay['data'].clear()
 
         mat_name = overlay['material']
         mat = HexrdConfig().material(mat_name)
@@ -91,15 +169,31 @@ def update_overlay_data(instr, display_mode):
                   f'{mat_name} is not a valid material')
             continue
 
-        type = overlay['type']
-        kwargs = {
-            'plane_data': mat.planeData,
-            'instr': instr,
-            'eta_period': HexrdConfig().polar_res_eta_period
-        }
-        # Add any options
-        kwargs.update(overlay.get('options', {}))
-
-        generator = overlay_generator(type)(**kwargs)
-        overlay['data'] = generator.overlay(display_mode)
+        if instr_key is None:
+            instr_key = instrument_geometry_key(instr)
+
+        key = overlay_data_key(overlay, mat.planeData, instr_key,
+                               display_mode)
+        data = overlay_data_cache.get(key)
+        if data is None:
+            if update_detectors is None:
+                data = generate_overlay_data(overlay, mat.planeData, instr,
+                                             display_mode)
+            else:
+                subset = instrument_subset(instr, update_detectors)
+                data = generate_overlay_data(overlay, mat.planeData, subset,
+                                             display_mode)
+                # The rest of the detectors are unchanged
+                data = {k: data.get(k, v) for k, v in overlay['data'].items()}
+            overlay_data_cache[key] = copy_overlay_data(data)
+
+        if update_detectors is None:
+            overlay['data'] = copy_overlay_data(data)
+        else:
+            # Replace the data of the updated detectors only, so that the
+            # artists of the others may be kept
+            updated = {k: data[k] for k in update_detectors}
+            overlay['data'].update(copy_overlay_data(updated))
+
         overlay['update_needed'] = False
+        overlay.pop('update_detectors', None)
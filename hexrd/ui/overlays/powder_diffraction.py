@@ -83,32 +83,40 @@ class PowderLineOverlay:
             # No overlays
             return {}
 
+        # The rings and their ranges are all generated together
+        all_tths = [tths]
         if self.plane_data.tThWidth is not None:
             # Need to get width data as well
             indices, ranges = self.plane_data.getMergedRanges()
             r_lower = [r[0] for r in ranges]
             r_upper = [r[1] for r in ranges]
+            all_tths += [r_lower, r_upper]
+
+        sizes = [len(x) for x in all_tths]
+        all_tths = np.hstack(all_tths)
+        bounds = np.cumsum([0] + sizes)
 
         point_groups = {}
         for det_key, panel in self.instrument.detectors.items():
             keys = ['rings', 'rbnds', 'rbnd_indices', 'hkls']
             point_groups[det_key] = {key: [] for key in keys}
-            ring_pts, skipped_tth = self.generate_ring_points(
-                tths, etas, panel, display_mode)
+            all_pts = self.ring_points(all_tths, etas, panel, display_mode)
+
+            # Split them back up. Skipped rings are None.
+            ring_pts, *range_pts = [
+                all_pts[start:stop]
+                for start, stop in zip(bounds[:-1], bounds[1:])
+            ]
 
-            det_hkls = [x for i, x in enumerate(hkls) if i not in skipped_tth]
+            det_hkls = [x for x, pts in zip(hkls, ring_pts) if pts is not None]
 
-            point_groups[det_key]['rings'] = ring_pts
+            point_groups[det_key]['rings'] = [
+                x for x in ring_pts if x is not None]
             point_groups[det_key]['hkls'] = det_hkls
 
             if self.plane_data.tThWidth is not None:
-                # Generate the ranges too
-                lower_pts, _ = self.generate_ring_points(
-                    r_lower, etas, panel, display_mode
-                )
-                upper_pts, _ = self.generate_ring_points(
-                    r_upper, etas, panel, display_mode
-                )
+                lower_pts, upper_pts = [
+                    [x for x in pts if x is not None] for pts in range_pts]
                 for lpts, upts in zip(lower_pts, upper_pts):
                     point_groups[det_key]['rbnds'] += [lpts, upts]
                 for ind in indices:
@@ -117,99 +125,195 @@ class PowderLineOverlay:
         return point_groups
 
     def generate_ring_points(self, tths, etas, panel, display_mode):
-        delta_eta_nom = np.degrees(np.median(np.diff(etas)))
-        ring_pts = []
-        skipped_tth = []
-        for i, tth in enumerate(tths):
-            # construct ideal angular coords
-            ang_crds = np.vstack([np.tile(tth, len(etas)), etas]).T
-
-            # !!! must apply offset
-            xys_full = panel.angles_to_cart(ang_crds, tvec_c=self.tvec)
-
-            # skip if ring not on panel
-            if len(xys_full) == 0:
-                skipped_tth.append(i)
-                continue
-
-            # clip to detector panel
-            xys, on_panel = panel.clip_to_panel(
-                xys_full, buffer_edges=False
-            )
+        ring_pts = self.ring_points(tths, etas, panel, display_mode)
+        skipped_tth = [i for i, x in enumerate(ring_pts) if x is None]
+        return [x for x in ring_pts if x is not None], skipped_tth
+
+    def project_rings(self, tths, etas, panel):
+        """Project every (tth, eta) pair onto the panel at once
+
+        Returns the cartesian coordinates of the points, along with the
+        index of the ring and the index of the eta of each point.
+        """
+        num_tths, num_etas = len(tths), len(etas)
+        ang_crds = np.vstack([np.repeat(tths, num_etas),
+                              np.tile(etas, num_tths)]).T
+
+        # !!! must apply offset
+        xys = panel.angles_to_cart(ang_crds, tvec_c=self.tvec)
+        if len(xys) == len(ang_crds):
+            ring_ids = np.repeat(np.arange(num_tths), num_etas)
+            eta_ids = np.tile(np.arange(num_etas), num_tths)
+            return xys, ring_ids, eta_ids
+
+        # Points that do not intersect the detector plane were dropped,
+        # so which ring each point is on is not known. Project the rings
+        # one at a time instead, and skip those that lost points.
+        all_xys = [np.empty((0, 2))]
+        ring_ids = [np.empty(0, dtype=int)]
+        for i in range(num_tths):
+            ring_xys = panel.angles_to_cart(
+                ang_crds[i * num_etas:(i + 1) * num_etas], tvec_c=self.tvec)
+            if len(ring_xys) == num_etas:
+                all_xys.append(ring_xys)
+                ring_ids.append(np.full(num_etas, i))
+
+        ring_ids = np.hstack(ring_ids)
+        eta_ids = np.tile(np.arange(num_etas), len(ring_ids) // num_etas)
+        return np.vstack(all_xys), ring_ids, eta_ids
+
+    def ring_points(self, tths, etas, panel, display_mode):
+        """Generate the points of the rings on a panel
+
+        All of the rings are projected, clipped, and converted together.
+        The points of every ring are written to a single nan-separated
+        array, and each ring's points are a view into it, ending in a
+        row of nans. A ring is None if it is not on the panel.
+        """
+        tths = np.asarray(tths, dtype=float)
+        etas = np.asarray(etas, dtype=float)
+        num_tths = len(tths)
+
+        xys, ring_ids, eta_ids = self.project_rings(tths, etas, panel)
+        # Rings with no points on the plane of the panel are skipped
+        has_points = np.zeros(num_tths, dtype=bool)
+        has_points[ring_ids] = True
+
+        # clip to detector panel
+        xys, on_panel = panel.clip_to_panel(xys, buffer_edges=False)
+        ring_ids = ring_ids[on_panel]
+        eta_ids = eta_ids[on_panel]
+
+        if display_mode == ViewType.polar:
+            pts, ring_ids, breaks = self._polar_ring_points(
+                xys, ring_ids, panel, num_tths)
+            # Rings with no points on the panel are skipped as well
+            has_points[:] = False
+            has_points[ring_ids] = True
+        elif display_mode in [ViewType.raw, ViewType.cartesian]:
+            if display_mode == ViewType.raw:
+                # Convert to pixel coordinates
+                # ??? keep in pixels?
+                xys = panel.cartToPixel(xys)
+
+            # The ring breaks where it leaves the panel and comes back
+            pts = xys
+            diff_tol = np.radians(self.delta_eta) + 1e-4
+            breaks = np.abs(np.diff(etas[eta_ids])) > diff_tol
+        else:
+            return [None] * num_tths
+
+        return self._split_rings(pts, ring_ids, breaks, has_points)
+
+    def _polar_ring_points(self, xys, ring_ids, panel, num_tths):
+        """Convert the points to (eta, tth) coordinates in degrees
+
+        Returns the points sorted by ring and then by eta, the ring of
+        each point, and whether each ring breaks between each point and
+        the next one, at the eta branch cut.
+        """
+        if len(xys) == 0:
+            return np.empty((0, 2)), ring_ids, np.empty(0, dtype=bool)
+
+        # !!! apply offset correction
+        ang_crds, _ = panel.cart_to_angles(xys, self.instrument.tvec)
+
+        # Swap columns, convert to degrees
+        ang_crds = np.degrees(ang_crds[:, [1, 0]])
+
+        # fix eta period
+        ang_crds[:, 0] = xfcapi.mapAngle(
+            ang_crds[:, 0], self.eta_period, units='degrees'
+        )
+
+        # sort points for monotonic eta within each ring
+        order = np.lexsort((ang_crds[:, 0], ring_ids))
+        ang_crds = ang_crds[order]
+        ring_ids = ring_ids[order]
+        etas = ang_crds[:, 0]
+
+        # The steps in eta within each ring
+        same_ring = ring_ids[1:] == ring_ids[:-1]
+        step_pos = np.nonzero(same_ring)[0]
+        step_rings = ring_ids[step_pos]
+        steps = np.diff(etas)[step_pos]
+
+        # The median step of each ring
+        order = np.lexsort((steps, step_rings))
+        sorted_steps = steps[order]
+        rings, starts, counts = np.unique(step_rings[order],
+                                          return_index=True,
+                                          return_counts=True)
+        delta_eta_est = np.full(num_tths, np.nan)
+        delta_eta_est[rings] = (sorted_steps[starts + (counts - 1) // 2] +
+                                sorted_steps[starts + counts // 2]) / 2
+
+        # branch cut
+        firsts = np.ones(len(etas), dtype=bool)
+        firsts[1:] = ~same_ring
+        lasts = np.ones(len(etas), dtype=bool)
+        lasts[:-1] = ~same_ring
+        first_rings = ring_ids[firsts]
+        cut_on_panel = np.zeros(num_tths, dtype=bool)
+        cut_on_panel[first_rings] = (
+            xfcapi.angularDifference(
+                etas[firsts], etas[lasts], units='degrees'
+            ) < 2 * delta_eta_est[first_rings]
+        )
+        cut_on_panel &= np.bincount(ring_ids, minlength=num_tths) > 2
+
+        # Split each cut ring at its largest deviation from the median
+        # step. Ties go to the first step, as with np.argmax().
+        deviations = np.abs(steps - delta_eta_est[step_rings])
+        order = np.lexsort((-step_pos, deviations, step_rings))
+        group_lasts = np.ones(len(order), dtype=bool)
+        group_lasts[:-1] = step_rings[order][1:] != step_rings[order][:-1]
+        split_pos = step_pos[order][group_lasts]
+        split_pos = split_pos[cut_on_panel[ring_ids[split_pos]]]
+
+        breaks = np.zeros(len(etas) - 1, dtype=bool)
+        breaks[split_pos] = True
+
+        return ang_crds, ring_ids, breaks
+
+    @staticmethod
+    def _split_rings(pts, ring_ids, breaks, has_points):
+        """Write the points to one array, with nans between the rings
+
+        pts must be sorted by ring. breaks is a bool array of whether
+        there is a break between each point and the next one, within a
+        ring. A row of nans is written at each break, and after each
+        ring. Rings without points that are not skipped get a single
+        row of nans.
+        """
+        num_pts = len(pts)
+        ring_ends = np.ones(num_pts, dtype=bool)
+        ring_ends[:-1] = ring_ids[1:] != ring_ids[:-1]
+
+        nan_after = ring_ends.copy()
+        nan_after[:-1] |= breaks
+
+        # Each point is moved down by the number of nan rows before it
+        num_nans = np.cumsum(nan_after)
+        dst = np.arange(num_pts)
+        dst[1:] += num_nans[:-1]
+
+        result = np.full((num_pts + (num_nans[-1] if num_pts else 0), 2),
+                         np.nan)
+        result[dst] = pts
+
+        starts = np.full(len(has_points), -1)
+        stops = np.full(len(has_points), -1)
+        starts[ring_ids[::-1]] = dst[::-1]
+        stops[ring_ids[ring_ends]] = dst[ring_ends] + 2
 
-            if display_mode == ViewType.polar:
-                # !!! apply offset correction
-                ang_crds, _ = panel.cart_to_angles(xys, self.instrument.tvec)
-
-                if len(ang_crds) == 0:
-                    skipped_tth.append(i)
-                    continue
-
-                # Swap columns, convert to degrees
-                ang_crds[:, [0, 1]] = np.degrees(ang_crds[:, [1, 0]])
-
-                # fix eta period
-                ang_crds[:, 0] = xfcapi.mapAngle(
-                    ang_crds[:, 0], self.eta_period, units='degrees'
-                )
-
-                # sort points for monotonic eta
-                eidx = np.argsort(ang_crds[:, 0])
-                ang_crds = ang_crds[eidx, :]
-
-                # branch cut
-                delta_eta_est = np.median(np.diff(ang_crds[:, 0]))
-                cut_on_panel = bool(
-                    xfcapi.angularDifference(
-                        np.min(ang_crds[:, 0]),
-                        np.max(ang_crds[:, 0]),
-                        units='degrees'
-                    ) < 2*delta_eta_est
-                )
-                if cut_on_panel and len(ang_crds) > 2:
-                    split_idx = np.argmax(
-                        np.abs(np.diff(ang_crds[:, 0]) - delta_eta_est)
-                    ) + 1
-
-                    ang_crds = np.vstack(
-                        [ang_crds[:split_idx, :],
-                         nans_row,
-                         ang_crds[split_idx:, :]]
-                    )
-
-                # append to list with nan padding
-                ring_pts.append(np.vstack([ang_crds, nans_row]))
-
-            elif display_mode in [ViewType.raw, ViewType.cartesian]:
-
-                if display_mode == ViewType.raw:
-                    # !!! distortion
-                    if panel.distortion is not None:
-                        xys_full = panel.distortion.apply_inverse(xys_full)
-
-                    # Convert to pixel coordinates
-                    # ??? keep in pixels?
-                    xys = panel.cartToPixel(xys)
-
-                diff_tol = np.radians(self.delta_eta) + 1e-4
-                ring_breaks = np.where(
-                    np.abs(np.diff(etas[on_panel])) > diff_tol
-                )[0] + 1
-                n_segments = len(ring_breaks) + 1
-
-                if n_segments == 1:
-                    ring_pts.append(np.vstack([xys, nans_row]))
-                else:
-                    src_len = sum(on_panel)
-                    dst_len = src_len + len(ring_breaks)
-                    nxys = np.nan*np.ones((dst_len, 2))
-                    ii = 0
-                    for i in range(n_segments - 1):
-                        jj = ring_breaks[i]
-                        nxys[ii + i:jj + i, :] = xys[ii:jj, :]
-                        ii = jj
-                    i = n_segments - 1
-                    nxys[ii + i:, :] = xys[ii:, :]
-                    ring_pts.append(np.vstack([nxys, nans_row]))
-
-        return ring_pts, skipped_tth
+        ring_pts = []
+        for start, stop, present in zip(starts, stops, has_points):
+            if not present:
+                ring_pts.append(None)
+            elif start < 0:
+                ring_pts.append(nans_row.copy())
+            else:
+                ring_pts.append(result[start:stop])
+
+        return ring_pts
@@ -0,0 +1,237 @@
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import multiprocessing
+from multiprocessing import resource_tracker, shared_memory
+import threading
+
+import numpy as np
+
+from hexrd.ui.constants import WarpMode
+
+# Arrays returned by the worker processes that are at least this large
+# are sent back through shared memory rather than being pickled.
+min_shared_nbytes = 2**16
+
+_register_lock = threading.Lock()
+
+
+def _open_shared_memory(name, track):
+    """Open existing shared memory
+
+    If track is False, the memory is not registered with the resource
+    tracker, which would otherwise warn about it or unlink it when this
+    process exits, although another process owns it.
+    """
+    if track:
+        return shared_memory.SharedMemory(name=name)
+
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13, opening it always registers it
+        pass
+
+    def register(name, rtype):
+        if rtype != 'shared_memory':
+            original(name, rtype)
+
+    with _register_lock:
+        original = resource_tracker.register
+        resource_tracker.register = register
+        try:
+            return shared_memory.SharedMemory(name=name)
+        finally:
+            resource_tracker.register = original
+
+
+class SharedArray:
+    """A numpy array that lives in shared memory
+
+    Only the info (the name, shape, and dtype) needs to be sent to
+    another process for it to access the array, so the data itself
+    never gets pickled.
+
+    The owner of the array unlinks its memory when it is closed. The
+    owner may also release the array, for another process to take it.
+    """
+
+    def __init__(self, shape, dtype, name=None, track=True):
+        dtype = np.dtype(dtype)
+        self.owner = name is None
+        if self.owner:
+            size = max(int(np.prod(shape)) * dtype.itemsize, 1)
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+        else:
+            self.shm = _open_shared_memory(name, track)
+
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+
+    @classmethod
+    def copy_of(cls, a):
+        a = np.asarray(a)
+        ret = cls(a.shape, a.dtype)
+        ret.array[...] = a
+        return ret
+
+    @classmethod
+    def attach(cls, info):
+        name, shape, dtype = info
+        return cls(shape, dtype, name=name, track=False)
+
+    @classmethod
+    def take(cls, info):
+        """Attach to an array that was released, and become its owner"""
+        name, shape, dtype = info
+        ret = cls(shape, dtype, name=name)
+        ret.owner = True
+        return ret
+
+    @property
+    def info(self):
+        return (self.shm.name, self.array.shape, self.array.dtype.str)
+
+    def close(self):
+        # The array must be released before the memory can be closed
+        del self.array
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+    def release(self):
+        # Close the array, but leave its memory for another process
+        self.owner = False
+        self.close()
+
+
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def process_pool():
+    """Get the pool of worker processes, starting it if needed
+
+    The pool is kept for the life of the program, so the processes are
+    only started once. They are started with 'spawn' rather than by
+    forking, since forking a multithreaded Qt process is not safe.
+    """
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            context = multiprocessing.get_context('spawn')
+            _process_pool = ProcessPoolExecutor(mp_context=context)
+        return _process_pool
+
+
+def shutdown_process_pool():
+    """Stop the worker processes, if they were started"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False)
+            _process_pool = None
+
+
+def _share_arrays(result):
+    """Move the large array attributes of a result into shared memory
+
+    The result and the info of the arrays are returned. The process that
+    receives them must call _take_arrays() to restore the arrays.
+    """
+    info = {}
+    for key, value in getattr(result, '__dict__', {}).items():
+        if isinstance(value, np.ndarray) and value.nbytes >= min_shared_nbytes:
+            shared = SharedArray.copy_of(value)
+            info[key] = shared.info
+            shared.release()
+
+    for key in info:
+        setattr(result, key, None)
+
+    return result, info
+
+
+def _take_arrays(result, info):
+    for key, array_info in info.items():
+        shared = SharedArray.take(array_info)
+        try:
+            setattr(result, key, shared.array.copy())
+        finally:
+            shared.close()
+
+    return result
+
+
+def _run_shared_task(func, frame_info, out_info, index, args):
+    frame = SharedArray.attach(frame_info)
+    out = SharedArray.attach(out_info)
+    try:
+        result = func(frame.array, out.array, index, *args)
+    finally:
+        frame.close()
+        out.close()
+
+    return _share_arrays(result)
+
+
+def _warp_in_processes(func, tasks, out):
+    shared_frames = [SharedArray.copy_of(frame) for _, frame, _ in tasks]
+    shared_out = SharedArray((len(tasks),) + out.shape[1:], out.dtype)
+    try:
+        executor = process_pool()
+        futures = []
+        for i, (frame, (_, _, args)) in enumerate(zip(shared_frames, tasks)):
+            futures.append(executor.submit(
+                _run_shared_task, func, frame.info, shared_out.info, i,
+                args))
+
+        # Every result is taken, even after an error, so that none of
+        # their shared memory is left behind.
+        results = []
+        error = None
+        for future in futures:
+            try:
+                results.append(_take_arrays(*future.result()))
+            except Exception as e:
+                error = error or e
+
+        if isinstance(error, BrokenProcessPool):
+            # A worker died. Start a new pool for the next time.
+            shutdown_process_pool()
+
+        if error is not None:
+            raise error
+
+        for i, (index, _, _) in enumerate(tasks):
+            out[index] = shared_out.array[i]
+    finally:
+        for frame in shared_frames:
+            frame.close()
+        shared_out.close()
+
+    return results
+
+
+def warp_in_parallel(func, tasks, out, mode=WarpMode.serial):
+    """Run a warp function for a list of tasks
+
+    Each task is a tuple of (index, frame, args), and for each one,
+    func(frame, out, index, *args) is called. The function must write
+    its warped image into out[index] in place. The return values of the
+    calls are returned in a list, in the same order as the tasks.
+
+    In processes mode, func must be picklable. The frames and output
+    buffer are passed through shared memory rather than being pickled,
+    and so are the large array attributes of the return values.
+    """
+    if not tasks:
+        return []
+
+    if mode == WarpMode.threads:
+        with ThreadPoolExecutor() as executor:
+            futures = [executor.submit(func, frame, out, index, *args)
+                       for index, frame, args in tasks]
+            return [f.result() for f in futures]
+    elif mode == WarpMode.processes:
+        return _warp_in_processes(func, tasks, out)
+
+    return [func(frame, out, index, *args) for index, frame, args in tasks]
@@ -4,15 +4,18 @@ from PySide2.QtWidgets import QProgressDialog
 
 class ProgressDialog(QProgressDialog):
 
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, cancellable=False):
         super(ProgressDialog, self).__init__(parent)
 
         # Some default window title and text
         self.setWindowTitle('Hexrd')
         self.setLabelText('Please wait...')
 
-        # No cancel button
-        self.setCancelButton(None)
+        # No cancel button, unless the caller can stop the work. The
+        # caller should connect to the canceled signal.
+        if not cancellable:
+            self.setCancelButton(None)
+        self.cancellable = cancellable
 
         # No close button in the corner
         self.setWindowFlags((self.windowFlags() | Qt.CustomizeWindowHint) &
@@ -23,6 +26,9 @@ class ProgressDialog(QProgressDialog):
         self.reset()
 
     def keyPressEvent(self, e):
-        # Do not let the user close the dialog by pressing escape
+        # Do not let the user close the dialog by pressing escape. If it
+        # may be cancelled, escape cancels it instead.
         if e.key() != Qt.Key_Escape:
             super(ProgressDialog, self).keyPressEvent(e)
+        elif self.cancellable:
+            self.cancel()
@@ -1,8 +1,11 @@
 # Some general utilities that are used in multiple places
 
+from collections import OrderedDict
 from enum import IntEnum
 from functools import reduce
 import math
+import threading
+
 import numpy as np
 
 from PySide2.QtCore import QObject
@@ -101,7 +104,7 @@ def make_new_pdata(mat):
     mat.planeData.tThMax = prev_tThMax
 
 
-def coords2index(im, x, y):
+def coords2index(im, x, y, shape=None, extent=None):
     """
     This function is modified from here:
     https://github.com/joferkington/mpldatacursor/blob/7dabc589ed02c35ac5d89de5931f91e0323aa795/mpldatacursor/pick_info.py#L28
@@ -116,16 +119,25 @@ def coords2index(im, x, y):
         The x-coordinate in data coordinates.
     y : number
         The y-coordinate in data coordinates.
+    shape : tuple, optional
+        The shape of the array. Defaults to the shape of the image's array.
+    extent : tuple, optional
+        The extent of the array. Defaults to the extent of the image.
 
     Returns
     --------
     i, j : Index coordinates of the array associated with the image.
     """
-    xmin, xmax, ymin, ymax = im.get_extent()
+    if shape is None:
+        shape = im.get_array().shape
+    if extent is None:
+        extent = im.get_extent()
+
+    xmin, xmax, ymin, ymax = extent
     if im.origin == 'upper':
         ymin, ymax = ymax, ymin
     data_extent = mtransforms.Bbox([[ymin, xmin], [ymax, xmax]])
-    array_extent = mtransforms.Bbox([[0, 0], im.get_array().shape[:2]])
+    array_extent = mtransforms.Bbox([[0, 0], shape[:2]])
     trans = (mtransforms.BboxTransformFrom(data_extent) +
              mtransforms.BboxTransformTo(array_extent))
 
@@ -144,8 +156,13 @@ def snip_width_pixels():
     return math.ceil(snip_width_deg / pixel_size_tth)
 
 
-def run_snip1d(img):
+def run_snip1d(img, threshold=None):
+    """Get the SNIP background of an image
 
+    The threshold is only used by SNIP_1D, which takes the minimum of the
+    image if it is None. Pass the minimum of the whole image when running
+    the SNIP on part of it.
+    """
     from hexrd.ui.hexrd_config import HexrdConfig
 
     snip_width = snip_width_pixels()
@@ -155,7 +172,8 @@ def run_snip1d(img):
     if algorithm == SnipAlgorithmType.Fast_SNIP_1D:
         return imageutil.fast_snip1d(img, snip_width, numiter)
     elif algorithm == SnipAlgorithmType.SNIP_1D:
-        return imageutil.snip1d(img, snip_width, numiter)
+        return imageutil.snip1d(img, snip_width, numiter,
+                                threshold=threshold)
     elif algorithm == SnipAlgorithmType.SNIP_2D:
         return imageutil.snip2d(img, snip_width, numiter)
 
@@ -163,6 +181,42 @@ def run_snip1d(img):
     raise RuntimeError(f'Unrecognized polar_snip1d_algorithm {algorithm}')
 
 
+def snip_padding():
+    """The padding needed to run the SNIP on part of an image
+
+    This returns a (rows, columns) tuple of the number of neighboring
+    pixels that may affect the background of any given pixel. If None
+    is returned for an axis, the whole axis is needed.
+    """
+    from hexrd.ui.hexrd_config import HexrdConfig
+
+    snip_width = snip_width_pixels()
+    numiter = HexrdConfig().polar_snip1d_numiter
+    algorithm = HexrdConfig().polar_snip1d_algorithm
+
+    if algorithm == SnipAlgorithmType.SNIP_2D:
+        # Be conservative, and assume every window size is chained
+        padding = numiter * snip_width * (snip_width + 1) // 2
+        return (padding, padding)
+
+    # The 1D algorithms run on each row independently
+    return (0, None)
+
+
+def expand_region(region, padding, shape):
+    """Pad a tuple of slices, while keeping it inside of the shape
+
+    A padding of None for an axis uses the whole axis.
+    """
+    ret = []
+    for s, pad, size in zip(region, padding, shape):
+        if pad is None:
+            ret.append(slice(0, size))
+        else:
+            ret.append(slice(max(s.start - pad, 0), min(s.stop + pad, size)))
+    return tuple(ret)
+
+
 def remove_none_distortions(iconfig):
     # This modifies the iconfig in place to remove distortion
     # parameters that are set to None
@@ -233,3 +287,126 @@ def compose(*functions):
     # Combine a series of functions together.
     # Note that the functions are called from right to left.
     return reduce(lambda f, g: lambda x: f(g(x)), functions, lambda x: x)
+
+
+class LRUCache:
+    """A thread-safe least-recently-used cache
+
+    Once more than max_size items have been stored, the items that
+    were least recently used are evicted. If max_bytes is set, items are
+    also evicted while the total size of the items, as given by sizeof,
+    exceeds it. The most recently used item is always kept.
+    """
+
+    def __init__(self, max_size=16, max_bytes=None, sizeof=None):
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof if sizeof is not None else lambda x: 0
+        self.nbytes = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            if key in self._data:
+                self.nbytes -= self.sizeof(self._data[key])
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self.nbytes += self.sizeof(value)
+            self._evict()
+
+    def _evict(self):
+        while len(self._data) > 1 and (
+                len(self._data) > self.max_size or
+                (self.max_bytes is not None and
+                 self.nbytes > self.max_bytes)):
+            _, value = self._data.popitem(last=False)
+            self.nbytes -= self.sizeof(value)
+
+    def set_max_bytes(self, max_bytes):
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+
+
+def array_key(a):
+    # Convert an array-like into a hashable tuple of floats
+    if a is None:
+        return None
+    return tuple(np.asarray(a, dtype=float).flatten().tolist())
+
+
+def panel_geometry_key(panel):
+    """Create a hashable key from the geometry of a detector panel
+
+    This can be used to cache anything that depends only upon where the
+    panel is and how it maps pixels to angles.
+    """
+    distortion = panel.distortion
+    if distortion is not None:
+        distortion = (type(distortion).__name__, array_key(distortion.params))
+
+    return (
+        panel.rows,
+        panel.cols,
+        panel.pixel_size_row,
+        panel.pixel_size_col,
+        array_key(panel.tvec),
+        array_key(panel.tilt),
+        array_key(panel.bvec),
+        array_key(panel.evec),
+        distortion
+    )
+
+
+def instrument_geometry_key(instr):
+    """Create a hashable key from the geometry of an instrument
+
+    This includes the geometry of every detector panel, along with the
+    beam and the sample.
+    """
+    return (
+        tuple((k, panel_geometry_key(v)) for k, v in instr.detectors.items()),
+        array_key(instr.beam_vector),
+        array_key(instr.eta_vector),
+        instr.beam_energy,
+        instr.chi,
+        array_key(instr.tvec)
+    )
+
+
+def plane_data_key(plane_data):
+    """Create a hashable key from a plane data
+
+    This covers the lattice, the hkls and which of them are used, and
+    the wavelength.
+    """
+    return (
+        array_key(plane_data.lparms),
+        array_key(plane_data.getHKLs(allHKLs=True)),
+        array_key(plane_data.exclusions),
+        plane_data.wavelength,
+        plane_data.tThMax,
+        plane_data.tThWidth
+    )
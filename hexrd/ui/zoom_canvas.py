@@ -8,6 +8,8 @@ from matplotlib.widgets import Cursor
 
 import numpy as np
 
+from hexrd.ui.blit_manager import BlitManager
+
 
 class ZoomCanvas(FigureCanvas):
 
@@ -19,6 +21,10 @@ class ZoomCanvas(FigureCanvas):
 
         self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
 
+        # The crosshairs and the lines on the integral axes are redrawn
+        # over a cached background of the plots
+        self.blit_manager = BlitManager(self)
+
         self.main_canvas = main_canvas
         self.pv = main_canvas.iviewer.pv
 
@@ -31,6 +37,7 @@ class ZoomCanvas(FigureCanvas):
         # Set up the box overlay lines
         ax = self.main_canvas.axis
         self.box_overlay_line = ax.plot([], [], 'm-')[0]
+        self.main_canvas.blit_manager.add_artist(self.box_overlay_line)
         self.crosshairs = None
         self.vhlines = None
 
@@ -70,6 +77,7 @@ class ZoomCanvas(FigureCanvas):
 
     def remove_overlay_lines(self):
         if self.box_overlay_line is not None:
+            self.main_canvas.blit_manager.remove_artist(self.box_overlay_line)
             self.box_overlay_line.remove()
             self.box_overlay_line = None
 
@@ -79,6 +87,7 @@ class ZoomCanvas(FigureCanvas):
 
     def remove_crosshairs(self):
         if self.crosshairs is not None:
+            self.blit_manager.remove_artist(self.crosshairs)
             self.crosshairs.remove()
             self.crosshairs = None
 
@@ -93,7 +102,7 @@ class ZoomCanvas(FigureCanvas):
         # Clear the crosshairs when the mouse is moving over the canvas
         self.clear_crosshairs()
         self.update_vhlines(event)
-        self.draw()
+        self.blit_manager.update()
 
     def update_vhlines(self, event):
         # These are vertical and horizontal lines on the integral axes
@@ -206,6 +215,7 @@ class ZoomCanvas(FigureCanvas):
             a1.set_ylabel(r"$\eta$ [deg]")
             a3.set_xlabel(r"intensity")
             self.crosshairs = a1.plot([], [], 'r-')[0]
+            self.blit_manager.add_artist(self.crosshairs)
             self.axes = [a1, a2, a3]
             self.axes_images = [im1, im2, im3]
             self.grid = grid
@@ -214,6 +224,8 @@ class ZoomCanvas(FigureCanvas):
             vline, = a2.plot([], [], color='red', linewidth=1)
             hline, = a3.plot([], [], color='red', linewidth=1)
             self.vhlines = [vline, hline]
+            self.blit_manager.add_artist(vline)
+            self.blit_manager.add_artist(hline)
         else:
             # Make sure we update the color map and norm each time
             self.axes_images[0].set_cmap(self.main_canvas.cmap)
@@ -236,5 +248,7 @@ class ZoomCanvas(FigureCanvas):
         ys = np.append(roi_deg[:, 1], roi_deg[0, 1])
         self.box_overlay_line.set_data(xs, ys)
 
-        self.main_canvas.draw()
-        self.draw()
+        # Only the box moved on the main canvas. The zoomed plots changed,
+        # so this canvas is fully drawn.
+        self.main_canvas.blit_manager.update()
+        self.blit_manager.update()
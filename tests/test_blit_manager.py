@@ -0,0 +1,63 @@
+import io
+
+import numpy as np
+import pytest
+
+pytest.importorskip('PySide2')
+pytest.importorskip('matplotlib')
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg  # noqa: E402
+from matplotlib.figure import Figure  # noqa: E402
+
+from hexrd.ui.blit_manager import BlitManager  # noqa: E402
+
+
+def save_to_array(figure):
+    buf = io.BytesIO()
+    figure.savefig(buf, format='rgba')
+    width, height = figure.canvas.get_width_height()
+    return np.frombuffer(buf.getvalue(), np.uint8).reshape(height, width, 4)
+
+
+@pytest.fixture
+def canvas():
+    figure = Figure(figsize=(3, 3), dpi=50)
+    canvas = FigureCanvasAgg(figure)
+    axis = figure.add_subplot(111)
+    axis.imshow(np.zeros((10, 10)), cmap='gray', vmin=0, vmax=1)
+    return canvas
+
+
+def test_saved_figure_contains_artists(canvas):
+    figure = canvas.figure
+    blank = save_to_array(figure)
+
+    blit_manager = BlitManager(canvas)
+    line, = figure.axes[0].plot([0, 9], [0, 9], 'r-', linewidth=5)
+    blit_manager.add_artist(line)
+    blit_manager.update()
+    assert line.get_animated()
+
+    saved = save_to_array(figure)
+    assert not np.array_equal(saved, blank)
+
+    # The line is the only difference, and it is red
+    changed = np.any(saved != blank, axis=2)
+    assert np.all(saved[changed, 0] >= saved[changed, 1])
+
+    # The line is still drawn by blitting afterward
+    assert line.get_animated()
+
+
+def test_saved_figure_matches_non_animated(canvas):
+    figure = canvas.figure
+    line, = figure.axes[0].plot([0, 9], [9, 0], 'b-', linewidth=3)
+    text = figure.text(0.1, 0.9, 'Saturation', color='r', fontsize=20)
+    expected = save_to_array(figure)
+
+    blit_manager = BlitManager(canvas)
+    blit_manager.add_artist(line)
+    blit_manager.add_artist(text)
+    blit_manager.update()
+    np.testing.assert_array_equal(save_to_array(figure), expected)
+    assert line.get_animated() and text.get_animated()
@@ -0,0 +1,89 @@
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip('PySide2')
+pytest.importorskip('h5py')
+imageseries = pytest.importorskip('hexrd.imageseries')
+
+from hexrd.ui.imageseries_exporter import (  # noqa: E402
+    FrameCacheExporter, frame_cache_file_name, write_frame_caches
+)
+
+
+def make_imageseries(seed, num_frames=23, shape=(31, 17)):
+    rng = np.random.default_rng(seed)
+    data = rng.integers(0, 100, (num_frames,) + shape).astype(np.float64)
+    omega = np.linspace(0, num_frames * 0.25, num_frames + 1)
+    meta = {'omega': np.vstack([omega[:-1], omega[1:]]).T}
+    return imageseries.open(None, 'array', data=data, meta=meta)
+
+
+def write_reference(ims, fname, threshold):
+    # The previous implementation, which used the frame-cache writer.
+    # Any yml file that it writes is kept apart from the cache file.
+    root, _ = os.path.splitext(fname)
+    imageseries.write(ims, f'{root}.yml', 'frame-cache', threshold=threshold,
+                      cache_file=os.path.basename(fname))
+
+
+def assert_imageseries_equal(ims, ims2):
+    assert len(ims) == len(ims2)
+    for i in range(len(ims)):
+        np.testing.assert_array_equal(ims[i], ims2[i])
+
+    np.testing.assert_array_equal(ims.metadata['omega'],
+                                  ims2.metadata['omega'])
+
+
+@pytest.mark.parametrize('threshold', [0, 50, 99, 1000])
+def test_frame_cache_round_trip(tmp_path, threshold):
+    ims = make_imageseries(0)
+    fname = str(tmp_path / 'exported.npz')
+    ref_fname = str(tmp_path / 'reference.npz')
+
+    stats = FrameCacheExporter(ims, fname, threshold).write()
+    write_reference(ims, ref_fname, threshold)
+
+    exported = imageseries.open(fname, 'frame-cache')
+    reference = imageseries.open(ref_fname, 'frame-cache')
+    assert_imageseries_equal(exported, reference)
+
+    for i in range(len(ims)):
+        frame = ims[i]
+        expected = np.where(frame > threshold, frame, 0)
+        np.testing.assert_array_equal(exported[i], expected)
+
+    kept = sum(np.count_nonzero(ims[i] > threshold) for i in range(len(ims)))
+    assert stats['frames'] == len(ims)
+    assert stats['fraction'] == kept / (len(ims) * ims[0].size)
+
+
+def test_write_frame_caches(tmp_path):
+    ims_dict = {'det_a': make_imageseries(1), 'det_b': make_imageseries(2)}
+    fname = str(tmp_path / 'exported.npz')
+    progress = []
+
+    fnames = write_frame_caches(ims_dict, fname, 50, progress.append)
+    assert fnames == [frame_cache_file_name(fname, x) for x in ims_dict]
+    assert progress[-1] == 100
+
+    for (name, ims), exported in zip(ims_dict.items(), fnames):
+        ref_fname = str(tmp_path / f'reference_{name}.npz')
+        write_reference(ims, ref_fname, 50)
+        assert_imageseries_equal(imageseries.open(exported, 'frame-cache'),
+                                 imageseries.open(ref_fname, 'frame-cache'))
+
+
+def test_estimate_with_every_frame_sampled():
+    ims = make_imageseries(3, num_frames=FrameCacheExporter.num_samples)
+    exporter = FrameCacheExporter(ims, None, 50)
+    estimate = exporter.estimate()
+
+    kept = sum(np.count_nonzero(ims[i] > 50) for i in range(len(ims)))
+    assert estimate['fraction'] == kept / (len(ims) * ims[0].size)
+
+    # The samples are reused for a new threshold
+    exporter.threshold = 1000
+    assert exporter.estimate()['fraction'] == 0
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('PySide2')
+
+from hexrd.ui.mask_registry import MaskRegistry  # noqa: E402
+
+
+def reference_apply(img, masks, visible, det):
+    # The previous implementation, which applied the masks one at a time
+    img = img.copy()
+    for name, (mask_det, mask) in masks.items():
+        if name in visible and mask_det == det:
+            img[~mask] = 0
+    return img
+
+
+def apply(img, registry, visible, det=None):
+    img = img.copy()
+    mask = registry.combined(visible, det)
+    if mask is not None:
+        img[~mask] = 0
+    return img
+
+
+@pytest.fixture
+def masks():
+    rng = np.random.default_rng(0)
+    shape = (37, 53)
+    return {
+        f'mask_{i}': (det, rng.random(shape) > 0.2)
+        for i, det in enumerate(['a', 'b', 'a', 'a', 'b'])
+    }
+
+
+def test_combined_matches_reference(masks):
+    registry = MaskRegistry(detector_masks=True)
+    for name, value in masks.items():
+        registry[name] = value
+
+    img = np.random.default_rng(1).random((37, 53))
+    for visible in ([], ['mask_0'], ['mask_0', 'mask_2', 'mask_4'],
+                    list(masks), ['missing', 'mask_3']):
+        for det in ('a', 'b', 'c'):
+            np.testing.assert_array_equal(
+                apply(img, registry, visible, det),
+                reference_apply(img, masks, visible, det))
+
+
+def test_masks_round_trip(masks):
+    registry = MaskRegistry(detector_masks=True)
+    for name, value in masks.items():
+        registry[name] = value
+
+    assert list(registry) == list(masks)
+    for name, (det, mask) in masks.items():
+        det2, mask2 = registry[name]
+        assert det2 == det
+        assert mask2.dtype == bool
+        np.testing.assert_array_equal(mask2, mask)
+
+
+def test_combined_is_updated(masks):
+    registry = MaskRegistry()
+    for name, (_, mask) in masks.items():
+        registry[name] = mask
+
+    visible = ['mask_0', 'mask_1']
+    first = registry.combined(visible)
+    assert registry.combined(visible) is first
+
+    # Changing, removing, or hiding a mask gives a new result
+    registry['mask_1'] = np.ones((37, 53), dtype=bool)
+    np.testing.assert_array_equal(registry.combined(visible),
+                                  masks['mask_0'][1])
+
+    del registry['mask_0']
+    np.testing.assert_array_equal(registry.combined(visible),
+                                  np.ones((37, 53), dtype=bool))
+
+    assert registry.combined([]) is None
+
+
+def test_keys():
+    registry = MaskRegistry(detector_masks=True)
+    mask = np.zeros((4, 5), dtype=bool)
+    registry.set_with_key('full', ('a', mask), 'key_1')
+    registry.set_empty('empty', 'key_2')
+
+    assert registry.key('full') == 'key_1'
+    assert registry.key('empty') == 'key_2'
+    assert 'empty' not in registry
+
+    # Setting a mask without a key drops its key
+    registry['full'] = ('a', mask)
+    assert registry.key('full') is None
+
+    registry.prune({'full'})
+    assert list(registry) == ['full']
+    assert registry.key('empty') is None
@@ -0,0 +1,96 @@
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+pytest.importorskip('PySide2')
+pytest.importorskip('skimage')
+instrument = pytest.importorskip('hexrd.instrument')
+pytest.importorskip('hexrd.imageutil')
+
+from hexrd.ui import hexrd_config  # noqa: E402
+from hexrd.ui.calibration import polarview  # noqa: E402
+from hexrd.ui.calibration.polarview import (  # noqa: E402
+    PolarView, PolarWarpLookup
+)
+from hexrd.ui.mask_registry import MaskRegistry  # noqa: E402
+from hexrd.ui.utils import SnipAlgorithmType  # noqa: E402
+
+
+@pytest.fixture
+def panel():
+    return instrument.PlanarDetector(
+        rows=64, cols=48, pixel_size=(0.5, 0.4),
+        tvec=np.r_[3., -2., -500.], tilt=np.r_[0.02, -0.01, 0.03])
+
+
+def make_points(panel, num_points, seed=0):
+    # Points on and around the panel, along with some nans
+    rng = np.random.default_rng(seed)
+    half_width = 0.6 * panel.col_dim
+    half_height = 0.6 * panel.row_dim
+    xypts = np.vstack([rng.uniform(-half_width, half_width, num_points),
+                       rng.uniform(-half_height, half_height, num_points)]).T
+    xypts[::7] = np.nan
+    return xypts
+
+
+@pytest.mark.parametrize('shape', [(30, 40), (1, 57)])
+def test_warp_matches_interpolate_bilinear(panel, shape):
+    xypts = make_points(panel, shape[0] * shape[1])
+    lookup = PolarWarpLookup(panel, xypts, shape)
+
+    rng = np.random.default_rng(1)
+    for _ in range(3):
+        # The same lookup is used for every image
+        img = rng.random((panel.rows, panel.cols))
+        # The previous implementation
+        expected = panel.interpolate_bilinear(
+            xypts, img, pad_with_nans=False).reshape(shape)
+        np.testing.assert_allclose(lookup.warp(img), expected)
+
+
+@pytest.fixture
+def polar_config(monkeypatch):
+    # A polar grid of 40 x 60 pixels, with the SNIP applied
+    config = SimpleNamespace(
+        polar_res_tth_min=0., polar_res_tth_max=60., polar_pixel_size_tth=1.,
+        polar_res_eta_min=-180., polar_res_eta_max=180.,
+        polar_pixel_size_eta=9., polar_apply_snip1d=True,
+        polar_snip1d_width=3., polar_snip1d_numiter=2,
+        polar_snip1d_algorithm=SnipAlgorithmType.SNIP_1D,
+        polar_masks=MaskRegistry(), visible_masks=[])
+    monkeypatch.setattr(hexrd_config, 'HexrdConfig', lambda: config)
+    monkeypatch.setattr(polarview, 'HexrdConfig', lambda: config)
+    return config
+
+
+def make_polar_view(warped_image):
+    pv = PolarView(None)
+    pv.warped_image = warped_image.copy()
+    pv.min, pv.max = 5., 500.
+    return pv
+
+
+@pytest.mark.parametrize('algorithm', list(SnipAlgorithmType))
+def test_region_matches_full_image(polar_config, algorithm):
+    polar_config.polar_snip1d_algorithm = algorithm
+
+    rng = np.random.default_rng(2)
+    warped = rng.random((40, 60)) * 100
+    warped[0, 0], warped[-1, -1] = 0, 100
+    pv = make_polar_view(warped)
+    pv.generate_image()
+
+    # Change a region, without changing the range of the image, as
+    # moving a detector does
+    region = (slice(12, 20), slice(25, 40))
+    warped[region] = rng.random((8, 15)) * 50 + 25
+    pv.warped_image = warped.copy()
+    pv.generate_image(region)
+
+    expected = make_polar_view(warped)
+    expected.generate_image()
+    np.testing.assert_allclose(pv.img, expected.img)
+    np.testing.assert_allclose(pv.snip1d_background,
+                               expected.snip1d_background)
@@ -0,0 +1,216 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('PySide2')
+xfcapi = pytest.importorskip('hexrd.transforms.xfcapi')
+
+from hexrd.ui.constants import ViewType  # noqa: E402
+from hexrd.ui.overlays.powder_diffraction import (  # noqa: E402
+    nans_row, PowderLineOverlay
+)
+
+
+class Panel:
+    """A flat panel normal to the beam, offset by (cx, cy)
+
+    If drop is True, points that do not intersect the panel are
+    dropped, rather than set to nan.
+    """
+
+    def __init__(self, cx, cy, width, height, distance=1000., drop=False):
+        self.cx = cx
+        self.cy = cy
+        self.width = width
+        self.height = height
+        self.distance = distance
+        self.drop = drop
+        self.distortion = None
+
+    def angles_to_cart(self, ang, tvec_c=None):
+        ang = np.asarray(ang, float)
+        r = self.distance * np.tan(ang[:, 0])
+        xy = np.vstack([r * np.cos(ang[:, 1]) - self.cx,
+                        r * np.sin(ang[:, 1]) - self.cy]).T
+        behind = ang[:, 0] >= np.pi / 2
+        if self.drop:
+            return xy[~behind]
+        xy[behind] = np.nan
+        return xy
+
+    def clip_to_panel(self, xy, buffer_edges=True):
+        xy = np.atleast_2d(xy)
+        on_panel = ((np.abs(xy[:, 0]) <= self.width / 2) &
+                    (np.abs(xy[:, 1]) <= self.height / 2))
+        return xy[on_panel, :], on_panel
+
+    def cart_to_angles(self, xy, tvec=None):
+        x = xy[:, 0] + self.cx
+        y = xy[:, 1] + self.cy
+        tth = np.arctan(np.hypot(x, y) / self.distance)
+        return np.vstack([tth, np.arctan2(y, x)]).T, None
+
+    def cartToPixel(self, xy):
+        return np.vstack([-xy[:, 1] / 0.2 + 100, xy[:, 0] / 0.2 + 100]).T
+
+
+class Instrument:
+    def __init__(self, detectors):
+        self.detectors = detectors
+        self.tvec = np.zeros(3)
+
+
+class PlaneData:
+    def __init__(self, tths, width):
+        self.tths = np.radians(tths)
+        self.tThWidth = width
+
+    def getTTh(self):
+        return self.tths
+
+    def getHKLs(self):
+        return [f'hkl{i}' for i in range(len(self.tths))]
+
+    def getMergedRanges(self):
+        w = np.radians(0.3)
+        indices = [[i] for i in range(len(self.tths))]
+        return indices, [[x - w, x + w] for x in self.tths]
+
+
+def reference_ring_points(overlay, tths, etas, panel, display_mode):
+    # The previous implementation, which handled one ring at a time
+    ring_pts = []
+    skipped_tth = []
+    for i, tth in enumerate(tths):
+        ang_crds = np.vstack([np.tile(tth, len(etas)), etas]).T
+        xys_full = panel.angles_to_cart(ang_crds, tvec_c=overlay.tvec)
+        if len(xys_full) == 0:
+            skipped_tth.append(i)
+            continue
+
+        xys, on_panel = panel.clip_to_panel(xys_full, buffer_edges=False)
+
+        if display_mode == ViewType.polar:
+            ang_crds, _ = panel.cart_to_angles(xys, overlay.instrument.tvec)
+            if len(ang_crds) == 0:
+                skipped_tth.append(i)
+                continue
+
+            ang_crds[:, [0, 1]] = np.degrees(ang_crds[:, [1, 0]])
+            ang_crds[:, 0] = xfcapi.mapAngle(
+                ang_crds[:, 0], overlay.eta_period, units='degrees')
+            ang_crds = ang_crds[np.argsort(ang_crds[:, 0]), :]
+
+            delta_eta_est = np.median(np.diff(ang_crds[:, 0]))
+            cut_on_panel = bool(
+                xfcapi.angularDifference(
+                    np.min(ang_crds[:, 0]), np.max(ang_crds[:, 0]),
+                    units='degrees') < 2 * delta_eta_est
+            )
+            if cut_on_panel and len(ang_crds) > 2:
+                split_idx = np.argmax(
+                    np.abs(np.diff(ang_crds[:, 0]) - delta_eta_est)) + 1
+                ang_crds = np.vstack([ang_crds[:split_idx, :], nans_row,
+                                      ang_crds[split_idx:, :]])
+
+            ring_pts.append(np.vstack([ang_crds, nans_row]))
+        else:
+            if display_mode == ViewType.raw:
+                xys = panel.cartToPixel(xys)
+
+            diff_tol = np.radians(overlay.delta_eta) + 1e-4
+            ring_breaks = np.where(
+                np.abs(np.diff(etas[on_panel])) > diff_tol)[0] + 1
+            segments = np.split(xys, ring_breaks)
+            pts = []
+            for segment in segments:
+                pts += [segment, nans_row]
+            ring_pts.append(np.vstack(pts))
+
+    return ring_pts, skipped_tth
+
+
+def reference_overlay(overlay, display_mode):
+    plane_data = overlay.plane_data
+    tths = plane_data.getTTh()
+    hkls = plane_data.getHKLs()
+    etas = np.radians(np.linspace(-180., 180., num=overlay.eta_steps + 1))
+
+    point_groups = {}
+    for det_key, panel in overlay.instrument.detectors.items():
+        group = {'rings': [], 'rbnds': [], 'rbnd_indices': [], 'hkls': []}
+        ring_pts, skipped = reference_ring_points(overlay, tths, etas, panel,
+                                                  display_mode)
+        group['rings'] = ring_pts
+        group['hkls'] = [x for i, x in enumerate(hkls) if i not in skipped]
+
+        if plane_data.tThWidth is not None:
+            indices, ranges = plane_data.getMergedRanges()
+            lower, _ = reference_ring_points(
+                overlay, [r[0] for r in ranges], etas, panel, display_mode)
+            upper, _ = reference_ring_points(
+                overlay, [r[1] for r in ranges], etas, panel, display_mode)
+            for lpts, upts in zip(lower, upper):
+                group['rbnds'] += [lpts, upts]
+            for ind in indices:
+                group['rbnd_indices'] += [ind, ind]
+
+        point_groups[det_key] = group
+
+    return point_groups
+
+
+def assert_groups_equal(result, expected):
+    assert result.keys() == expected.keys()
+    for det_key in expected:
+        for key, values in expected[det_key].items():
+            values2 = result[det_key][key]
+            assert len(values2) == len(values), (det_key, key)
+            for a, b in zip(values2, values):
+                if isinstance(b, np.ndarray):
+                    assert a.shape == b.shape, (det_key, key)
+                    np.testing.assert_allclose(a, b, equal_nan=True)
+                else:
+                    assert a == b
+
+
+def make_instrument(drop):
+    return Instrument({
+        'center': Panel(0, 0, 400, 400, drop=drop),
+        'corner': Panel(150, 120, 300, 200, drop=drop),
+        'side': Panel(-300, 0, 200, 400, drop=drop),
+        'far': Panel(5000, 5000, 10, 10, drop=drop),
+    })
+
+
+def make_tths(beyond_90):
+    rng = np.random.default_rng(0)
+    tths = np.sort(rng.uniform(1, 60, 50)).tolist()
+    if beyond_90:
+        # This ring does not intersect the plane of the panels
+        tths.append(95.)
+    return tths
+
+
+@pytest.mark.parametrize('display_mode', [ViewType.raw, ViewType.cartesian,
+                                          ViewType.polar])
+@pytest.mark.parametrize('width', [None, 0.1])
+@pytest.mark.parametrize('drop', [False, True])
+def test_overlay_matches_reference(display_mode, width, drop):
+    plane_data = PlaneData(make_tths(beyond_90=not drop), width)
+    overlay = PowderLineOverlay(plane_data, make_instrument(drop))
+    assert_groups_equal(overlay.overlay(display_mode),
+                        reference_overlay(overlay, display_mode))
+
+
+def test_polar_overlay_with_shifted_eta_period():
+    plane_data = PlaneData(make_tths(beyond_90=True), 0.1)
+    overlay = PowderLineOverlay(plane_data, make_instrument(False),
+                                eta_period=np.r_[0., 360.])
+    assert_groups_equal(overlay.overlay(ViewType.polar),
+                        reference_overlay(overlay, ViewType.polar))
+
+
+def test_overlay_without_rings():
+    plane_data = PlaneData([], None)
+    overlay = PowderLineOverlay(plane_data, make_instrument(False))
+    assert overlay.overlay(ViewType.raw) == {}